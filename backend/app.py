@@ -1,17 +1,28 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi import UploadFile, File
 import uuid
+import hashlib
 from contextlib import asynccontextmanager
-from servers.agent import fast
+from servers.agent import fast, AGENT_WORKER_NAMES
+from servers.agent_pool import AgentPool, AgentPoolExhausted, DEFAULT_SESSION_ID
+from servers.history_manager import HistoryManager
+from servers.fast_path import FastPathRouter
+from servers.response_stream import IncrementalResponseParser, attach_stream_listener
+from servers.executor_pools import get_executor
+from core.errors import RetryableError, NonRetryableError, AgentError, get_error_classifier_stats
+from core.retry import async_retry_operation, deadline_scope, circuit_guard, get_retry_stats, CircuitOpenError, DeadlineExceeded
+from data_retrieval.search_config import BATCH_SEARCH_MAX_QUERIES, SEARCH_DEADLINE_SECONDS, STORE_RELOAD_INTERVAL, UPLOAD_IMAGE_DIR
+from data_retrieval.product_catalog import get_product_catalog
 import asyncio
 import logging
 import json
 import time
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional, Set
+from collections import deque
 import re
 import os
 from pydantic import BaseModel
@@ -19,202 +30,227 @@ from pydantic import BaseModel
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class RetryableError(Exception):
-    pass
-
-class NonRetryableError(Exception):
-    pass
-
-class AgentError(Exception):
-    pass
-
-RETRYABLE_ERROR_KEYWORDS = [
-    'too many connections', 'server overloaded', 'temporary failure', 
-    'try again', 'timeout', 'timed out', 'connection timeout',
-    'read timeout', 'write timeout', 'operation timeout',
-    'memory temporarily unavailable', 'disk space temporarily full',
-    'resource temporarily unavailable', 'service temporarily unavailable',
-    'temporarily unable', 'busy', 'locked', 'deadlock',
-    'rate limit', 'throttled', 'quota exceeded', 'too many requests',
-    'request limit', 'api limit',
-    'server busy', 'service unavailable', 'maintenance mode',
-    'overloaded', 'congestion', 'backpressure',
-    'network unreachable', 'host temporarily unreachable',
-    'dns temporarily failed', 'name resolution temporarily failed',
-    'model overloaded', 'context length temporarily exceeded', 'tokens per minute',
-    'concurrent requests exceeded', 'openai rate limit', 'anthropic rate limit',
-    'model temporarily unavailable', 'inference timeout', 'generation timeout',
-    'index temporarily locked', 'embedding service unavailable',
-    'vector search timeout', 'similarity search timeout',
-    'clip model loading', 'model warming up',
-    'image processing queue full', 'thumbnail generation failed temporarily',
-    'image download timeout', 'cdn temporarily unavailable',
-    'image service overloaded', 'processing capacity exceeded',
-    'websocket connection limit', 'broadcast queue full',
-    'message queue overflow', 'connection pool exhausted',
-    'storage temporarily unavailable', 'cache miss timeout',
-    'index rebuild in progress', 'replication lag'
-]
-
-NON_RETRYABLE_ERROR_KEYWORDS = [
-    'connection', 'network', 'socket', 'broken pipe', 
-    'connection reset', 'host unreachable', 'connection refused',
-    'no route to host', 'network is unreachable',
-    'authentication failed', 'unauthorized', 'forbidden', 
-    'access denied', 'permission denied', 'invalid credentials',
-    'invalid token', 'expired token', 'invalid key',
-    'column', 'table', 'syntax', 'type mismatch', 'invalid', 
-    'does not exist', 'unknown', 'not found', 'missing',
-    'duplicate key', 'constraint violation', 'foreign key',
-    'validation error', 'invalid format', 'malformed',
-    'bad request', 'invalid parameter', 'invalid input',
-    'parse error', 'decode error', 'encoding error',
-    'configuration error', 'config', 'misconfigured',
-    'invalid configuration', 'missing configuration',
-    'file not found', 'directory not found', 'path not found',
-    'permission denied', 'disk full', 'no space left',
-    'null pointer', 'index out of bounds', 'key error',
-    'attribute error', 'type error', 'value error',
-    'assertion error', 'not implemented',
-    'version mismatch', 'incompatible', 'unsupported',
-    'deprecated', 'not supported',
-    'invalid api key', 'api key revoked', 'subscription expired',
-    'insufficient credits', 'account suspended', 'invalid model',
-    'model not found', 'context length exceeded permanently',
-    'invalid prompt', 'content policy violation', 'unsafe content',
-    'index corrupted', 'index not found', 'invalid embedding dimension',
-    'embedding model mismatch', 'vector dimension mismatch',
-    'invalid similarity metric', 'index schema error',
-    'invalid image format', 'corrupted image', 'image too large',
-    'unsupported image type', 'invalid image dimensions',
-    'image decode failed', 'invalid base64', 'malformed image data',
-    'image metadata corrupted', 'exif data invalid',
-    'invalid filter operator', 'filter type mismatch',
-    'metadata field not found', 'invalid price range',
-    'category does not exist', 'invalid rating value',
-    'brand not recognized', 'invalid stock filter',
-    'product not found', 'catalog empty', 'invalid product id',
-    'thumbnail missing', 'price data corrupted',
-    'inventory data invalid', 'sku not found',
-    'tool not found', 'invalid tool parameters', 'tool execution failed',
-    'conversation context corrupted', 'history limit exceeded',
-    'invalid response format', 'markdown parse error',
-    'websocket protocol error', 'invalid message format',
-    'connection already closed', 'invalid connection id',
-    'handshake failed', 'protocol version unsupported'
-]
-
-def is_retryable_error(error: Exception) -> bool:
-    if isinstance(error, TimeoutError):
-        return True
-    
-    if isinstance(error, (ConnectionError, ConnectionRefusedError)):
-        return False
-    
-    error_msg = str(error).lower()
-    
-    if any(keyword in error_msg for keyword in RETRYABLE_ERROR_KEYWORDS):
-        return True
-    
-    if any(keyword in error_msg for keyword in NON_RETRYABLE_ERROR_KEYWORDS):
-        return False
-    
-    return False
-
-def retry_operation(func, max_retries=2, base_delay=1, max_delay=5):
-    for attempt in range(max_retries + 1):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == max_retries or not is_retryable_error(e):
-                raise
-            
-            delay = min(base_delay * (2 ** attempt), max_delay)
-            logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f}s...")
-            time.sleep(delay)
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
 
+# Seconds one agent turn may take across retries; a turn still running then is cancelled
+AGENT_REQUEST_DEADLINE = float(os.getenv("AGENT_REQUEST_DEADLINE", "120"))
+# Seconds between checks for a client that went away while its agent turn runs
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
 
-async def async_retry_operation(async_func, max_retries=3, base_delay=1, max_delay=10):
-    for attempt in range(max_retries + 1):
-        try:
-            return await async_func()
-        except Exception as e:
-            if attempt == max_retries:
-                if is_retryable_error(e):
-                    logger.error(f"Operation failed after {max_retries} retries: {e}")
-                    raise RetryableError(f"Max retries exceeded: {e}") from e
-                else:
-                    logger.error(f"Non-retryable error: {e}")
-                    raise NonRetryableError(f"Operation failed: {e}") from e
-            
-            if not is_retryable_error(e):
-                logger.error(f"Non-retryable error, failing fast: {e}")
-                raise NonRetryableError(f"Operation failed: {e}") from e
-            
-            delay = min(base_delay * (2 ** attempt), max_delay)
-            logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f} seconds...")
-            await asyncio.sleep(delay)
+def get_session_id(request: Request) -> str:
+    # Clients without a session header or cookie share the "default" session, as before pooling
+    session_id = request.headers.get("X-Session-Id") or request.cookies.get("session_id") or DEFAULT_SESSION_ID
+    if not SESSION_ID_PATTERN.match(session_id):
+        raise ValueError("Invalid session id")
+    return session_id
 
 class ChatManager:
     def __init__(self):
-        self.agent = None
-        self.agent_context = None
+        self.pool = AgentPool(fast.run, AGENT_WORKER_NAMES, history=HistoryManager())
+        self.router = FastPathRouter()
+        self.started = False
     
     async def start(self):
         async def _start():
-            if not self.agent_context:
-                logger.info("Starting persistent agent context...")
-                self.agent_context = fast.run()
-                self.agent = await self.agent_context.__aenter__()
-                logger.info("Agent context started successfully")
+            if not self.started:
+                logger.info("Starting agent pool...")
+                await self.pool.start()
+                self.started = True
+                logger.info("Agent pool started successfully")
         
         try:
             await async_retry_operation(_start, max_retries=3)
         except (RetryableError, NonRetryableError) as e:
-            raise AgentError(f"Could not start agent context: {e}") from e
+            raise AgentError(f"Could not start agent pool: {e}") from e
     
     async def stop(self):
         try:
-            if self.agent_context:
-                logger.info("Stopping agent context...")
-                await self.agent_context.__aexit__(None, None, None)
-                self.agent_context = None
-                self.agent = None
-                logger.info("Agent context stopped")
+            if self.started:
+                logger.info("Stopping agent pool...")
+                await self.pool.stop()
+                self.started = False
+                logger.info("Agent pool stopped")
         except Exception as e:
-            logger.error(f"Failed to stop agent context: {e}")
-            raise AgentError(f"Could not stop agent context: {e}") from e
+            logger.error(f"Failed to stop agent pool: {e}")
+            raise AgentError(f"Could not stop agent pool: {e}") from e
     
-    async def chat(self, message: str) -> Dict[str, Any]:
-        if not self.agent:
+    async def fast_path(self, message: str, session_id: str) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        decision = self.router.route(message)
+        if not decision["take"]:
+            return None
+        
+        search = decision["search"]
+        
+        # Imported on first use, like /search/batch: agent-only deployments never load BGE
+        async def _search():
+            from data_retrieval.llama_search_text import cached_text_search, embed_text_query, search_products_by_text
+            filters = {key: value for key, value in search.items() if key not in ("query", "limit")}
+            cached = cached_text_search(search["query"], search["limit"], **filters)
+            if cached is not None:
+                return cached
+            query_embedding = await get_executor("text_embed").run(embed_text_query, search["query"], filters)
+            return await get_executor("scoring").run(search_products_by_text, query_embedding=query_embedding, **search)
+        
+        try:
+            with deadline_scope(SEARCH_DEADLINE_SECONDS):
+                products = await async_retry_operation(_search, max_retries=1)
+        except Exception as e:
+            logger.warning(f"Fast path search failed, falling back to the agent: {e}")
+            self.router.record_fallback("search_failed")
+            return None
+        if not products:
+            # The agent explains empty results and suggests relaxed filters; a template cannot
+            self.router.record_fallback("no_results")
+            return None
+        
+        self.router.remember(session_id, decision, products)
+        elapsed = time.perf_counter() - started
+        self.router.record_latency("fast_path", elapsed)
+        logger.info(
+            f"Fast path answered session {session_id} in {elapsed * 1000:.0f}ms "
+            f"(confidence {decision['confidence']}): {search}"
+        )
+        return {
+            "type": "normal_response",
+            "result": self.router.render(decision, products)
+        }
+    
+    async def chat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> Dict[str, Any]:
+        started = time.perf_counter()
+        fast_result = await self.fast_path(message, session_id)
+        if fast_result:
+            return fast_result
+        
+        if not self.started:
             await self.start()
+        agent_message = self.router.with_context(session_id, message)
         
         async def _chat():
-            logger.info(f"Sending message to agent: {message}")
-            result = await self.agent(message)
-            logger.info("Received response from agent")
-            return {
-                "type": "normal_response",
-                "result": str(result)
-            }
+            async with self.pool.session(session_id) as agent:
+                logger.info(f"Sending message to agent for session {session_id}: {message}")
+                with circuit_guard("llm"):
+                    result = await agent(agent_message)
+                logger.info("Received response from agent")
+                return {
+                    "type": "normal_response",
+                    "result": str(result)
+                }
         
         try:
-            return await async_retry_operation(_chat, max_retries=2)
+            with deadline_scope(AGENT_REQUEST_DEADLINE):
+                result = await async_retry_operation(_chat, max_retries=2)
         except (RetryableError, NonRetryableError) as e:
+            if isinstance(e.__cause__, AgentPoolExhausted):
+                raise RetryableError(f"Agent pool busy: {e.__cause__}") from e.__cause__
+            if isinstance(e.__cause__, (CircuitOpenError, DeadlineExceeded)):
+                raise RetryableError(f"Agent unavailable: {e.__cause__}") from e.__cause__
             raise AgentError(f"Failed to process chat message: {e}") from e
+        
+        self.router.clear_context(session_id)
+        elapsed = time.perf_counter() - started
+        self.router.record_latency("agent", elapsed)
+        logger.info(f"Agent answered session {session_id} in {elapsed:.2f}s")
+        return result
+    
+    async def chat_stream(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> AsyncIterator[Dict[str, Any]]:
+        started = time.perf_counter()
+        fast_result = await self.fast_path(message, session_id)
+        if fast_result:
+            yield {"type": "result", "result": fast_result["result"], "streamed": False}
+            return
+        
+        if not self.started:
+            await self.start()
+        agent_message = self.router.with_context(session_id, message)
+        
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        streamed = False
+        
+        async def _chat():
+            async with self.pool.session(session_id) as agent:
+                logger.info(f"Streaming message to agent for session {session_id}: {message}")
+                remove_listener = attach_stream_listener(
+                    agent, lambda chunk: loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+                )
+                try:
+                    with circuit_guard("llm"):
+                        reply = str(await asyncio.wait_for(agent(agent_message), timeout=AGENT_REQUEST_DEADLINE))
+                    return reply
+                finally:
+                    if remove_listener:
+                        remove_listener()
+        
+        # No retries here: a retried turn would replay tokens the client has already rendered
+        task = asyncio.create_task(_chat())
+        try:
+            while True:
+                next_chunk = asyncio.create_task(chunks.get())
+                done, _ = await asyncio.wait({next_chunk, task}, return_when=asyncio.FIRST_COMPLETED)
+                if next_chunk in done:
+                    streamed = True
+                    yield {"type": "chunk", "text": next_chunk.result()}
+                    continue
+                next_chunk.cancel()
+                break
+            
+            await asyncio.sleep(0)
+            while not chunks.empty():
+                streamed = True
+                yield {"type": "chunk", "text": chunks.get_nowait()}
+            
+            try:
+                result = task.result()
+            except AgentPoolExhausted as e:
+                raise RetryableError(f"Agent pool busy: {e}") from e
+            except CircuitOpenError as e:
+                raise RetryableError(f"Agent unavailable: {e}") from e
+            except asyncio.TimeoutError as e:
+                raise RetryableError(f"Agent unavailable: no reply within {AGENT_REQUEST_DEADLINE:.0f}s") from e
+            except Exception as e:
+                raise AgentError(f"Failed to process chat message: {e}") from e
+            self.router.clear_context(session_id)
+            elapsed = time.perf_counter() - started
+            self.router.record_latency("agent", elapsed)
+            logger.info(f"Agent answered session {session_id} in {elapsed:.2f}s (streamed)")
+            yield {"type": "result", "result": result, "streamed": streamed}
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    async def reset(self, session_id: str = DEFAULT_SESSION_ID) -> bool:
+        self.router.clear_context(session_id)
+        return await self.pool.reset(session_id)
 
 chat_manager = ChatManager()
 
+async def refresh_catalog_loop():
+    # Catalog reloads and the fast path's vocabulary rebuild read the whole store, so requests never run them;
+    # they only read what this task last built
+    while True:
+        await asyncio.sleep(max(STORE_RELOAD_INTERVAL, 1.0))
+        try:
+            await asyncio.to_thread(chat_manager.router.refresh)
+        except Exception as e:
+            logger.warning(f"Catalog refresh failed: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    refresh_task = None
     try:
         await chat_manager.start()
-        logger.info("FastAPI app started with persistent agent")
+        # Read the catalog off the event loop before the first reply needs to resolve product ids
+        await asyncio.to_thread(chat_manager.router.refresh)
+        refresh_task = asyncio.create_task(refresh_catalog_loop())
+        logger.info("FastAPI app started with agent pool")
         yield
     except Exception as e:
         logger.error(f"Failed to start FastAPI app: {e}")
         raise 
     finally:
+        if refresh_task:
+            refresh_task.cancel()
         await chat_manager.stop()
         logger.info("FastAPI app shutdown complete")
 
@@ -286,6 +322,16 @@ class PromptResponse(BaseModel):
     status: str = "success"
     type: str = "normal_response"
 
+def resolve_image_ref(kind: str, value: str) -> Optional[str]:
+    if kind == "image_url":
+        return value
+    # Every product the search tools can return is in the catalog, which a background task keeps current
+    product = get_product_catalog().get(value)
+    thumbnail = product.get("thumbnail") if product else None
+    if not thumbnail:
+        logger.warning(f"Agent referenced product {value!r} with no known thumbnail")
+    return thumbnail
+
 def parse_agent_response(raw_response: str) -> dict:
     text_result = None
     image_urls = []
@@ -297,8 +343,10 @@ def parse_agent_response(raw_response: str) -> dict:
     image_match = re.search(r'%%RESPONSE_IMAGE\s*(.*?)\s*%%', raw_response, re.DOTALL)
     if image_match:
         image_section = image_match.group(1)
-        url_matches = re.findall(r'##IMAGE_URL:\s*(.*?)\s*##', image_section)
-        image_urls = [url.strip() for url in url_matches]
+        for marker, value in re.findall(r'##(IMAGE_URL|PRODUCT_ID):\s*(.*?)\s*##', image_section):
+            url = resolve_image_ref(marker.lower(), value.strip())
+            if url and url not in image_urls:
+                image_urls.append(url)
     
     return {
         "text_result": text_result,
@@ -315,15 +363,22 @@ async def upload_image(image: UploadFile = File(...)):
         if len(content) > 10 * 1024 * 1024:
             raise ValueError("Image too large. Maximum size is 10MB.")
         
-        image_id = str(uuid.uuid4())
-        image_path = f"./temp_images/{image_id}.jpg"
+        # Content-addressed: re-uploading the same photo reuses the file and its cached CLIP embedding
+        image_hash = hashlib.sha256(content).hexdigest()
+        image_path = os.path.join(UPLOAD_IMAGE_DIR, f"{image_hash}.jpg")
         
-        os.makedirs("./temp_images", exist_ok=True)
+        os.makedirs(UPLOAD_IMAGE_DIR, exist_ok=True)
         
-        with open(image_path, "wb") as f:
-            f.write(content)
+        if os.path.exists(image_path):
+            logger.info(f"Image {image_hash[:12]} already uploaded, reusing {image_path}")
+        else:
+            # Written under a temporary name so a search never sees a partial file behind a valid hash
+            tmp_path = f"{image_path}.tmp-{uuid.uuid4().hex}"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, image_path)
         
-        return {"image_path": image_path, "status": "success"}
+        return {"image_path": image_path, "image_hash": image_hash, "status": "success"}
     
     try:
         return await async_retry_operation(_upload, max_retries=2)
@@ -335,34 +390,153 @@ async def upload_image(image: UploadFile = File(...)):
         logger.error(f"Image upload failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload image")
 
+IMAGE_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class SearchSpec(BaseModel):
+    query: Optional[str] = None
+    image_hash: Optional[str] = None
+    top_k: int = 3
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    brand: Optional[str] = None
+    in_stock: bool = False
+
+class BatchSearchRequest(BaseModel):
+    searches: List[SearchSpec]
+
+def build_search_spec(spec: SearchSpec) -> Dict[str, Any]:
+    if (spec.query is None) == (spec.image_hash is None):
+        raise HTTPException(status_code=400, detail="Each search needs exactly one of query or image_hash")
+    if spec.top_k < 1 or spec.top_k > 50:
+        raise HTTPException(status_code=400, detail="top_k must be between 1 and 50")
+    
+    search = {
+        "limit": spec.top_k,
+        "category": spec.category,
+        "min_price": spec.min_price,
+        "max_price": spec.max_price,
+        "min_rating": spec.min_rating,
+        "brand": spec.brand,
+        "in_stock": spec.in_stock
+    }
+    if spec.query is not None:
+        if not spec.query.strip() or len(spec.query.strip()) > 500:
+            raise HTTPException(status_code=400, detail="Query must be 1-500 characters")
+        search["query"] = spec.query
+    else:
+        # Uploads are addressed by the hash /upload_image returned, never by a client-supplied path
+        image_path = os.path.join(UPLOAD_IMAGE_DIR, f"{spec.image_hash}.jpg")
+        if not IMAGE_HASH_PATTERN.match(spec.image_hash) or not os.path.exists(image_path):
+            raise HTTPException(status_code=400, detail=f"Unknown image_hash: {spec.image_hash}")
+        search["image_input"] = image_path
+    return search
+
+@app.post("/search/batch")
+async def search_batch_endpoint(batch_request: BatchSearchRequest):
+    searches = batch_request.searches
+    if not searches or len(searches) > BATCH_SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_SEARCH_MAX_QUERIES} searches")
+    
+    specs = [build_search_spec(spec) for spec in searches]
+    text_positions = [i for i, spec in enumerate(specs) if "query" in spec]
+    image_positions = [i for i, spec in enumerate(specs) if "image_input" in spec]
+    
+    # The search modules are imported on first use: they load BGE/CLIP, which agent-only deployments never need.
+    # As in the MCP tools, cached searches skip both pools and the models run on the embed pools, not on scoring
+    async def _search_text():
+        if not text_positions:
+            return []
+        from data_retrieval.llama_search_text import cached_text_search, embed_text_queries, search_products_by_text_batch
+        from data_retrieval.vector_engine import spec_filters
+        batch = [specs[i] for i in text_positions]
+        results = [cached_text_search(**spec) for spec in batch]
+        pending = [spec for spec, cached in zip(batch, results) if cached is None]
+        if pending:
+            query_embeddings = await get_executor("text_embed").run(
+                embed_text_queries, [spec["query"] for spec in pending], [spec_filters(spec) for spec in pending]
+            )
+            searched = iter(await get_executor("scoring").run(search_products_by_text_batch, pending, query_embeddings))
+            results = [cached if cached is not None else next(searched) for cached in results]
+        return results
+    
+    async def _search_images():
+        if not image_positions:
+            return []
+        from data_retrieval.llama_search_image import cached_image_search, embed_image_queries, search_products_by_image_batch
+        batch = [specs[i] for i in image_positions]
+        results = [cached_image_search(**spec) for spec in batch]
+        pending = [spec for spec, cached in zip(batch, results) if cached is None]
+        if pending:
+            query_embeddings = await get_executor("image_embed").run(embed_image_queries, [spec["image_input"] for spec in pending])
+            searched = iter(await get_executor("scoring").run(search_products_by_image_batch, pending, query_embeddings))
+            results = [cached if cached is not None else next(searched) for cached in results]
+        return results
+    
+    async def _search():
+        return await asyncio.gather(_search_text(), _search_images())
+    
+    start = time.perf_counter()
+    with deadline_scope(SEARCH_DEADLINE_SECONDS):
+        text_results, image_results = await async_retry_operation(_search, max_retries=2)
+    
+    results: List[Any] = [None] * len(specs)
+    for positions, group_results in ((text_positions, text_results), (image_positions, image_results)):
+        for i, products in zip(positions, group_results):
+            entry = {"query": searches[i].query} if searches[i].query is not None else {"image_hash": searches[i].image_hash}
+            results[i] = {**entry, "num_results": len(products), "products": products}
+    
+    logger.info(f"Batch search: {len(text_positions)} text, {len(image_positions)} image in {time.perf_counter() - start:.3f}s")
+    return {"status": "success", "num_searches": len(results), "searches": results}
+
+def build_agent_message(prompt_request: PromptRequest) -> str:
+    user_text_query = prompt_request.prompt
+    user_image_query = prompt_request.image 
+    
+    if not user_text_query.strip() and not user_image_query:
+        raise HTTPException(status_code=400, detail="Either text prompt or image must be provided")
+    
+    # Validate image path if provided
+    if user_image_query and not os.path.exists(user_image_query):
+        raise HTTPException(status_code=400, detail="Invalid image path")
+    
+    message_parts = []
+    
+    if user_text_query.strip():
+        message_parts.append(user_text_query)
+    
+    if user_image_query:
+        message_parts.append(f"[IMAGE_UPLOADED: {user_image_query}]")
+        if not user_text_query.strip():
+            message_parts.append("Find products similar to this image.")
+    
+    logger.info(f"Processing query with text: {bool(user_text_query.strip())}, image: {bool(user_image_query)}")
+    return " ".join(message_parts)
+
+async def run_until_disconnected(request: Request, coro):
+    # Cancelling the turn also ends its retry backoff and any search retries still running for it
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling its agent turn")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 @app.post("/agent", response_model=PromptResponse)
-async def agent_endpoint(prompt_request: PromptRequest):
+async def agent_endpoint(prompt_request: PromptRequest, request: Request):
+    session_id = get_session_id(request)
     try:
-        user_text_query = prompt_request.prompt
-        user_image_query = prompt_request.image 
-        
-        if not user_text_query.strip() and not user_image_query:
-            raise HTTPException(status_code=400, detail="Either text prompt or image must be provided")
-        
-        # Validate image path if provided
-        if user_image_query and not os.path.exists(user_image_query):
-            raise HTTPException(status_code=400, detail="Invalid image path")
+        combined_message = build_agent_message(prompt_request)
         
-        message_parts = []
-        
-        if user_text_query.strip():
-            message_parts.append(user_text_query)
-        
-        if user_image_query:
-            message_parts.append(f"[IMAGE_UPLOADED: {user_image_query}]")
-            if not user_text_query.strip():
-                message_parts.append("Find products similar to this image.")
-        
-        combined_message = " ".join(message_parts)
-        
-        logger.info(f"Processing query with text: {bool(user_text_query.strip())}, image: {bool(user_image_query)}")
-        
-        result = await chat_manager.chat(combined_message)
+        result = await run_until_disconnected(request, chat_manager.chat(combined_message, session_id))
         raw_response = result["result"]
         
         logger.info(f"Raw agent response: {raw_response[:200]}...")
@@ -392,17 +566,79 @@ async def agent_endpoint(prompt_request: PromptRequest):
         logger.error(f"Unexpected error processing query: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/agent/stream")
+async def agent_stream_endpoint(prompt_request: PromptRequest, request: Request):
+    session_id = get_session_id(request)
+    combined_message = build_agent_message(prompt_request)
+    
+    async def _events():
+        parser = IncrementalResponseParser()
+        started = time.perf_counter()
+        first_event_at = None
+        sent_urls: Set[str] = set()
+        try:
+            async for item in chat_manager.chat_stream(combined_message, session_id):
+                if item["type"] == "chunk":
+                    parsed_events = parser.feed(item["text"])
+                else:
+                    raw_response = item["result"]
+                    # No token stream from this LLM: parse the full reply so clients see the same events
+                    parsed_events = [] if item["streamed"] else parser.feed(raw_response)
+                    parsed_events += parser.finish()
+                
+                for kind, value in parsed_events:
+                    if first_event_at is None:
+                        first_event_at = time.perf_counter() - started
+                    if kind == "text":
+                        yield sse_event("text", {"delta": value})
+                        continue
+                    url = resolve_image_ref(kind, value)
+                    if url and url not in sent_urls:
+                        sent_urls.add(url)
+                        yield sse_event("image_url", {"url": url})
+            
+            # The final reply is authoritative: the token stream also carries any text written before tool calls
+            parsed = parse_agent_response(raw_response)
+            if not parsed["text_result"]:
+                raise ValueError("Agent returned empty response")
+            logger.info(
+                f"Streamed response - first event {first_event_at if first_event_at is not None else -1:.2f}s, "
+                f"total {time.perf_counter() - started:.2f}s, images: {len(parsed['image_urls'])}"
+            )
+            yield sse_event("done", {
+                "text_result": parsed["text_result"],
+                "image_result": json.dumps(parsed["image_urls"]) if parsed["image_urls"] else None,
+                "status": "success",
+                "type": "normal_response"
+            })
+        except RetryableError as e:
+            logger.error(f"Retryable error streaming query: {e}")
+            yield sse_event("error", {"detail": str(e), "type": "retryable_error", "retry_after": 5})
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}", exc_info=True)
+            yield sse_event("error", {"detail": str(e), "type": "agent_error"})
+    
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/reset_conversation")
-async def reset_conversation():
+async def reset_conversation(request: Request):
+    session_id = get_session_id(request)
+    
     async def _reset():
-        logger.info("Resetting conversation...")
-        await chat_manager.stop()
-        logger.info("Agent stopped")
-        await chat_manager.start()
-        logger.info("Agent restarted")
+        logger.info(f"Resetting conversation for session {session_id}...")
+        existed = await chat_manager.reset(session_id)
+        logger.info(f"Session {session_id} {'reset' if existed else 'had no agent yet'}")
         return {
             "status": "success", 
             "message": "Conversation history reset successfully",
+            "session_id": session_id
         }
     
     try:
@@ -414,63 +650,140 @@ async def reset_conversation():
 @app.get("/health")
 async def health_check():
     try:
-        if chat_manager.agent:
-            return {"status": "healthy", "agent_status": "running"}
+        if chat_manager.started:
+            return {
+                "status": "healthy",
+                "agent_status": "running",
+                "agent_pool": chat_manager.pool.stats(),
+                "websockets": websocket_manager.stats(),
+                "retries": get_retry_stats(),
+                "error_classes": get_error_classifier_stats(),
+                "router": chat_manager.router.stats()
+            }
         else:
-            return {"status": "healthy", "agent_status": "not_initialized"}
+            return {"status": "healthy", "agent_status": "not_initialized", "router": chat_manager.router.stats()}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "error": str(e)}
 
 @app.get("/agent_status")
-async def agent_status():
+async def agent_status(request: Request):
     try:
+        session_id = get_session_id(request)
         return {
-            "agent_initialized": chat_manager.agent is not None,
-            "context_active": chat_manager.agent_context is not None,
-            "status": "ready" if chat_manager.agent else "not_ready"
+            "agent_initialized": chat_manager.started,
+            "context_active": chat_manager.pool.has_session(session_id),
+            "status": "ready" if chat_manager.started else "not_ready",
+            "session_id": session_id,
+            "pool": chat_manager.pool.stats()
         }
     except Exception as e:
         logger.error(f"Error getting agent status: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve agent status")
 
+# Pending outbound messages per WebSocket; beyond this the oldest pending message is dropped
+WEBSOCKET_MAX_PENDING = int(os.getenv("WEBSOCKET_MAX_PENDING", "32"))
+WEBSOCKET_SEND_TIMEOUT = float(os.getenv("WEBSOCKET_SEND_TIMEOUT", "5"))
+
+class ConnectionOutbox:
+    def __init__(self, connection_id: str, websocket: WebSocket, session_id: Optional[str], max_pending: int = WEBSOCKET_MAX_PENDING):
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.session_id = session_id
+        self.max_pending = max_pending
+        self.pending: deque = deque()
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.task: Optional[asyncio.Task] = None
+    
+    def enqueue(self, payload: str, coalesce_key: Optional[str] = None):
+        if coalesce_key is not None:
+            # A newer update supersedes one this client has not received yet
+            for position, (_, pending_key) in enumerate(self.pending):
+                if pending_key == coalesce_key:
+                    self.pending[position] = (payload, coalesce_key)
+                    self.coalesced += 1
+                    return
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append((payload, coalesce_key))
+        self.ready.set()
+    
+    async def run(self, on_failure):
+        try:
+            while True:
+                while not self.pending:
+                    self.ready.clear()
+                    await self.ready.wait()
+                payload, _ = self.pending.popleft()
+                await asyncio.wait_for(self.websocket.send_text(payload), timeout=WEBSOCKET_SEND_TIMEOUT)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send to {self.connection_id}: {e}")
+            on_failure(self.connection_id)
+
 class SimpleConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, ConnectionOutbox] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, session_id: Optional[str] = None):
         await websocket.accept()
         connection_id = str(uuid.uuid4())
-        self.active_connections[connection_id] = websocket
-        logger.info(f"WebSocket connected: {connection_id}. Total connections: {len(self.active_connections)}")
+        outbox = ConnectionOutbox(connection_id, websocket, session_id)
+        outbox.task = asyncio.create_task(outbox.run(self.disconnect))
+        self.active_connections[connection_id] = outbox
+        logger.info(f"WebSocket connected: {connection_id} (session {session_id}). Total connections: {len(self.active_connections)}")
         return connection_id
 
     def disconnect(self, connection_id: str):
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
+        outbox = self.active_connections.pop(connection_id, None)
+        if outbox:
+            if outbox.task and outbox.task is not asyncio.current_task():
+                outbox.task.cancel()
             logger.info(f"WebSocket disconnected: {connection_id}. Total connections: {len(self.active_connections)}")
 
-    async def send_to_frontend(self, message: dict):
-        disconnected = []
-        for connection_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to send to {connection_id}: {e}")
-                disconnected.append(connection_id)
-        
-        for connection_id in disconnected:
-            self.disconnect(connection_id)
+    def connections_for(self, session_ids: Optional[Set[str]] = None) -> List[ConnectionOutbox]:
+        if session_ids is None:
+            return list(self.active_connections.values())
+        return [outbox for outbox in self.active_connections.values() if outbox.session_id in session_ids]
+
+    def send_to_frontend(self, message: dict, session_ids: Optional[Set[str]] = None, coalesce_key: Optional[str] = None) -> int:
+        # Serialised once and queued per connection; each socket drains on its own task, so a slow client stalls nobody
+        targets = self.connections_for(session_ids)
+        if targets:
+            payload = json.dumps(message)
+            for outbox in targets:
+                outbox.enqueue(payload, coalesce_key)
+        return len(targets)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.active_connections),
+            "pending": sum(len(outbox.pending) for outbox in self.active_connections.values()),
+            "sent": sum(outbox.sent for outbox in self.active_connections.values()),
+            "dropped": sum(outbox.dropped for outbox in self.active_connections.values()),
+            "coalesced": sum(outbox.coalesced for outbox in self.active_connections.values()),
+        }
             
 websocket_manager = SimpleConnectionManager()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    connection_id = await websocket_manager.connect(websocket)
+    session_id = websocket.query_params.get("session_id") or websocket.cookies.get("session_id") or DEFAULT_SESSION_ID
+    if not SESSION_ID_PATTERN.match(session_id):
+        await websocket.close(code=1008)
+        return
+    connection_id = await websocket_manager.connect(websocket, session_id)
     
     try:
         while True:
-            await asyncio.sleep(10)
+            # Clients never send; receiving just surfaces the disconnect as soon as it happens
+            await websocket.receive_text()
             
     except WebSocketDisconnect:
         logger.info(f"Client {connection_id} disconnected normally")
@@ -481,21 +794,47 @@ async def websocket_endpoint(websocket: WebSocket):
 
 class WebSocketMessage(BaseModel):
     message: str
+    session_id: Optional[str] = None
+    coalesce_key: Optional[str] = None
+    broadcast: bool = False
+    
+class WebSocketBatch(BaseModel):
+    messages: List[WebSocketMessage]
+
+def route_tool_message(data: WebSocketMessage) -> int:
+    if data.broadcast:
+        session_ids = None
+    elif data.session_id:
+        session_ids = {data.session_id}
+    else:
+        # Tool calls carry their session; an unscoped message has no safe recipient, so it is not delivered
+        logger.warning(f"Dropping tool message without a session: {data.message[:80]!r}")
+        return 0
     
+    message = {
+        "type": "tool",
+        "content": data.message,
+        "timestamp": time.time()
+    }
+    delivered = websocket_manager.send_to_frontend(message, session_ids, data.coalesce_key)
+    logger.info(f"Queued tool message for {delivered} connections (sessions: {'all' if session_ids is None else sorted(session_ids)})")
+    return delivered
+
 @app.post("/internal/websocket_send")
 async def internal_websocket_send(data: WebSocketMessage):
     try:
-        logger.info(f"Broadcasting tool message to {len(websocket_manager.active_connections)} connections")
-        message = {
-            "type": "tool",
-            "content": data.message,
-            "timestamp": time.time()
-        }
-        await websocket_manager.send_to_frontend(message)
-        return {"status": "sent", "connections": len(websocket_manager.active_connections)}
+        return {"status": "sent", "connections": route_tool_message(data)}
     except Exception as e:
         logger.error(f"Error broadcasting WebSocket message: {e}")
         return {"status": "error", "error": str(e)}
+
+@app.post("/internal/websocket_send_batch")
+async def internal_websocket_send_batch(data: WebSocketBatch):
+    try:
+        return {"status": "sent", "connections": [route_tool_message(message) for message in data.messages]}
+    except Exception as e:
+        logger.error(f"Error broadcasting WebSocket batch: {e}")
+        return {"status": "error", "error": str(e)}
             
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from servers.agent_pool import AgentPool
+
+
+class StubMemory:
+    def __init__(self):
+        self.history = []
+
+    def set(self, messages):
+        self.history = list(messages)
+
+    def clear(self):
+        self.history = []
+
+
+class StubLLM:
+    def __init__(self):
+        self.history = StubMemory()
+
+
+class StubAgent:
+    def __init__(self, llm_latency: float):
+        self.llm_latency = llm_latency
+        self._llm = StubLLM()
+
+    async def call_tool(self, name: str, arguments=None):
+        return None
+
+    async def __call__(self, message: str) -> str:
+        self._llm.history.history.append({"role": "user", "content": message})
+        await asyncio.sleep(self.llm_latency)
+        return f"%%RESPONSE\nturn {len(self._llm.history.history)}\n%%"
+
+
+class StubContext:
+    # Stands in for fast.run(): slow to enter (MCP servers, model loading), then LLM-bound worker agents
+    def __init__(self, startup: float, llm_latency: float, worker_names):
+        self.startup = startup
+        self.llm_latency = llm_latency
+        self.worker_names = worker_names
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.startup)
+        return {name: StubAgent(self.llm_latency) for name in self.worker_names}
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def run_shared(sessions: int, turns: int, startup: float, llm_latency: float):
+    # The old layout: one global agent whose calls serialise on a single shared history
+    context = StubContext(startup, llm_latency, ["CartPal"])
+    agent = (await context.__aenter__())["CartPal"]
+    lock = asyncio.Lock()
+    latencies = []
+
+    async def user(session: int):
+        for turn in range(turns):
+            start = time.perf_counter()
+            async with lock:
+                await agent(f"session {session} turn {turn}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(session) for session in range(sessions)))
+    return time.perf_counter() - start, latencies, {}
+
+
+async def run_pool(sessions: int, turns: int, startup: float, llm_latency: float, workers: int):
+    worker_names = [f"CartPal-{i}" for i in range(workers)]
+    pool = AgentPool(lambda: StubContext(startup, llm_latency, worker_names), worker_names, sweep_interval=0)
+    await pool.start()
+    latencies = []
+
+    async def user(session: int):
+        for turn in range(turns):
+            start = time.perf_counter()
+            async with pool.session(f"session-{session}") as agent:
+                await agent(f"session {session} turn {turn}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(session) for session in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    await pool.stop()
+    return elapsed, latencies, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Agent throughput: one shared agent vs pooled worker agents with per-session history, with a stubbed LLM")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--startup", type=float, default=0.5, help="Simulated fast.run() startup (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Simulated LLM turn latency (s)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker agents in the shared context")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>8} {'layout':>14} {'turns/s':>9} {'p50 ms':>8} {'max ms':>8}  pool")
+    for sessions in args.sessions:
+        layouts = [
+            ("shared", run_shared(sessions, args.turns, args.startup, args.llm_latency)),
+            ("pool", run_pool(sessions, args.turns, args.startup, args.llm_latency, workers=args.workers)),
+            ("pool/session", run_pool(sessions, args.turns, args.startup, args.llm_latency, workers=sessions)),
+        ]
+        for name, layout in layouts:
+            elapsed, latencies, stats = await layout
+            print(
+                f"{sessions:>8} {name:>14} {sessions * args.turns / elapsed:>9.1f} "
+                f"{statistics.median(latencies) * 1000:>8.0f} {max(latencies) * 1000:>8.0f}  {stats or ''}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.vector_engine import VectorEngine
+from data_retrieval.ann_index import IVFFlatIndex, recall_at_k
+from benchmarks.bench_vector_engine import make_catalog
+
+
+def make_clustered_embeddings(num_products: int, dim: int, num_clusters: int = 64, seed: int = 0) -> np.ndarray:
+    # Real catalog embeddings cluster by category, which is what IVF exploits
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, size=num_products)
+    return centers[labels] + 0.6 * rng.standard_normal((num_products, dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and latency of the IVF-flat index against exact search")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    _, metadata = make_catalog(args.size, 1)
+    embeddings = make_clustered_embeddings(args.size, args.dim)
+    engine = VectorEngine(embeddings, metadata)
+    ann_index = IVFFlatIndex.build(engine.matrix, engine.product_ids, nlist=args.nlist)
+
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(args.size, size=args.queries, replace=False)
+    queries = engine.matrix[query_rows] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    in_stock_mask = engine.filter_mask(in_stock=True)
+
+    print(f"{'nprobe':>6} {'recall':>7} {'ann ms':>8} {'exact ms':>9} {'filtered recall':>16}")
+    for nprobe in args.nprobe:
+        engine.attach_ann_index(ann_index, nprobe)
+        report = recall_at_k(engine, queries, args.top_k)
+        filtered = recall_at_k(engine, queries, args.top_k, mask=in_stock_mask)
+        print(
+            f"{nprobe:>6} {report['recall']:>7.3f} {report['ann_ms_per_query']:>8.3f} "
+            f"{report['exact_ms_per_query']:>9.3f} {filtered['recall']:>16.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
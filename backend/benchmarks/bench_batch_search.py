@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.vector_engine import VectorEngine
+
+
+def make_engine(rows: int, dim: int, seed: int = 0) -> VectorEngine:
+    rng = np.random.default_rng(seed)
+    metadata = [
+        {"product_id": i, "category": f"category-{i % 20}", "brand": f"brand-{i % 50}", "price": float(i % 1000), "rating": 3 + (i % 3), "stock": i % 7}
+        for i in range(rows)
+    ]
+    return VectorEngine(rng.normal(size=(rows, dim)).astype(np.float32), metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring N queries one at a time vs one matrix-matrix product")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = make_engine(args.rows, args.dim)
+    rng = np.random.default_rng(1)
+    # Half the queries carry a broad price filter, like "phones under $800" comparisons
+    broad = engine.filter_mask(max_price=800)
+
+    print(f"{'queries':>7} {'sequential ms':>14} {'batched ms':>11} {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        queries = rng.normal(size=(batch_size, args.dim)).astype(np.float32)
+        masks = [broad if i % 2 else None for i in range(batch_size)]
+        top_ks = [args.top_k] * batch_size
+
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            sequential = [engine.exact_search(query, args.top_k, mask=mask) for query, mask in zip(queries, masks)]
+        sequential_ms = (time.perf_counter() - start) * 1000 / args.repeats
+
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            batched = engine.search_batch(queries, top_ks, masks)
+        batched_ms = (time.perf_counter() - start) * 1000 / args.repeats
+
+        if [[row for row, _ in hits] for hits in sequential] != [[row for row, _ in hits] for hits in batched]:
+            print(f"warning: batched results differ from sequential at batch size {batch_size}")
+        print(f"{batch_size:>7} {sequential_ms:>14.2f} {batched_ms:>11.2f} {sequential_ms / batched_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_vector_engine import make_catalog
+
+
+def write_catalogs(size: int, dim: int, directory: str):
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores import SimpleVectorStore
+    from data_retrieval.embedding_store import write_embedding_store
+
+    embeddings, metadata = make_catalog(size, dim)
+    texts = [m["title"] for m in metadata]
+
+    store = SimpleVectorStore()
+    store.add([
+        TextNode(text=text, metadata=m, embedding=embedding.tolist())
+        for text, m, embedding in zip(texts, metadata, embeddings)
+    ])
+    store.persist(os.path.join(directory, "json", "default__vector_store.json"))
+    write_embedding_store(os.path.join(directory, "store"), embeddings, metadata, texts)
+
+
+def load_and_report(kind: str, directory: str):
+    from data_retrieval.model_registry import get_resident_memory_mb
+    from data_retrieval.vector_engine import VectorEngine
+    if kind == "json":
+        from llama_index.core.vector_stores import SimpleVectorStore
+
+    rss_before = get_resident_memory_mb()
+    start = time.perf_counter()
+    if kind == "json":
+        SimpleVectorStore.from_persist_path(os.path.join(directory, "json", "default__vector_store.json"))
+    else:
+        VectorEngine.from_store(os.path.join(directory, "store"))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "rss_mb": get_resident_memory_mb() - rss_before}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start time and RSS: persisted JSON store vs memory-mapped embedding store")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--load", choices=["json", "store"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load_and_report(args.load, args.dir)
+        return
+
+    print(f"{'products':>10} {'json load s':>12} {'json RSS MB':>12} {'mmap load s':>12} {'mmap RSS MB':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            write_catalogs(size, args.dim, directory)
+            results = {}
+            for kind in ("json", "store"):
+                # A fresh interpreter per load so RSS is not polluted by the writer
+                output = subprocess.run(
+                    [sys.executable, __file__, "--load", kind, "--dir", directory],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                results[kind] = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{size:>10} {results['json']['seconds']:>12.3f} {results['json']['rss_mb']:>12.1f} "
+                f"{results['store']['seconds']:>12.3f} {results['store']['rss_mb']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core import errors
+from core.errors import is_retryable_error
+from tests.test_error_classifier import UpstreamError, legacy_is_retryable_error
+
+
+def workload(rng: random.Random, size: int, distinct: int):
+    # Production errors repeat: a handful of messages raised again on every attempt and retry layer
+    templates = [
+        "Server busy: scoring executor is saturated, retry shortly",
+        "Invalid image format: expected JPEG or PNG",
+        "Product not found in catalog",
+        "Error code 500 from upstream model provider",
+        "All 4 agent sessions are busy",
+        "Request failed with status 429: rate limit reached for requests",
+        "name 'foo' is not defined",
+    ]
+    pool = [UpstreamError(f"{rng.choice(templates)} [{i}]") for i in range(distinct)]
+    return [rng.choice(pool) for _ in range(size)]
+
+
+def time_classifier(classify, cases, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for error in cases:
+            classify(error)
+    return (time.perf_counter() - start) * 1e6 / (repeats * len(cases))
+
+
+def main():
+    # Verdicts are checked against the keyword scan in tests/test_error_classifier.py; this only times the two
+    parser = argparse.ArgumentParser(description="Compiled error classifier vs the linear keyword scan")
+    parser.add_argument("--errors", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, nargs="+", default=[16, 20000], help="Distinct messages in the workload")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'distinct':>8} {'legacy us':>10} {'compiled us':>12} {'cold us':>8} {'speedup':>8}")
+    for distinct in args.distinct:
+        cases = workload(rng, args.errors, distinct)
+        legacy_us = time_classifier(legacy_is_retryable_error, cases, args.repeats)
+        errors._classify_message.cache_clear()
+        cold_us = time_classifier(is_retryable_error, cases, 1)
+        compiled_us = time_classifier(is_retryable_error, cases, args.repeats)
+        print(f"{distinct:>8} {legacy_us:>10.2f} {compiled_us:>12.2f} {cold_us:>8.2f} {legacy_us / compiled_us:>7.1f}x")
+    print(f"classifier stats: {errors.get_error_classifier_stats()}")
+
+
+if __name__ == "__main__":
+    main()
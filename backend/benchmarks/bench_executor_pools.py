@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from servers.executor_pools import BoundedExecutor, ExecutorSaturated
+
+
+def fake_embed(cores: threading.Semaphore, seconds: float):
+    # Inference is CPU bound: extra threads beyond the cores only queue inside the model
+    with cores:
+        time.sleep(seconds)
+    return [0.0]
+
+
+def fake_score(seconds: float, embedding):
+    time.sleep(seconds)
+    return []
+
+
+async def run_shared(burst: int, embed_time: float, score_time: float, cores: int):
+    # The old layout: both stages on the default pool, min(32, cpus + 4) threads and an unbounded queue
+    executor = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4))
+    loop = asyncio.get_running_loop()
+    embed_cores = threading.Semaphore(cores)
+
+    async def search():
+        start = time.perf_counter()
+        embedding = await loop.run_in_executor(executor, fake_embed, embed_cores, embed_time)
+        await loop.run_in_executor(executor, fake_score, score_time, embedding)
+        return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*(search() for _ in range(burst)))
+    executor.shutdown()
+    return list(latencies), 0, {}
+
+
+async def run_bounded(burst: int, embed_time: float, score_time: float, embed_workers: int, score_workers: int, max_queue: int):
+    embed_pool = BoundedExecutor("text_embed", embed_workers, max_queue)
+    score_pool = BoundedExecutor("scoring", score_workers, max_queue)
+    embed_cores = threading.Semaphore(embed_workers)
+
+    async def search():
+        start = time.perf_counter()
+        try:
+            embedding = await embed_pool.run(fake_embed, embed_cores, embed_time)
+            await score_pool.run(fake_score, score_time, embedding)
+        except ExecutorSaturated:
+            return None
+        return time.perf_counter() - start
+
+    results = await asyncio.gather(*(search() for _ in range(burst)))
+    embed_pool.shutdown()
+    score_pool.shutdown()
+    latencies = [latency for latency in results if latency is not None]
+    return latencies, len(results) - len(latencies), {"embed": embed_pool.stats(), "scoring": score_pool.stats()}
+
+
+def p99(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Search latency under a burst: shared unbounded pool vs bounded per-stage pools")
+    parser.add_argument("--bursts", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--embed-ms", type=float, default=20.0)
+    parser.add_argument("--score-ms", type=float, default=2.0)
+    parser.add_argument("--embed-workers", type=int, default=2, help="Also the cores available to inference in both layouts")
+    parser.add_argument("--score-workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=16)
+    args = parser.parse_args()
+
+    embed_time = args.embed_ms / 1000
+    score_time = args.score_ms / 1000
+
+    print(f"{'burst':>6} {'layout':>8} {'served':>7} {'busy':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for burst in args.bursts:
+        layouts = [
+            ("shared", run_shared(burst, embed_time, score_time, args.embed_workers)),
+            ("bounded", run_bounded(burst, embed_time, score_time, args.embed_workers, args.score_workers, args.max_queue)),
+        ]
+        for name, layout in layouts:
+            latencies, rejected, stats = await layout
+            print(
+                f"{burst:>6} {name:>8} {len(latencies):>7} {rejected:>5} "
+                f"{statistics.median(latencies) * 1000:>8.1f} {p99(latencies) * 1000:>8.1f}"
+            )
+            for pool_name, pool_stats in stats.items():
+                print(
+                    f"{'':>15} {pool_name}: wait p99 {pool_stats['queue_wait_p99_ms']}ms, "
+                    f"exec p99 {pool_stats['exec_p99_ms']}ms, rejected {pool_stats['rejected']}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.product_catalog import ProductCatalog
+from servers.fast_path import FastPathRouter
+
+CATALOG = [
+    ("Apple AirPods", "Apple", "mobile-accessories"),
+    ("Beats Flex Wireless Earphones", "Beats", "mobile-accessories"),
+    ("Apple HomePod Mini Cosmic Grey", "Apple", "mobile-accessories"),
+    ("Apple MacBook Pro 14 Inch Space Grey", "Apple", "laptops"),
+    ("Asus Zenbook Pro Dual Screen Laptop", "Asus", "laptops"),
+    ("Lenovo Yoga 920", "Lenovo", "laptops"),
+    ("iPhone 13 Pro", "Apple", "smartphones"),
+    ("Samsung Galaxy S10", "Samsung", "smartphones"),
+    ("Oppo F19 Pro Plus", "Oppo", "smartphones"),
+    ("Man Plaid Shirt", "Generic", "mens-shirts"),
+    ("Nike Air Jordan 1 Red And Black", "Nike", "mens-shoes"),
+]
+
+# Plain searches with the filters the agent's prompt says to extract for them
+SEARCHES = [
+    ("Apple headphones under $200", {"brand": "Apple", "category": "mobile-accessories", "max_price": 200.0}),
+    ("laptops between $500 and $1000", {"category": "laptops", "min_price": 500.0, "max_price": 1000.0}),
+    ("highly rated smartphones", {"category": "smartphones", "min_rating": 4.0}),
+    ("show me samsung phones in stock", {"brand": "Samsung", "category": "smartphones", "in_stock": True}),
+    ("wireless earphones 4+ stars", {"category": "mobile-accessories", "min_rating": 4.0}),
+    ("find lenovo laptops over $800", {"brand": "Lenovo", "category": "laptops", "min_price": 800.0}),
+    ("mens shirts under 50 dollars", {"category": "mens-shirts", "max_price": 50.0}),
+    ("nike shoes", {"brand": "Nike"}),
+    ("iphone pro rated at least 4.5", {"min_rating": 4.5}),
+    ("apple laptops $1k-$2.5k", {"brand": "Apple", "category": "laptops", "min_price": 1000.0, "max_price": 2500.0}),
+    ("speakers in stock", {"category": "mobile-accessories", "in_stock": True}),
+    ("can you find asus laptops under $1,500", {"brand": "Asus", "category": "laptops", "max_price": 1500.0}),
+]
+# Prompts only the agent should answer
+CONVERSATIONS = [
+    "Apple vs Samsung phones under $800",
+    "show me cheaper ones",
+    "what is the best laptop for coding?",
+    "hi there",
+    "which of these has the best battery?",
+    "laptops and headphones for college",
+    "cheap headphones",
+    "I need a gift for my dad who likes running",
+    "tell me more about the second one",
+    "headphones that work well on flights with noise cancelling for long trips",
+    "does the macbook come with a charger",
+    "something like that but in red",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing accuracy, filter extraction and modeled latency of the fast path")
+    parser.add_argument("--llm-call-ms", type=float, default=1800.0, help="Latency of one LLM round-trip")
+    parser.add_argument("--llm-calls", type=int, default=2, help="LLM round-trips per agent search turn (tool call, then answer)")
+    parser.add_argument("--search-ms", type=float, default=60.0, help="Embedding plus scoring for one text search")
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    catalog = ProductCatalog([])
+    catalog.products = {
+        str(i): {"title": title, "brand": brand, "category": category}
+        for i, (title, brand, category) in enumerate(CATALOG)
+    }
+    router = FastPathRouter(catalog=catalog, mode="on")
+    router.refresh()
+
+    routed = correct = 0
+    for prompt, expected in SEARCHES:
+        decision = router.route(prompt)
+        filters = {key: value for key, value in (decision["search"] or {}).items() if key not in ("query", "limit")}
+        routed += decision["take"]
+        correct += decision["take"] and filters == expected
+        mark = "ok" if decision["take"] and filters == expected else "MISS"
+        print(f"{mark:>4} {prompt!r:45} conf={decision['confidence']:.2f} {decision['search'] or decision['reason']}")
+
+    false_positives = 0
+    for prompt in CONVERSATIONS:
+        decision = router.route(prompt)
+        false_positives += decision["take"]
+        print(f"{'BAD' if decision['take'] else 'ok':>4} {prompt!r:45} -> agent ({decision['reason']})")
+
+    prompts = [prompt for prompt, _ in SEARCHES] + CONVERSATIONS
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        for prompt in prompts:
+            router.route(prompt)
+    route_us = (time.perf_counter() - start) * 1e6 / (args.repeats * len(prompts))
+
+    agent_ms = args.llm_calls * args.llm_call_ms + args.search_ms
+    fast_ms = route_us / 1000 + args.search_ms
+    print(f"\nsearches routed: {routed}/{len(SEARCHES)}, filters exact: {correct}/{len(SEARCHES)}")
+    print(f"conversations routed (should be 0): {false_positives}/{len(CONVERSATIONS)}")
+    print(f"route(): {route_us:.1f}us per prompt")
+    print(f"modeled turn latency: agent {agent_ms:.0f}ms, fast path {fast_ms:.0f}ms ({agent_ms / fast_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
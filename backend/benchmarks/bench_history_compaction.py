@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from servers.history_manager import HistoryManager
+
+QUERIES = ["wireless headphones", "gaming laptop", "running shoes", "smartphone", "smart watch", "desk lamp", "backpack"]
+
+
+def search_output(rng: random.Random, turn: int, top_k: int) -> str:
+    # Shaped like semantic_search_text's reply: pretty-printed JSON with full product records
+    products = [
+        {
+            "product_id": turn * 100 + i,
+            "title": f"{rng.choice(['Apple', 'Samsung', 'Sony', 'Nike'])} {rng.choice(QUERIES).title()} Model {turn}{i}",
+            "price": round(rng.uniform(10, 2000), 2),
+            "category": rng.choice(["laptops", "smartphones", "mobile-accessories", "mens-shoes"]),
+            "rating": round(rng.uniform(2.5, 5), 2),
+            "stock": rng.randint(0, 120),
+            "brand": rng.choice(["Apple", "Samsung", "Sony", "Nike"]),
+            "thumbnail": f"https://cdn.dummyjson.com/product-images/{turn * 100 + i}/thumbnail.webp",
+            "similarity_score": round(rng.uniform(0.3, 0.9), 4),
+            "description": " ".join(rng.choice(QUERIES) for _ in range(40)),
+        }
+        for i in range(top_k)
+    ]
+    filters = {"category": None, "min_price": None, "max_price": 200, "min_rating": None, "brand": None, "in_stock": None}
+    return json.dumps({"status": "success", "num_results": len(products), "filters_applied": filters, "products": products}, indent=2)
+
+
+def turn_messages(rng: random.Random, turn: int, top_k: int):
+    query = rng.choice(QUERIES)
+    call_id = f"call_{turn}"
+    reply = "%%RESPONSE\n## HERE'S WHAT I FOUND\n" + "\n".join(f"### Product {i} - $99.99\n- A short reason it matches" for i in range(top_k)) + "\n%%"
+    return [
+        {"role": "user", "content": f"Show me {query} under $200"},
+        {"role": "assistant", "content": None, "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "semantic_search_text", "arguments": json.dumps({"query": query, "max_price": 200, "top_k": top_k})}}]},
+        {"role": "tool", "tool_call_id": call_id, "content": search_output(rng, turn, top_k)},
+        {"role": "assistant", "content": reply},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt size per turn with the full agent history vs the history manager")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-turns", type=int, default=8)
+    parser.add_argument("--token-budget", type=int, default=8000)
+    parser.add_argument("--report-every", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    manager = HistoryManager(max_turns=args.max_turns, token_budget=args.token_budget)
+    full, managed = [], []
+    compaction_seconds = 0.0
+
+    print(f"{'turn':>5} {'full history tokens':>20} {'managed tokens':>15}")
+    for turn in range(1, args.turns + 1):
+        messages = turn_messages(rng, turn, args.top_k)
+        full += messages
+        managed += messages
+        start = time.perf_counter()
+        managed, _ = manager.compact_messages(managed)
+        compaction_seconds += time.perf_counter() - start
+
+        if turn % args.report_every == 0 or turn == args.turns:
+            full_tokens = sum(manager.estimate_tokens(message) for message in full)
+            managed_tokens = sum(manager.estimate_tokens(message) for message in managed)
+            print(f"{turn:>5} {full_tokens:>20} {managed_tokens:>15}")
+
+    print(f"\ncompaction: {compaction_seconds * 1000 / args.turns:.2f}ms per turn")
+    print(f"oldest kept tool output: {next(m['content'] for m in managed if m['role'] == 'tool')[:160]}")
+
+
+if __name__ == "__main__":
+    main()
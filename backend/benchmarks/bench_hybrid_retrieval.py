@@ -0,0 +1,102 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.lexical_index import BM25Index, reciprocal_rank_fusion
+from data_retrieval.vector_engine import VectorEngine
+
+BRANDS = ["Apple", "Samsung", "Beats", "Sony", "Lenovo", "Asus", "Dell", "Oppo", "Huawei", "Realme", "Nike", "Adidas"]
+SERIES = ["Flex", "Galaxy", "Zenbook", "Yoga", "Xperia", "Inspiron", "Reno", "Nova", "Air", "Pro", "Ultra", "Studio"]
+NOUNS = ["headphones", "earphones", "speaker", "laptop", "smartphone", "tablet", "watch", "charger", "sneakers", "jacket"]
+WORDS = (
+    "wireless noise cancelling lightweight durable premium battery life fast charging display comfortable design "
+    "sound quality performance storage camera travel everyday sleek compact powerful bass portable"
+).split()
+
+
+def make_catalog(rng: random.Random, count: int):
+    texts, brands, titles = [], [], []
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        noun = rng.choice(NOUNS)
+        # Unique model number per product, like the SKU-ish titles of the real catalog
+        title = f"{brand} {rng.choice(SERIES)} {noun.title()} M{i}"
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 30)))
+        texts.append(f"{title}. {description}. Category: {noun}s. Brand: {brand}")
+        brands.append(brand)
+        titles.append(title)
+    return texts, brands, titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 index build, query latency, exact-token precision and embedding calls saved")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (bge-small-en-v1.5 is 384)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=50, help="Rows each retriever contributes to the fusion")
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="Measured BGE query embedding time to charge per dense query")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts, brands, titles = make_catalog(rng, args.products)
+    product_ids = np.arange(args.products)
+
+    start = time.perf_counter()
+    index = BM25Index.build(texts, product_ids, brands=brands)
+    build_s = time.perf_counter() - start
+    size_mb = sum(a.nbytes for a in (index.offsets, index.rows, index.weights)) / 1e6
+    print(f"build: {args.products} products in {build_s:.2f}s, {len(index.terms)} terms, {index.rows.shape[0]} postings, {size_mb:.1f}MB")
+
+    embeddings = np.random.default_rng(0).standard_normal((args.products, args.dim)).astype(np.float32)
+    engine = VectorEngine(embeddings, [{"product_id": int(i), "brand": b} for i, b in zip(product_ids, brands)], texts)
+    engine.attach_lexical_index(index)
+
+    # Exact-token lookups: a product's own title, brand plus model, or model number alone
+    sample = rng.sample(range(args.products), args.queries)
+    lookups = []
+    for row in sample:
+        brand, series, _, model = titles[row].split(" ")
+        lookups.append((rng.choice([titles[row], f"{brand} {model}", model, f"{series} {model}"]), row))
+    descriptive = [f"{rng.choice(WORDS)} {rng.choice(NOUNS)}" for _ in range(args.queries)]
+
+    lexical_only = sum(index.is_lexical_query(query) for query, _ in lookups)
+    descriptive_lexical = sum(index.is_lexical_query(query) for query in descriptive)
+    top1 = sum(bool(hits) and hits[0][0] == row for query, row in lookups for hits in [engine.lexical_search(query, args.top_k)])
+    print(f"exact-token lookups answered lexically: {lexical_only}/{len(lookups)}, BM25 top-1 correct: {top1}/{len(lookups)}")
+    print(f"descriptive queries sent to the embedding model: {len(descriptive) - descriptive_lexical}/{len(descriptive)}")
+
+    queries = [query for query, _ in lookups]
+    query_vectors = np.random.default_rng(1).standard_normal((len(queries), args.dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    for query in queries:
+        index.is_lexical_query(query)
+        engine.lexical_search(query, args.top_k)
+    lexical_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    for vector in query_vectors:
+        engine.search(vector, args.top_k)
+    dense_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    for query, vector in zip(descriptive, query_vectors):
+        dense_hits = engine.search(vector, args.candidates)
+        reciprocal_rank_fusion([dense_hits, engine.lexical_search(query, args.candidates)], args.top_k)
+    hybrid_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"\nper query (excluding embedding): lexical {lexical_ms:.2f}ms, dense {dense_ms:.2f}ms, hybrid {hybrid_ms:.2f}ms")
+    print(
+        f"exact-token lookup end to end: dense {dense_ms + args.embed_ms:.1f}ms -> lexical {lexical_ms:.2f}ms "
+        f"({(dense_ms + args.embed_ms) / lexical_ms:.0f}x), embedding model skipped"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_result_encoding import load_token_counter, make_response
+from data_retrieval.embedding_store import write_embedding_store
+from data_retrieval.product_catalog import ProductCatalog
+from servers.result_encoding import TOOL_RESULT_FIELDS, encode_tool_result
+
+
+def image_block(products, by_id: bool) -> str:
+    if by_id:
+        lines = [f"##PRODUCT_ID: {product['product_id']}##" for product in products]
+    else:
+        lines = [f"##IMAGE_URL: {product['thumbnail']}##" for product in products]
+    return "%%RESPONSE_IMAGE\n" + "\n".join(lines) + "\n%%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Output tokens and decode time of the image block: thumbnail URLs vs product ids")
+    parser.add_argument("--products", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--ms-per-output-token", type=float, default=12.0, help="Decode time per output token of the serving model")
+    parser.add_argument("--encoding", default="o200k_base", help="tiktoken encoding used for token counts")
+    parser.add_argument("--catalog-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    count_tokens = load_token_counter(args.encoding)
+    rng = random.Random(0)
+
+    print(f"{'products':>8} {'url tokens':>11} {'id tokens':>10} {'saved ms':>9} {'tool input saved':>17}")
+    for count in args.products:
+        response = make_response(rng, count)
+        products = response["products"]
+        url_tokens = count_tokens(image_block(products, by_id=False))
+        id_tokens = count_tokens(image_block(products, by_id=True))
+        # The search result no longer needs to carry a thumbnail column for the model to copy from
+        with_thumbnails = count_tokens(encode_tool_result(response, "table", TOOL_RESULT_FIELDS + ["thumbnail"]))
+        without_thumbnails = count_tokens(encode_tool_result(response, "table", TOOL_RESULT_FIELDS))
+        saved_ms = (url_tokens - id_tokens) * args.ms_per_output_token
+        print(f"{count:>8} {url_tokens:>11} {id_tokens:>10} {saved_ms:>9.0f} {with_thumbnails - without_thumbnails:>17}")
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        metadata = [
+            {"product_id": i, "title": f"product {i}", "price": float(i % 500), "thumbnail": f"https://cdn.dummyjson.com/product-images/{i}/thumbnail.webp"}
+            for i in range(args.catalog_size)
+        ]
+        write_embedding_store(store_dir, np.zeros((args.catalog_size, 4), dtype=np.float32), metadata, [""] * args.catalog_size)
+        catalog = ProductCatalog([store_dir])
+        start = time.perf_counter()
+        catalog.refresh()
+        load_ms = (time.perf_counter() - start) * 1000
+
+        ids = [str(rng.randrange(args.catalog_size)) for _ in range(10000)]
+        start = time.perf_counter()
+        catalog.thumbnails(ids)
+        lookup_us = (time.perf_counter() - start) * 1e6 / len(ids)
+    print(f"\ncatalog of {args.catalog_size}: loaded in {load_ms:.0f}ms, {lookup_us:.2f}us per id resolved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+ENTRY_POINTS = [
+    "core.retry",
+    "data_retrieval.llama_search_text",
+    "data_retrieval.llama_search_image",
+    "servers.semantic_search",
+    "app",
+]
+
+# Packages that must stay out of the search server's startup path until a model or legacy index is loaded
+HEAVY_PACKAGES = ["torch", "sentence_transformers", "transformers", "llama_index", "fastapi", "mcp_agent"]
+
+
+def import_profile(python: str, module: str) -> Tuple[float, Dict[str, int], str]:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+
+    cumulative: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    error = "" if completed.returncode == 0 else completed.stderr.strip().splitlines()[-1]
+    return wall, cumulative, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of each backend entry point, from python -X importtime")
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--python", default=sys.executable, help="Interpreter of the environment to measure")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level packages to list per entry point")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per entry point; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'entry point':>34} {'wall ms':>8} {'import ms':>10}  heavy packages loaded")
+    details: List[str] = []
+    for module in args.modules:
+        runs = [import_profile(args.python, module) for _ in range(args.repeats)]
+        wall, cumulative, error = min(runs, key=lambda run: run[0])
+        if error:
+            print(f"{module:>34} {'-':>8} {'-':>10}  failed: {error}")
+            continue
+
+        heavy = [package for package in HEAVY_PACKAGES if package in cumulative]
+        print(f"{module:>34} {wall * 1000:>8.0f} {cumulative.get(module, 0) / 1000:>10.0f}  {', '.join(heavy) or '-'}")
+
+        top_level = sorted(
+            ((name, us) for name, us in cumulative.items() if "." not in name and name != module),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        details.append(f"{module}: " + ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in top_level[:args.top]))
+
+    print()
+    for line in details:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
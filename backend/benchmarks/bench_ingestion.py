@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.ingestion import ImageIngestionPipeline
+
+
+def make_thumbnail(seed: int) -> bytes:
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, size=(300, 300, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeCDN:
+    def __init__(self, num_images: int, latency: float, missing_every: int = 0):
+        images = {i: make_thumbnail(i) for i in range(num_images)}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(latency)
+                try:
+                    image_id = int(self.path.strip("/").split("/")[1])
+                except (IndexError, ValueError):
+                    image_id = -1
+                if image_id not in images or (missing_every and image_id % missing_every == missing_every - 1):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = images[image_id]
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+class FakeClip:
+    # Fixed per-call overhead plus per-image cost, roughly how CPU CLIP inference scales with batch size
+    def __init__(self, call_overhead: float, per_image: float, dim: int = 512):
+        self.call_overhead = call_overhead
+        self.per_image = per_image
+        self.dim = dim
+
+    def encode(self, images, batch_size: int = 32):
+        single = not isinstance(images, list)
+        batch = [images] if single else images
+        time.sleep(self.call_overhead + self.per_image * len(batch))
+        embeddings = np.random.default_rng(len(batch)).standard_normal((len(batch), self.dim)).astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def serial_ingest(products, clip_model):
+    import requests
+    from PIL import Image
+
+    embedded = []
+    for p in products:
+        try:
+            response = requests.get(p['thumbnail'], timeout=10)
+            response.raise_for_status()
+            img = Image.open(BytesIO(response.content)).convert('RGB')
+            embedded.append((p, clip_model.encode(img)))
+        except Exception:
+            pass
+    return embedded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs pipelined catalog image ingestion against a fake local CDN")
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.03, help="Simulated CDN latency per request (s)")
+    parser.add_argument("--download-workers", type=int, default=16)
+    parser.add_argument("--decode-workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--real-model", action="store_true", help="Use the real CLIP model instead of a timed fake")
+    args = parser.parse_args()
+
+    if args.real_model:
+        from data_retrieval.model_registry import get_clip_model
+        clip_model = get_clip_model()
+    else:
+        clip_model = FakeClip(call_overhead=0.02, per_image=0.004)
+
+    with FakeCDN(args.products, args.latency, missing_every=50) as cdn:
+        products = [
+            {"id": i, "title": f"Product {i}", "thumbnail": f"{cdn.base_url}/product-images/{i}/thumbnail.png"}
+            for i in range(args.products)
+        ]
+
+        start = time.perf_counter()
+        serial = serial_ingest(products, clip_model)
+        serial_seconds = time.perf_counter() - start
+
+        pipeline = ImageIngestionPipeline(
+            clip_model,
+            download_workers=args.download_workers,
+            decode_workers=args.decode_workers,
+            batch_size=args.batch_size,
+            progress_every=0
+        )
+        pipelined = pipeline.run(products)
+
+    report = pipeline.report()
+    print(f"serial:    {len(serial)} images in {serial_seconds:.2f}s ({len(serial) / serial_seconds:.1f} img/s)")
+    print(
+        f"pipelined: {len(pipelined)} images in {report['wall_seconds']:.2f}s "
+        f"({len(pipelined) / report['wall_seconds']:.1f} img/s, {report['failed']} failed)"
+    )
+    print(json.dumps(report["stages"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
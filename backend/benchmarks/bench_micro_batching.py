@@ -0,0 +1,84 @@
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.micro_batcher import MicroBatcher
+from data_retrieval.llama_search_text import TEXT_QUERY_INSTRUCTION
+
+
+class SimulatedEncoder:
+    # A forward pass costs a fixed overhead plus a smaller per-item cost, and one runs at a time
+    def __init__(self, overhead_ms: float, per_item_ms: float):
+        self.overhead = overhead_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.lock = threading.Lock()
+
+    def __call__(self, queries):
+        with self.lock:
+            time.sleep(self.overhead + self.per_item * len(queries))
+        return [[0.0] for _ in queries]
+
+
+def load_encoder(model_name: str):
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    embed_model = HuggingFaceEmbedding(model_name=model_name, query_instruction=TEXT_QUERY_INSTRUCTION, embed_batch_size=256)
+    lock = threading.Lock()
+
+    def encode(queries):
+        with lock:
+            if len(queries) == 1:
+                return [embed_model.get_query_embedding(queries[0])]
+            return embed_model.get_text_embedding_batch([TEXT_QUERY_INSTRUCTION + query for query in queries])
+    return encode
+
+
+def run(encode_batch, concurrency: int, queries_per_client: int, window_ms: float, max_batch: int):
+    batcher = MicroBatcher(encode_batch, "bench", window_ms=window_ms, max_batch=max_batch)
+    latencies = []
+
+    def client(client_id: int):
+        for i in range(queries_per_client):
+            start = time.perf_counter()
+            batcher.encode(f"client {client_id} query {i} wireless headphones under $100")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return concurrency * queries_per_client / elapsed, latencies, batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query embedding throughput and latency with and without micro-batching")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--queries", type=int, default=20, help="Queries per concurrent client")
+    parser.add_argument("--windows-ms", type=float, nargs="+", default=[0, 2, 5, 10])
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--overhead-ms", type=float, default=8.0, help="Simulated fixed cost per forward pass")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="Simulated extra cost per query in a batch")
+    parser.add_argument("--model", default="", help="Use a real HuggingFace embedding model instead, e.g. BAAI/bge-small-en-v1.5")
+    args = parser.parse_args()
+
+    encode_batch = load_encoder(args.model) if args.model else SimulatedEncoder(args.overhead_ms, args.per_item_ms)
+    layouts = [("batch size 1", 0, 1)] + [(f"window {window:g}ms", window, args.max_batch) for window in args.windows_ms]
+
+    print(f"{'clients':>7} {'layout':>14} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for concurrency in args.concurrency:
+        for name, window, max_batch in layouts:
+            throughput, latencies, stats = run(encode_batch, concurrency, args.queries, window, max_batch)
+            ordered = sorted(latencies)
+            print(
+                f"{concurrency:>7} {name:>14} {throughput:>10.0f} {statistics.median(ordered) * 1000:>8.1f} "
+                f"{ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000:>8.1f} {stats['mean_batch'] or 1:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from typing import List, Optional
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from tooling_updates.websocket_http_sender import ProgressChannel
+
+
+def make_receiver():
+    # Same request models and routes as app.py's internal endpoints, without the agent stack
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    class WebSocketMessage(BaseModel):
+        message: str
+        session_id: Optional[str] = None
+        coalesce_key: Optional[str] = None
+        broadcast: bool = False
+
+    class WebSocketBatch(BaseModel):
+        messages: List[WebSocketMessage]
+
+    receiver = FastAPI()
+    receiver.state.received = 0
+
+    @receiver.post("/internal/websocket_send")
+    async def internal_websocket_send(data: WebSocketMessage):
+        receiver.state.received += 1
+        return {"status": "sent", "connections": 1}
+
+    @receiver.post("/internal/websocket_send_batch")
+    async def internal_websocket_send_batch(data: WebSocketBatch):
+        receiver.state.received += len(data.messages)
+        return {"status": "sent", "connections": [1] * len(data.messages)}
+
+    return receiver
+
+
+def start_receiver(port: int):
+    import uvicorn
+
+    receiver = make_receiver()
+    server = uvicorn.Server(uvicorn.Config(receiver, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return receiver, server
+
+
+async def legacy_send(base_url: str, message_content: str):
+    # The previous sender: a fresh client, TCP connect and request per message
+    async with httpx.AsyncClient() as client:
+        await client.post(f"{base_url}/internal/websocket_send", json={"message": message_content}, timeout=5.0)
+
+
+async def wait_for(receiver, expected: int, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while receiver.state.received < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+
+
+async def run_legacy(receiver, base_url: str, messages: int, gap: float):
+    blocked = []
+    start = time.perf_counter()
+    for i in range(messages):
+        sent = time.perf_counter()
+        await legacy_send(base_url, f"progress {i}")
+        blocked.append(time.perf_counter() - sent)
+        if gap:
+            await asyncio.sleep(gap)
+    return blocked, time.perf_counter() - start, {}
+
+
+async def run_channel(receiver, base_url: str, messages: int, gap: float, batch_window: float):
+    channel = ProgressChannel(url=f"{base_url}/internal/websocket_send_batch", batch_window=batch_window, max_pending=messages)
+    expected = receiver.state.received + messages
+    blocked = []
+    start = time.perf_counter()
+    for i in range(messages):
+        sent = time.perf_counter()
+        channel.publish(f"progress {i}")
+        blocked.append(time.perf_counter() - sent)
+        # Tools yield to the loop between updates, which is when the channel's sender gets to run
+        await asyncio.sleep(gap)
+    await wait_for(receiver, expected)
+    elapsed = time.perf_counter() - start
+    await channel.aclose()
+    return blocked, elapsed, channel.stats()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-message cost of tool progress delivery: client-per-message HTTP vs batched persistent channel")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--gap-ms", type=float, default=0.0, help="Delay between published messages")
+    parser.add_argument("--batch-window-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    receiver, server = start_receiver(port)
+    base_url = f"http://127.0.0.1:{port}"
+    gap = args.gap_ms / 1000
+
+    runs = [
+        ("per-message client", await run_legacy(receiver, base_url, args.messages, gap)),
+        ("persistent, unbatched", await run_channel(receiver, base_url, args.messages, gap, 0)),
+        ("persistent, batched", await run_channel(receiver, base_url, args.messages, gap, args.batch_window_ms / 1000)),
+    ]
+    server.should_exit = True
+
+    print(f"{'sender':>22} {'tool blocked us/msg':>20} {'p99 us':>8} {'delivered msg/s':>16}  stats")
+    for name, (blocked, elapsed, stats) in runs:
+        blocked_us = sorted(b * 1e6 for b in blocked)
+        print(
+            f"{name:>22} {statistics.mean(blocked_us):>20.1f} {blocked_us[int(len(blocked_us) * 0.99) - 1]:>8.1f} "
+            f"{len(blocked) / elapsed:>16.0f}  {stats or ''}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
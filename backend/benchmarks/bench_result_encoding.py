@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from servers.result_encoding import TOOL_RESULT_FIELDS, decode_tool_result, encode_tool_result
+
+WORDS = "wireless noise cancelling over ear headphones with long battery life deep bass and a foldable design for travel".split()
+
+
+def load_token_counter(encoding_name: str):
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # Not installed, or the encoding file cannot be downloaded
+        print(f"tiktoken unavailable ({type(e).__name__}), estimating tokens as characters / 4")
+        return lambda text: len(text) // 4
+    return lambda text: len(encoding.encode(text))
+
+
+def make_products(rng: random.Random, count: int, image: bool = False):
+    products = []
+    for i in range(count):
+        product_id = rng.randint(1, 194)
+        product = {
+            "product_id": product_id,
+            "title": f"{rng.choice(['Apple', 'Beats', 'Samsung', 'Sony'])} {' '.join(rng.sample(WORDS, 3)).title()}",
+            "price": round(rng.uniform(10, 2000), 2),
+            "category": rng.choice(["laptops", "smartphones", "mobile-accessories"]),
+            "rating": round(rng.uniform(2.5, 5), 2),
+            "stock": rng.randint(0, 120),
+            "brand": rng.choice(["Apple", "Beats", "Samsung", "Sony"]),
+            "thumbnail": f"https://cdn.dummyjson.com/product-images/{product_id}/thumbnail.webp",
+            "similarity_score": rng.uniform(0.3, 0.9),
+        }
+        if not image:
+            # Same shape as the text search's 200-character snippet of the indexed product text
+            product["text_snippet"] = " ".join(rng.choice(WORDS) for _ in range(40))[:200] + "..."
+        products.append(product)
+    return products
+
+
+def make_response(rng: random.Random, count: int):
+    filters = {"category": None, "min_price": None, "max_price": 200.0, "min_rating": None, "brand": "Apple", "in_stock": False}
+    return {"status": "success", "query": "wireless headphones", "num_results": count, "filters_applied": filters, "products": make_products(rng, count)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialized size and LLM tokens of search tool results per encoding")
+    parser.add_argument("--result-sizes", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--batch", type=int, default=3, help="Searches in the batch-tool case")
+    parser.add_argument("--encoding", default="o200k_base", help="tiktoken encoding used for token counts")
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    count_tokens = load_token_counter(args.encoding)
+    rng = random.Random(0)
+    cases = [(f"{size} results", make_response(rng, size)) for size in args.result_sizes]
+    batch = {"status": "success", "num_searches": args.batch, "searches": [make_response(rng, 5) for _ in range(args.batch)]}
+    cases.append((f"batch {args.batch}x5", batch))
+
+    print(f"fields: {','.join(TOOL_RESULT_FIELDS)}")
+    print(f"{'case':>12} {'format':>8} {'bytes':>7} {'tokens':>7} {'vs json':>8} {'encode us':>10}")
+    for name, response in cases:
+        baseline = None
+        for result_format in ("json", "compact", "table"):
+            text = encode_tool_result(response, result_format)
+            tokens = count_tokens(text)
+            baseline = baseline or tokens
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                encode_tool_result(response, result_format)
+            encode_us = (time.perf_counter() - start) * 1e6 / args.repeats
+
+            decoded = decode_tool_result(text)
+            products = decoded.get("products") or [p for search in decoded.get("searches", []) for p in search["products"]]
+            expected = response.get("products") or [p for search in response["searches"] for p in search["products"]]
+            if len(products) != len(expected):
+                print(f"warning: {result_format} decoded {len(products)} of {len(expected)} products")
+            print(f"{name:>12} {result_format:>8} {len(text.encode()):>7} {tokens:>7} {tokens / baseline:>7.0%} {encode_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
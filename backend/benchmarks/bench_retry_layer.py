@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core import retry
+from core.retry import async_retry_operation, deadline_scope, retry_operation
+from servers.executor_pools import BoundedExecutor
+
+
+def legacy_retry_operation(func, max_retries=2, base_delay=1, max_delay=5):
+    # The pre-budget helper: fixed exponential sleeps on the worker thread, no deadline, no nesting rule
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(min(base_delay * (2 ** attempt), max_delay))
+
+
+async def legacy_async_retry_operation(async_func, max_retries=3, base_delay=1, max_delay=10):
+    for attempt in range(max_retries + 1):
+        try:
+            return await async_func()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(min(base_delay * (2 ** attempt), max_delay))
+
+
+async def run(layer: str, requests: int, workers: int, fail_ms: float, delay_scale: float, deadline: float):
+    pool = BoundedExecutor(f"bench-{layer}", workers, requests * 16, "thread")
+    attempts = 0
+    busy_seconds = 0.0
+
+    def failing_search():
+        nonlocal attempts
+        attempts += 1
+        time.sleep(fail_ms / 1000)
+        raise Exception("vector search timeout")
+
+    def search_task():
+        nonlocal busy_seconds
+        start = time.perf_counter()
+        try:
+            if layer == "legacy":
+                return legacy_retry_operation(failing_search, base_delay=delay_scale, max_delay=5 * delay_scale)
+            return retry_operation(failing_search, base_delay=delay_scale, max_delay=5 * delay_scale, dependency="bench_index")
+        finally:
+            busy_seconds += time.perf_counter() - start
+
+    async def tool_call():
+        async def _search():
+            return await pool.run(search_task)
+        try:
+            if layer == "legacy":
+                await legacy_async_retry_operation(_search, max_retries=2, base_delay=delay_scale, max_delay=10 * delay_scale)
+            else:
+                with deadline_scope(deadline):
+                    await async_retry_operation(_search, max_retries=2, base_delay=delay_scale, max_delay=10 * delay_scale)
+        except Exception:
+            pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(tool_call() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return attempts, busy_seconds, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attempts and worker time spent on a failing search: legacy nested retries vs the budgeted layer")
+    parser.add_argument("--requests", type=int, default=32, help="Concurrent tool calls hitting the failing search")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--fail-ms", type=float, default=5.0, help="Time a failing search attempt takes")
+    parser.add_argument("--delay-scale", type=float, default=0.01, help="Multiplier on the production backoff delays, to keep the run short")
+    parser.add_argument("--deadline", type=float, default=1.0, help="Per-request deadline for the new layer, in seconds")
+    args = parser.parse_args()
+
+    print(f"{'layer':>8} {'attempts':>9} {'per request':>12} {'worker s':>9} {'wall s':>7}")
+    for layer in ("legacy", "budgeted"):
+        retry._breakers.clear()
+        retry.retry_budget = retry.RetryBudget()
+        attempts, busy, elapsed = asyncio.run(run(layer, args.requests, args.workers, args.fail_ms, args.delay_scale, args.deadline))
+        print(f"{layer:>8} {attempts:>9} {attempts / args.requests:>12.1f} {busy:>9.2f} {elapsed:>7.2f}")
+    print(f"retry stats after budgeted run: {retry.get_retry_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.vector_engine import VectorEngine
+
+CATEGORIES = ["smartphones", "laptops", "mobile-accessories", "fragrances", "groceries"]
+BRANDS = ["Apple", "Samsung", "Beats", "Dell", "Generic"]
+
+
+def make_catalog(num_products: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((num_products, dim), dtype=np.float32)
+    metadata = [
+        {
+            "product_id": i,
+            "title": f"Product {i}",
+            "price": float(rng.uniform(1, 2000)),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "rating": float(rng.uniform(0, 5)),
+            "stock": int(rng.integers(0, 100)),
+            "brand": BRANDS[(i // len(CATEGORIES)) % len(BRANDS)],
+        }
+        for i in range(num_products)
+    ]
+    return embeddings, metadata
+
+
+def time_queries(run_query, queries) -> float:
+    run_query(queries[0])
+    start = time.perf_counter()
+    for query in queries:
+        run_query(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def bench_engine(embeddings, metadata, queries, top_k):
+    engine = VectorEngine(embeddings, metadata)
+    unfiltered_ms = time_queries(lambda q: engine.search(q, top_k), queries)
+
+    # A selective "Apple laptops under $500" style query: mask from the metadata index, then score
+    def filtered_query(q):
+        mask = engine.filter_mask(category="laptops", brand="Apple", max_price=500)
+        return engine.search(q, top_k, mask=mask)
+
+    return unfiltered_ms, time_queries(filtered_query, queries)
+
+
+def bench_simple_vector_store(embeddings, metadata, queries, top_k):
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores import SimpleVectorStore
+    from llama_index.core.vector_stores.types import VectorStoreQuery
+
+    store = SimpleVectorStore()
+    store.add([
+        TextNode(text=m["title"], metadata=m, embedding=embedding.tolist())
+        for m, embedding in zip(metadata, embeddings)
+    ])
+
+    def run_query(query):
+        store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k))
+
+    return time_queries(run_query, queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare VectorEngine with the LlamaIndex SimpleVectorStore scan")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384, help="384 for BGE-small, 512 for CLIP ViT-B/32")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--retriever-max-size",
+        type=int,
+        default=100_000,
+        help="Skip the SimpleVectorStore baseline above this catalog size (it holds every vector as Python floats)"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    print(f"{'products':>10} {'engine ms/query':>16} {'filtered ms/query':>18} {'retriever ms/query':>19} {'speedup':>8}")
+    for size in args.sizes:
+        embeddings, metadata = make_catalog(size, args.dim)
+        engine_ms, filtered_ms = bench_engine(embeddings, metadata, queries, args.top_k)
+
+        if size <= args.retriever_max_size:
+            retriever_ms = bench_simple_vector_store(embeddings, metadata, queries[:5], args.top_k)
+            print(f"{size:>10} {engine_ms:>16.3f} {filtered_ms:>18.3f} {retriever_ms:>19.3f} {retriever_ms / engine_ms:>7.1f}x")
+        else:
+            print(f"{size:>10} {engine_ms:>16.3f} {filtered_ms:>18.3f} {'skipped':>19} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Optional, Type
+
+class RetryableError(Exception):
+    pass
+
+class NonRetryableError(Exception):
+    pass
+
+class AgentError(Exception):
+    pass
+
+RETRYABLE_ERROR_KEYWORDS = [
+    'too many connections', 'server overloaded', 'temporary failure', 
+    'try again', 'timeout', 'timed out', 'connection timeout',
+    'read timeout', 'write timeout', 'operation timeout',
+    'memory temporarily unavailable', 'disk space temporarily full',
+    'resource temporarily unavailable', 'service temporarily unavailable',
+    'temporarily unable', 'busy', 'locked', 'deadlock',
+    'rate limit', 'throttled', 'quota exceeded', 'too many requests',
+    'request limit', 'api limit',
+    'server busy', 'service unavailable', 'maintenance mode',
+    'overloaded', 'congestion', 'backpressure',
+    'network unreachable', 'host temporarily unreachable',
+    'dns temporarily failed', 'name resolution temporarily failed',
+    'model overloaded', 'context length temporarily exceeded', 'tokens per minute',
+    'concurrent requests exceeded', 'openai rate limit', 'anthropic rate limit',
+    'model temporarily unavailable', 'inference timeout', 'generation timeout',
+    'index temporarily locked', 'embedding service unavailable',
+    'vector search timeout', 'similarity search timeout',
+    'clip model loading', 'model warming up',
+    'image processing queue full', 'thumbnail generation failed temporarily',
+    'image download timeout', 'cdn temporarily unavailable',
+    'image service overloaded', 'processing capacity exceeded',
+    'websocket connection limit', 'broadcast queue full',
+    'message queue overflow', 'connection pool exhausted',
+    'storage temporarily unavailable', 'cache miss timeout',
+    'index rebuild in progress', 'replication lag'
+]
+
+NON_RETRYABLE_ERROR_KEYWORDS = [
+    'connection', 'network', 'socket', 'broken pipe', 
+    'connection reset', 'host unreachable', 'connection refused',
+    'no route to host', 'network is unreachable',
+    'authentication failed', 'unauthorized', 'forbidden', 
+    'access denied', 'permission denied', 'invalid credentials',
+    'invalid token', 'expired token', 'invalid key',
+    'column', 'table', 'syntax', 'type mismatch', 'invalid', 
+    'does not exist', 'unknown', 'not found', 'missing',
+    'duplicate key', 'constraint violation', 'foreign key',
+    'validation error', 'invalid format', 'malformed',
+    'bad request', 'invalid parameter', 'invalid input',
+    'parse error', 'decode error', 'encoding error',
+    'configuration error', 'config', 'misconfigured',
+    'invalid configuration', 'missing configuration',
+    'file not found', 'directory not found', 'path not found',
+    'permission denied', 'disk full', 'no space left',
+    'null pointer', 'index out of bounds', 'key error',
+    'attribute error', 'type error', 'value error',
+    'assertion error', 'not implemented',
+    'version mismatch', 'incompatible', 'unsupported',
+    'deprecated', 'not supported',
+    'invalid api key', 'api key revoked', 'subscription expired',
+    'insufficient credits', 'account suspended', 'invalid model',
+    'model not found', 'context length exceeded permanently',
+    'invalid prompt', 'content policy violation', 'unsafe content',
+    'index corrupted', 'index not found', 'invalid embedding dimension',
+    'embedding model mismatch', 'vector dimension mismatch',
+    'invalid similarity metric', 'index schema error',
+    'invalid image format', 'corrupted image', 'image too large',
+    'unsupported image type', 'invalid image dimensions',
+    'image decode failed', 'invalid base64', 'malformed image data',
+    'image metadata corrupted', 'exif data invalid',
+    'invalid filter operator', 'filter type mismatch',
+    'metadata field not found', 'invalid price range',
+    'category does not exist', 'invalid rating value',
+    'brand not recognized', 'invalid stock filter',
+    'product not found', 'catalog empty', 'invalid product id',
+    'thumbnail missing', 'price data corrupted',
+    'inventory data invalid', 'sku not found',
+    'tool not found', 'invalid tool parameters', 'tool execution failed',
+    'conversation context corrupted', 'history limit exceeded',
+    'invalid response format', 'markdown parse error',
+    'websocket protocol error', 'invalid message format',
+    'connection already closed', 'invalid connection id',
+    'handshake failed', 'protocol version unsupported'
+]
+
+# Distinct (exception type, message) pairs whose verdict is remembered
+ERROR_CLASSIFIER_CACHE_SIZE = int(os.getenv("ERROR_CLASSIFIER_CACHE_SIZE", "2048"))
+
+RETRYABLE_CATEGORIES = {"timeout", "retryable_keyword"}
+
+def _keyword_pattern(keywords) -> str:
+    # Keywords folded into a prefix trie, so a position is rejected after a character or two
+    # instead of being tried against every keyword in turn
+    trie: Dict[str, Any] = {}
+    for keyword in set(keywords):
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A keyword ending here may also be the prefix of a longer one
+        return f"(?:{body})?" if "" in node else body
+    
+    return emit(trie)
+
+# One pass over the message for both lists; at a shared position the retryable group wins
+_KEYWORD_PATTERN = re.compile(
+    f"(?P<retryable>{_keyword_pattern(RETRYABLE_ERROR_KEYWORDS)})"
+    f"|(?P<non_retryable>{_keyword_pattern(NON_RETRYABLE_ERROR_KEYWORDS)})"
+)
+_RETRYABLE_PATTERN = re.compile(_keyword_pattern(RETRYABLE_ERROR_KEYWORDS))
+
+_category_counts: Counter = Counter()
+
+def _type_category(error_type: Type[BaseException]) -> Optional[str]:
+    if issubclass(error_type, TimeoutError):
+        return "timeout"
+    if issubclass(error_type, ConnectionError):
+        return "connection"
+    return None
+
+# A failure that repeats on every attempt and every retry layer is classified once
+@lru_cache(maxsize=ERROR_CLASSIFIER_CACHE_SIZE)
+def _classify_message(error_type: Type[BaseException], message: str) -> str:
+    message = message.lower()
+    match = _KEYWORD_PATTERN.search(message)
+    if match is None:
+        return "unclassified"
+    if match.lastgroup == "retryable":
+        return "retryable_keyword"
+    # A retryable keyword anywhere in the message still takes precedence over this earlier one
+    if _RETRYABLE_PATTERN.search(message, match.start() + 1):
+        return "retryable_keyword"
+    return "non_retryable_keyword"
+
+def classify_error(error: BaseException) -> str:
+    error_type = type(error)
+    # Type first: timeouts and connection errors never need their message formatted
+    category = _type_category(error_type) or _classify_message(error_type, str(error))
+    _category_counts[category] += 1
+    return category
+
+def is_retryable_error(error: Exception) -> bool:
+    return classify_error(error) in RETRYABLE_CATEGORIES
+
+def get_error_classifier_stats() -> Dict[str, Any]:
+    cache = _classify_message.cache_info()
+    return {
+        "categories": dict(_category_counts),
+        "cache_hits": cache.hits,
+        "cache_misses": cache.misses,
+        "cache_size": cache.currsize,
+    }
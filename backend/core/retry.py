@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from core.errors import RetryableError, NonRetryableError, is_retryable_error
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Retries earned per first attempt, process wide: a failing dependency can add at most this share of extra load
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+# Retries that can be spent in a burst before the ratio applies
+RETRY_BUDGET_BURST = float(os.getenv("RETRY_BUDGET_BURST", "10"))
+# Consecutive retryable failures that open a dependency's circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+# Seconds an open circuit fails fast before it lets one trial call through
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class RetryCancelled(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("retry_deadline", default=None)
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("retry_cancel_event", default=None)
+# Set while a retry loop runs; nested loops (a search retrying under the tool's retry) make one attempt
+_retry_owner: ContextVar[bool] = ContextVar("retry_owner", default=False)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    # Nested scopes can only shorten the deadline they inherit
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline():
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Request deadline exceeded by {-remaining:.2f}s")
+
+
+@contextmanager
+def retries_deferred_to_caller():
+    # For executor workers: nested retry loops make one attempt, so no backoff sleep holds a pool
+    # thread; the awaiting caller's async retry owns every retry
+    token = _retry_owner.set(True)
+    try:
+        yield
+    finally:
+        _retry_owner.reset(token)
+
+
+def bind_cancel_event(event: threading.Event):
+    # Run inside the context copied for a worker thread; setting the event ends its backoff sleeps
+    _cancel_event.set(event)
+
+
+class RetryBudget:
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, burst: float = RETRY_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.denied = 0
+
+    def record_attempt(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.granted += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tokens": round(self.tokens, 2), "granted": self.granted, "denied": self.denied}
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Service temporarily unavailable: {self.name} circuit open after repeated failures")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit {self.name} closed")
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+
+
+retry_budget = RetryBudget()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def get_retry_stats() -> Dict[str, Any]:
+    return {
+        "budget": retry_budget.stats(),
+        "circuits": {name: breaker.stats() for name, breaker in _breakers.items()},
+    }
+
+
+def _backoff(attempt: int, base_delay: float, max_delay: float) -> float:
+    # Full jitter: concurrent callers that failed together spread their retries out
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def _says_nothing_about_dependency(error: BaseException) -> bool:
+    # async_retry_operation wraps these, so the cause chain is checked as well
+    while error is not None:
+        if isinstance(error, (CircuitOpenError, RetryCancelled)):
+            return True
+        error = error.__cause__
+    return False
+
+
+@contextmanager
+def circuit_guard(dependency: Optional[str]):
+    if not dependency:
+        yield
+        return
+    breaker = get_circuit_breaker(dependency)
+    breaker.before_call()
+    try:
+        yield
+    except Exception as e:
+        if _says_nothing_about_dependency(e):
+            # Another breaker rejected the call or the caller went away; this dependency was never reached
+            breaker.release_trial()
+        # Bad input means the dependency answered; only timeouts and retryable failures count against it
+        elif isinstance(e, DeadlineExceeded) or is_retryable_error(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except BaseException:
+        # Cancelled: no verdict on the dependency, but a half-open trial slot must not stay taken
+        breaker.release_trial()
+        raise
+    breaker.record_success()
+
+
+def _should_retry(error: Exception, attempt: int, max_retries: int, delay: float) -> bool:
+    if attempt >= max_retries or isinstance(error, (CircuitOpenError, DeadlineExceeded, RetryCancelled)):
+        return False
+    if not is_retryable_error(error):
+        return False
+    remaining = remaining_time()
+    if remaining is not None and remaining <= delay:
+        logger.warning(f"Not retrying, {max(remaining, 0):.2f}s left before the request deadline: {error}")
+        return False
+    if not retry_budget.try_spend():
+        logger.warning(f"Not retrying, retry budget exhausted: {error}")
+        return False
+    return True
+
+
+def retry_operation(func, max_retries=2, base_delay=1, max_delay=5, dependency: Optional[str] = None):
+    if _retry_owner.get():
+        max_retries = 0
+    token = _retry_owner.set(True)
+    try:
+        retry_budget.record_attempt()
+        for attempt in range(max_retries + 1):
+            try:
+                check_deadline()
+                with circuit_guard(dependency):
+                    return func()
+            except Exception as e:
+                delay = _backoff(attempt, base_delay, max_delay)
+                if not _should_retry(e, attempt, max_retries, delay):
+                    raise
+                
+                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f}s...")
+                cancel_event = _cancel_event.get()
+                if cancel_event is None:
+                    time.sleep(delay)
+                elif cancel_event.wait(delay):
+                    raise RetryCancelled(f"Retry cancelled, caller went away: {e}") from e
+    finally:
+        _retry_owner.reset(token)
+
+
+async def async_retry_operation(async_func, max_retries=3, base_delay=1, max_delay=10, dependency: Optional[str] = None):
+    if _retry_owner.get():
+        max_retries = 0
+    token = _retry_owner.set(True)
+    try:
+        retry_budget.record_attempt()
+        for attempt in range(max_retries + 1):
+            try:
+                check_deadline()
+                with circuit_guard(dependency):
+                    remaining = remaining_time()
+                    if remaining is None:
+                        return await async_func()
+                    # The deadline also bounds the attempt itself, not just the waits between attempts
+                    try:
+                        return await asyncio.wait_for(async_func(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        if remaining_time() > 0:
+                            raise
+                        raise DeadlineExceeded(f"Request deadline reached during attempt {attempt + 1}")
+            except Exception as e:
+                delay = _backoff(attempt, base_delay, max_delay)
+                if not _should_retry(e, attempt, max_retries, delay):
+                    if isinstance(e, (CircuitOpenError, DeadlineExceeded)) or is_retryable_error(e):
+                        logger.error(f"Operation failed after {attempt + 1} attempts: {e}")
+                        raise RetryableError(f"Max retries exceeded: {e}") from e
+                    logger.error(f"Non-retryable error, failing fast: {e}")
+                    raise NonRetryableError(f"Operation failed: {e}") from e
+                
+                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f} seconds...")
+                # Cancelled together with the request task, e.g. when the client disconnects
+                await asyncio.sleep(delay)
+    finally:
+        _retry_owner.reset(token)
@@ -0,0 +1,194 @@
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_retrieval.embedding_store import replace_file
+from data_retrieval.search_config import IVF_NPROBE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ASSIGN_CHUNK_SIZE = 65536
+TRAIN_POINTS_PER_LIST = 256
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], ASSIGN_CHUNK_SIZE):
+        chunk = matrix[start:start + ASSIGN_CHUNK_SIZE].astype(np.float32, copy=False)
+        assignments[start:start + chunk.shape[0]] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFFlatIndex:
+    def __init__(self, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray, product_ids: np.ndarray):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.product_ids = product_ids
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def num_rows(self) -> int:
+        return self.list_rows.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        product_ids: np.ndarray,
+        nlist: int = 0,
+        iterations: int = 20,
+        seed: int = 0
+    ) -> "IVFFlatIndex":
+        num_rows = matrix.shape[0]
+        if num_rows == 0:
+            raise ValueError("Cannot build an IVF index over an empty catalog")
+        if nlist <= 0:
+            nlist = max(1, int(math.sqrt(num_rows)))
+        nlist = min(nlist, num_rows)
+
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        sample_size = min(num_rows, nlist * TRAIN_POINTS_PER_LIST)
+        sample = matrix[rng.choice(num_rows, size=sample_size, replace=False)].astype(np.float32, copy=False)
+
+        # Spherical k-means: rows are unit length, so centroids are renormalised means
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assignments = _assign(matrix, centroids)
+        list_rows = np.argsort(assignments, kind="stable")
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=nlist))))
+
+        logger.info(f"IVF index built: {num_rows} rows in {nlist} lists ({time.perf_counter() - start:.2f}s)")
+        return cls(centroids, list_offsets, list_rows, np.asarray(product_ids))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Swapped in whole, so a serving process never loads a half-written index
+        replace_file(path, lambda f: np.savez(
+            f,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            product_ids=self.product_ids
+        ))
+
+    @classmethod
+    def load(cls, path: str) -> "IVFFlatIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["list_offsets"], data["list_rows"], data["product_ids"])
+
+    def matches(self, product_ids: np.ndarray) -> bool:
+        return self.product_ids.shape == product_ids.shape and bool(np.all(self.product_ids == product_ids))
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        top_k: int,
+        nprobe: int,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        list_order = np.argsort(-(self.centroids @ query))
+        nprobe = max(1, min(nprobe, self.nlist))
+
+        probed = 0
+        candidate_chunks = []
+        num_candidates = 0
+        # Filter-aware probing: keep opening lists until enough rows pass the filter
+        while probed < self.nlist and (probed < nprobe or num_candidates < top_k):
+            list_id = list_order[probed]
+            rows = self.list_rows[self.list_offsets[list_id]:self.list_offsets[list_id + 1]]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            candidate_chunks.append(rows)
+            num_candidates += rows.shape[0]
+            probed += 1
+
+        if num_candidates == 0:
+            return []
+
+        candidate_rows = np.concatenate(candidate_chunks)
+        scores = matrix[candidate_rows].astype(np.float32, copy=False) @ query
+        k = min(top_k, candidate_rows.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidate_rows[i]), float(scores[i])) for i in top]
+
+
+def load_ann_index(path: str, engine) -> Optional[IVFFlatIndex]:
+    # Only llama_config.py trains the index; a serving process never runs k-means on the request path
+    if not os.path.exists(path):
+        logger.warning(f"No IVF index at {path}, using exact search until llama_config.py builds it")
+        return None
+    try:
+        ann_index = IVFFlatIndex.load(path)
+    except Exception as e:
+        logger.warning(f"Unreadable IVF index at {path}, using exact search: {e}")
+        return None
+    if ann_index.num_rows != len(engine) or not ann_index.matches(engine.product_ids):
+        logger.warning(f"IVF index at {path} is stale, using exact search until llama_config.py rebuilds it")
+        return None
+    logger.info(f"IVF index loaded from {path}")
+    return ann_index
+
+
+def attach_ann_index(engine, path: str, nprobe: int = IVF_NPROBE) -> bool:
+    ann_index = load_ann_index(path, engine)
+    if ann_index is None:
+        return False
+    engine.attach_ann_index(ann_index, nprobe)
+    return True
+
+
+def recall_at_k(engine, queries: np.ndarray, top_k: int, mask: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    if engine.ann_index is None:
+        raise ValueError("Engine has no ANN index to evaluate")
+
+    recalls = []
+    ann_seconds = 0.0
+    exact_seconds = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        exact_rows = {row for row, _ in engine.exact_search(query, top_k, mask=mask)}
+        exact_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        ann_rows = {row for row, _ in engine.search(query, top_k, mask=mask)}
+        ann_seconds += time.perf_counter() - start
+
+        if exact_rows:
+            recalls.append(len(exact_rows & ann_rows) / len(exact_rows))
+
+    num_queries = max(len(queries), 1)
+    return {
+        "top_k": top_k,
+        "nprobe": engine.nprobe,
+        "nlist": engine.ann_index.nlist,
+        "queries": len(queries),
+        "recall": round(float(np.mean(recalls)) if recalls else 1.0, 4),
+        "ann_ms_per_query": round(ann_seconds / num_queries * 1000, 3),
+        "exact_ms_per_query": round(exact_seconds / num_queries * 1000, 3),
+    }
@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_query_text(text: str) -> str:
+    # BGE's tokenizer is uncased and ignores whitespace runs, so these variants embed identically
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key: Hashable, count_miss: bool = True) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += count_miss
+                return None
+            value, stored_at = entry
+            if self._expired(stored_at, now):
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += count_miss
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time() if stored_at is None else stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            # Computed outside the lock: concurrent misses on one key may both compute, never block each other
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class EmbeddingCache(LRUCache):
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 0,
+        path: Optional[str] = None,
+        namespace: str = "",
+        save_every: int = 100
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self.namespace = namespace
+        self.save_every = save_every
+        self._unsaved = 0
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+
+    def put(self, key: str, value: Any, stored_at: Optional[float] = None):
+        super().put(key, np.asarray(value, dtype=np.float32), stored_at)
+        if self.path and stored_at is None:
+            self._unsaved += 1
+            if self.save_every and self._unsaved >= self.save_every:
+                self.save()
+
+    def get(self, key: str) -> Optional[list]:
+        value = super().get(key)
+        return None if value is None else value.tolist()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["namespace"]) != self.namespace:
+                    logger.warning(f"Ignoring embedding cache {self.path}: built for {data['namespace']}")
+                    return
+                keys, embeddings, stored_at = data["keys"], data["embeddings"], data["stored_at"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding cache {self.path}: {e}")
+            return
+
+        now = time.time()
+        # Saved oldest first, so replaying keeps the LRU order
+        for key, embedding, timestamp in zip(keys, embeddings, stored_at):
+            if not self._expired(float(timestamp), now):
+                LRUCache.put(self, str(key), embedding, float(timestamp))
+        logger.info(f"Loaded {len(self)} cached embeddings from {self.path}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                items = list(self._entries.items())
+                self._unsaved = 0
+            if not items:
+                return
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp-{os.getpid()}"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    namespace=np.array(self.namespace),
+                    keys=np.array([key for key, _ in items]),
+                    embeddings=np.stack([value for _, (value, _) in items]),
+                    stored_at=np.array([stored_at for _, (_, stored_at) in items], dtype=np.float64)
+                )
+            os.replace(tmp_path, self.path)
+
+
+def search_cache_key(
+    version: int,
+    query_key: str,
+    limit: int,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    brand: Optional[str] = None,
+    in_stock: bool = False
+) -> tuple:
+    # Mirrors MetadataIndex.candidate_mask: empty strings are no filter, 100 and 100.0 are the same bound
+    def number(value):
+        return None if value is None else float(value)
+
+    return (
+        version, query_key, int(limit), category or None, number(min_price),
+        number(max_price), number(min_rating), brand or None, bool(in_stock)
+    )
+
+
+class SearchResultCache(LRUCache):
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 0):
+        super().__init__(max_entries, ttl_seconds)
+        self.version: Optional[int] = None
+        self.invalidations = 0
+
+    def for_version(self, version: int):
+        # Keys carry the version too, so a racing query on the old engine can never serve stale rows
+        with self._lock:
+            if self.version is None or version > self.version:
+                if self._entries:
+                    self._entries.clear()
+                    self.invalidations += 1
+                self.version = version
+
+    def get(self, key: tuple, count_miss: bool = True) -> Optional[list]:
+        results = super().get(key, count_miss)
+        return None if results is None else [dict(result) for result in results]
+
+    def put(self, key: tuple, results: list, stored_at: Optional[float] = None):
+        super().put(key, tuple(dict(result) for result in results), stored_at)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), version=self.version, invalidations=self.invalidations)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_retrieval.embedding_store import open_embedding_store, write_embedding_store, update_store_metadata
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metadata that can change without re-embedding, so it must never reach the embedded text
+TEXT_EXCLUDED_EMBED_KEYS = ["product_id", "price", "rating", "stock", "thumbnail", "content_hash"]
+
+
+def _hash(values: List[Any]) -> str:
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def text_content_hash(p: Dict[str, Any]) -> str:
+    return _hash([p['title'], p.get('description'), p['category'], p.get('brand', 'Generic')])
+
+
+def image_content_hash(p: Dict[str, Any]) -> str:
+    return _hash([p['thumbnail']])
+
+
+def product_text(p: Dict[str, Any]) -> str:
+    return f"{p['title']}. {p['description']}. Category: {p['category']}. Brand: {p.get('brand', 'Generic')}"
+
+
+def text_metadata(p: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "product_id": p['id'],
+        "title": p['title'],
+        "price": p['price'],
+        "category": p['category'],
+        "rating": p.get('rating', 0),
+        "stock": p.get('stock', 0),
+        "thumbnail": p['thumbnail'],
+        "brand": p.get('brand', 'Generic'),
+        "content_hash": text_content_hash(p)
+    }
+
+
+def image_metadata(p: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "product_id": p['id'],
+        "title": p['title'],
+        "price": p['price'],
+        "category": p['category'],
+        "thumbnail": p['thumbnail'],
+        "content_hash": image_content_hash(p)
+    }
+
+
+def text_document(p: Dict[str, Any]):
+    from llama_index.core import Document
+
+    return Document(
+        text=product_text(p),
+        metadata=text_metadata(p),
+        excluded_embed_metadata_keys=TEXT_EXCLUDED_EMBED_KEYS,
+        excluded_llm_metadata_keys=["content_hash"]
+    )
+
+
+def embed_text_products(products: List[Dict[str, Any]], embed_model) -> List[Tuple[Dict[str, Any], Any]]:
+    from llama_index.core.schema import MetadataMode
+
+    # Same content VectorStoreIndex embeds for a single-node Document
+    texts = [text_document(p).get_content(metadata_mode=MetadataMode.EMBED) for p in products]
+    embeddings = embed_model.get_text_embedding_batch(texts, show_progress=True)
+    return list(zip(products, embeddings))
+
+
+def sync_store(
+    store_path: str,
+    products: List[Dict[str, Any]],
+    build_metadata: Callable[[Dict[str, Any]], Dict[str, Any]],
+    build_text: Callable[[Dict[str, Any]], str],
+    embed_products: Callable[[List[Dict[str, Any]]], List[Tuple[Dict[str, Any], Any]]]
+) -> Dict[str, Any]:
+    embeddings, stored_metadata, stored_texts, manifest = open_embedding_store(store_path)
+    stored_ids = stored_metadata.column("product_id")
+    stored_hashes = stored_metadata.column("content_hash")
+    row_by_id = {product_id: row for row, product_id in enumerate(stored_ids)}
+
+    sources: List[Optional[int]] = []
+    changed: List[Dict[str, Any]] = []
+    for p in products:
+        row = row_by_id.get(p['id'])
+        if row is not None and stored_hashes[row] == build_metadata(p)["content_hash"]:
+            sources.append(row)
+        else:
+            sources.append(None)
+            changed.append(p)
+
+    new_embeddings = {p['id']: embedding for p, embedding in embed_products(changed)} if changed else {}
+
+    rows: List[Tuple[Dict[str, Any], Optional[int], Any]] = []
+    for p, row in zip(products, sources):
+        if row is not None:
+            rows.append((p, row, None))
+        elif p['id'] in new_embeddings:
+            rows.append((p, None, new_embeddings[p['id']]))
+
+    kept_ids = {p['id'] for p, _, _ in rows}
+    stats = {
+        "added": sum(1 for p in changed if p['id'] not in row_by_id and p['id'] in kept_ids),
+        "reembedded": sum(1 for p in changed if p['id'] in row_by_id and p['id'] in kept_ids),
+        "failed": len(changed) - len(new_embeddings),
+        "removed": len(set(stored_ids) - {p['id'] for p in products}),
+        "unchanged": sum(1 for row in sources if row is not None),
+        "version": manifest["version"],
+        "embeddings_changed": False,
+    }
+
+    metadata = [build_metadata(p) for p, _, _ in rows]
+    texts = [build_text(p) for p, _, _ in rows]
+
+    if [row for _, row, _ in rows] == list(range(len(stored_ids))):
+        if metadata == list(stored_metadata) and texts == list(stored_texts):
+            logger.info(f"{store_path} already up to date")
+            return stats
+        # Only metadata such as price or stock changed: keep the embeddings file untouched
+        stats["version"] = update_store_metadata(store_path, metadata, texts)["version"]
+        return stats
+
+    matrix = np.empty((len(rows), embeddings.shape[1]), dtype=np.float32)
+    for position, (_, row, embedding) in enumerate(rows):
+        matrix[position] = embeddings[row] if row is not None else embedding
+
+    stats["version"] = write_embedding_store(store_path, matrix, metadata, texts, dtype=manifest["dtype"])["version"]
+    stats["embeddings_changed"] = True
+    return stats
@@ -0,0 +1,346 @@
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+STORE_FORMAT_VERSION = 2
+SUPPORTED_DTYPES = ("float32", "float16")
+SCHEMA_FILE = "schema.json"
+# String columns with at most this share of distinct values (category, brand) are stored as codes into a vocabulary
+DICTIONARY_MAX_SHARE = 0.5
+
+
+class NumericColumn:
+    # Memory-mapped int64/float64 values plus an optional null mask; rows come back as Python numbers
+    def __init__(self, values: np.ndarray, nulls: Optional[np.ndarray] = None):
+        self.values = values
+        self.nulls = nulls
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def __getitem__(self, row: int) -> Any:
+        if self.nulls is not None and self.nulls[row]:
+            return None
+        return self.values[row].item()
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __array__(self, dtype=None, copy=None):
+        if self.nulls is None:
+            return np.array(self.values, dtype=dtype)
+        return np.array(list(self), dtype=dtype if dtype is not None else object)
+
+    def valid(self) -> np.ndarray:
+        return ~self.nulls if self.nulls is not None else np.ones(len(self), dtype=bool)
+
+
+class CodedColumn:
+    # Memory-mapped int32 codes into a small vocabulary; -1 is null
+    def __init__(self, codes: np.ndarray, vocabulary: List[str]):
+        self.codes = codes
+        self.vocabulary = vocabulary
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        code = int(self.codes[row])
+        return self.vocabulary[code] if code >= 0 else None
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class StringColumn:
+    # UTF-8 values back to back in a memory-mapped blob, row i spanning offsets[i]:offsets[i + 1]
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, nulls: Optional[np.ndarray] = None):
+        self.blob = blob
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self) -> int:
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if self.nulls is not None and self.nulls[row]:
+            return None
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class ColumnarMetadata:
+    def __init__(self, columns: Dict[str, Sequence[Any]], num_rows: int):
+        self.columns = columns
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict[str, Any]]) -> "ColumnarMetadata":
+        fields: List[str] = []
+        for row in rows:
+            for field in row:
+                if field not in fields:
+                    fields.append(field)
+        columns = {field: [row.get(field) for row in rows] for field in fields}
+        return cls(columns, len(rows))
+
+    def column(self, field: str) -> Sequence[Any]:
+        return self.columns.get(field, [None] * self.num_rows)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        item = {}
+        for field, values in self.columns.items():
+            value = values[row]
+            if value is not None:
+                item[field] = value
+        return item
+
+    def __iter__(self):
+        for row in range(self.num_rows):
+            yield self[row]
+
+
+def read_manifest(store_path: str) -> Optional[Dict[str, Any]]:
+    manifest_path = os.path.join(store_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def file_stamp(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def replace_file(path: str, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _null_mask(values: List[Any]) -> Optional[np.ndarray]:
+    nulls = np.array([value is None for value in values], dtype=bool)
+    return nulls if nulls.any() else None
+
+
+def _save_array(directory: str, name: str, array: np.ndarray):
+    np.save(os.path.join(directory, f"{name}.npy"), array, allow_pickle=False)
+
+
+def _write_strings(directory: str, name: str, values: List[Optional[str]]) -> Dict[str, Any]:
+    encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    _save_array(directory, f"{name}-offsets", offsets)
+    nulls = _null_mask(values)
+    if nulls is not None:
+        _save_array(directory, f"{name}-nulls", nulls)
+    return {"kind": "string", "file": name, "nulls": nulls is not None}
+
+
+def _write_column(directory: str, name: str, values: List[Any]) -> Dict[str, Any]:
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        nulls = _null_mask(values)
+        dtype = np.int64 if all(isinstance(value, int) for value in present) else np.float64
+        try:
+            array = np.array([value if value is not None else 0 for value in values], dtype=dtype)
+        except OverflowError:
+            return {"kind": "json", "values": values}
+        _save_array(directory, name, array)
+        if nulls is not None:
+            _save_array(directory, f"{name}-nulls", nulls)
+        return {"kind": "numeric", "file": name, "nulls": nulls is not None}
+    if present and all(isinstance(value, str) for value in present):
+        vocabulary = sorted(set(present))
+        if len(vocabulary) <= DICTIONARY_MAX_SHARE * len(present):
+            code_of = {value: code for code, value in enumerate(vocabulary)}
+            _save_array(directory, name, np.array([code_of[value] if value is not None else -1 for value in values], dtype=np.int32))
+            return {"kind": "coded", "file": name, "vocabulary": vocabulary}
+        return _write_strings(directory, name, values)
+    # Lists, mixed types and all-null columns are small enough to stay in the schema file
+    return {"kind": "json", "values": values}
+
+
+def _write_metadata_file(store_path: str, version: int, metadata: Sequence[Dict[str, Any]], texts: Sequence[str]) -> str:
+    columns = metadata.columns if isinstance(metadata, ColumnarMetadata) else ColumnarMetadata.from_rows(metadata).columns
+    metadata_dir = f"metadata-{version}"
+    final_path = os.path.join(store_path, metadata_dir)
+    tmp_path = f"{final_path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    schema = {
+        "num_rows": len(texts),
+        "columns": [
+            {"name": field, **_write_column(tmp_path, f"column-{i}", list(values))}
+            for i, (field, values) in enumerate(columns.items())
+        ],
+        "texts": _write_strings(tmp_path, "texts", list(texts)),
+    }
+    with open(os.path.join(tmp_path, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f)
+    # Left behind by a writer that died before committing this version
+    shutil.rmtree(final_path, ignore_errors=True)
+    os.replace(tmp_path, final_path)
+    return metadata_dir
+
+
+def _map_array(directory: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+def _map_strings(directory: str, spec: Dict[str, Any]) -> StringColumn:
+    blob_path = os.path.join(directory, f"{spec['file']}.bin")
+    # np.memmap cannot map an empty file
+    blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else np.zeros(0, dtype=np.uint8)
+    nulls = _map_array(directory, f"{spec['file']}-nulls") if spec["nulls"] else None
+    return StringColumn(blob, _map_array(directory, f"{spec['file']}-offsets"), nulls)
+
+
+def _open_metadata_dir(directory: str) -> Tuple[ColumnarMetadata, StringColumn]:
+    with open(os.path.join(directory, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    columns: Dict[str, Sequence[Any]] = {}
+    for spec in schema["columns"]:
+        if spec["kind"] == "numeric":
+            nulls = _map_array(directory, f"{spec['file']}-nulls") if spec["nulls"] else None
+            columns[spec["name"]] = NumericColumn(_map_array(directory, spec["file"]), nulls)
+        elif spec["kind"] == "coded":
+            columns[spec["name"]] = CodedColumn(_map_array(directory, spec["file"]), spec["vocabulary"])
+        elif spec["kind"] == "string":
+            columns[spec["name"]] = _map_strings(directory, spec)
+        else:
+            columns[spec["name"]] = spec["values"]
+    return ColumnarMetadata(columns, schema["num_rows"]), _map_strings(directory, schema["texts"])
+
+
+def _commit_manifest(store_path: str, manifest: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+    # The manifest is swapped last so readers only ever see a complete version
+    replace_file(os.path.join(store_path, MANIFEST_FILE), lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+
+    if previous:
+        # Processes that still map the old files keep their mapping after unlink
+        live_files = (manifest["embeddings_file"], manifest["metadata_file"])
+        for old_file in (previous["embeddings_file"], previous["metadata_file"]):
+            if old_file not in live_files:
+                old_path = os.path.join(store_path, old_file)
+                if os.path.isdir(old_path):
+                    shutil.rmtree(old_path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(old_path)
+                    except FileNotFoundError:
+                        pass
+
+
+def write_embedding_store(
+    store_path: str,
+    embeddings: np.ndarray,
+    metadata: Sequence[Dict[str, Any]],
+    texts: Sequence[str],
+    dtype: str = "float32"
+) -> Dict[str, Any]:
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+    if len(metadata) != embeddings.shape[0] or len(texts) != embeddings.shape[0]:
+        raise ValueError("Embeddings, metadata and texts must have the same number of rows")
+
+    os.makedirs(store_path, exist_ok=True)
+    previous = read_manifest(store_path)
+    version = previous["version"] + 1 if previous else 1
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = (matrix / norms).astype(dtype)
+
+    embeddings_file = f"embeddings-{version}.npy"
+    replace_file(os.path.join(store_path, embeddings_file), lambda f: np.save(f, matrix, allow_pickle=False))
+    metadata_file = _write_metadata_file(store_path, version, metadata, texts)
+
+    manifest = {
+        "format_version": STORE_FORMAT_VERSION,
+        "version": version,
+        "num_rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "dtype": dtype,
+        "normalized": True,
+        "embeddings_file": embeddings_file,
+        "metadata_file": metadata_file,
+        "created_at": time.time(),
+    }
+    _commit_manifest(store_path, manifest, previous)
+
+    logger.info(f"Embedding store v{version} written to {store_path}: {manifest['num_rows']} rows, {dtype}")
+    return manifest
+
+
+def update_store_metadata(store_path: str, metadata: Sequence[Dict[str, Any]], texts: Sequence[str]) -> Dict[str, Any]:
+    previous = read_manifest(store_path)
+    if previous is None:
+        raise FileNotFoundError(f"Embedding store not found at {store_path}")
+    if len(metadata) != previous["num_rows"] or len(texts) != previous["num_rows"]:
+        raise ValueError("Metadata-only updates must keep the same rows")
+
+    # Same rows in the same order: the new version reuses the existing embeddings file untouched
+    version = previous["version"] + 1
+    manifest = dict(
+        previous,
+        format_version=STORE_FORMAT_VERSION,
+        version=version,
+        metadata_file=_write_metadata_file(store_path, version, metadata, texts),
+        created_at=time.time()
+    )
+    _commit_manifest(store_path, manifest, previous)
+
+    logger.info(f"Embedding store v{version} metadata updated in {store_path}")
+    return manifest
+
+
+def open_embedding_store(store_path: str, attempts: int = 3) -> Tuple[np.ndarray, ColumnarMetadata, Sequence[str], Dict[str, Any]]:
+    for attempt in range(attempts):
+        manifest = read_manifest(store_path)
+        if manifest is None:
+            raise FileNotFoundError(f"Embedding store not found at {store_path}")
+        format_version = manifest.get("format_version")
+        if format_version != STORE_FORMAT_VERSION:
+            raise ValueError(f"Embedding store version mismatch: {format_version}")
+
+        try:
+            # Read-only mapping: pages come from the shared page cache and are only faulted in when scored
+            embeddings = np.load(os.path.join(store_path, manifest["embeddings_file"]), mmap_mode="r")
+            # Metadata is mapped too, so start-up cost and resident memory do not grow with the catalog
+            metadata, texts = _open_metadata_dir(os.path.join(store_path, manifest["metadata_file"]))
+        except FileNotFoundError:
+            # A writer replaced this version between reading the manifest and opening its files
+            if attempt == attempts - 1:
+                raise
+            continue
+
+        return embeddings, metadata, texts, manifest
@@ -0,0 +1,210 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += seconds
+            if failed:
+                self.failures += 1
+
+    def summary(self, wall_seconds: float) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "failures": self.failures,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        }
+
+
+class ImageIngestionPipeline:
+    def __init__(
+        self,
+        clip_model,
+        download_workers: int = 16,
+        decode_workers: int = 4,
+        batch_size: int = 32,
+        encode_threads: int = 0,
+        max_in_flight: int = 256,
+        image_size: int = 224,
+        timeout: float = 10,
+        progress_every: int = 100
+    ):
+        self.clip_model = clip_model
+        self.download_workers = download_workers
+        self.decode_workers = decode_workers
+        self.batch_size = batch_size
+        self.encode_threads = encode_threads
+        self.max_in_flight = max_in_flight
+        self.image_size = image_size
+        self.timeout = timeout
+        self.progress_every = progress_every
+
+        self.stats = {
+            "download": StageStats("download"),
+            "decode": StageStats("decode"),
+            "encode": StageStats("encode"),
+        }
+        self.failed: List[Tuple[Dict[str, Any], str]] = []
+        self.wall_seconds = 0.0
+        self._thread_local = threading.local()
+
+    def _session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._thread_local.session = session
+        return session
+
+    def _download(self, product: Dict[str, Any]) -> bytes:
+        start = time.perf_counter()
+        try:
+            response = self._session().get(product['thumbnail'], timeout=self.timeout)
+            response.raise_for_status()
+            self.stats["download"].record(time.perf_counter() - start)
+            return response.content
+        except Exception:
+            self.stats["download"].record(time.perf_counter() - start, failed=True)
+            raise
+
+    def _decode(self, content: bytes):
+        from PIL import Image
+
+        start = time.perf_counter()
+        try:
+            img = Image.open(BytesIO(content)).convert('RGB')
+            # Shrink so the short side matches the CLIP input; CLIP's own preprocessing does the rest
+            scale = self.image_size / min(img.size)
+            if scale < 1:
+                img = img.resize(
+                    (max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                    Image.BICUBIC
+                )
+            self.stats["decode"].record(time.perf_counter() - start)
+            return img
+        except Exception:
+            self.stats["decode"].record(time.perf_counter() - start, failed=True)
+            raise
+
+    def _encode(self, batch: List[Tuple[int, Dict[str, Any], Any]], results: List[Tuple[int, Dict[str, Any], Any]]):
+        start = time.perf_counter()
+        try:
+            embeddings = self.clip_model.encode([img for _, _, img in batch], batch_size=self.batch_size)
+            if len(embeddings) != len(batch):
+                raise ValueError(f"CLIP returned {len(embeddings)} embeddings for {len(batch)} images")
+        except Exception as e:
+            # A batch CLIP rejects fails its own products only; the rest of the catalog is still ingested
+            elapsed = time.perf_counter() - start
+            for _, product, _ in batch:
+                self.failed.append((product, f"encode failed: {e}"))
+                self.stats["encode"].record(elapsed / len(batch), failed=True)
+            logger.warning(f"✗ Failed to encode a batch of {len(batch)} images: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        for (position, product, _), embedding in zip(batch, embeddings):
+            results.append((position, product, embedding))
+            self.stats["encode"].record(elapsed / len(batch))
+
+    def _log_progress(self, done: int, total: int, started: float):
+        wall = time.perf_counter() - started
+        stages = ", ".join(
+            f"{name} {stats.items} ({stats.items / wall:.1f}/s)"
+            for name, stats in self.stats.items()
+        )
+        logger.info(f"Ingested {done}/{total} images in {wall:.1f}s: {stages}")
+
+    def run(self, products: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Any]]:
+        if self.encode_threads > 0:
+            import torch
+            torch.set_num_threads(self.encode_threads)
+
+        started = time.perf_counter()
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        stop = threading.Event()
+        decoded: "queue.Queue[Tuple[int, Dict[str, Any], Any, Optional[str]]]" = queue.Queue()
+
+        download_pool = ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix="ingest-download")
+        decode_pool = ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="ingest-decode")
+
+        def on_decoded(position, product, future):
+            error = future.exception()
+            decoded.put((position, product, None if error else future.result(), str(error) if error else None))
+
+        def on_downloaded(position, product, future):
+            error = future.exception()
+            if error:
+                decoded.put((position, product, None, str(error)))
+                return
+            decode_future = decode_pool.submit(self._decode, future.result())
+            decode_future.add_done_callback(lambda f: on_decoded(position, product, f))
+
+        def produce():
+            # Bounded: at most max_in_flight images are downloaded or decoded but not yet encoded
+            for position, product in enumerate(products):
+                while not in_flight.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                future = download_pool.submit(self._download, product)
+                future.add_done_callback(lambda f, position=position, product=product: on_downloaded(position, product, f))
+
+        producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+        producer.start()
+
+        results: List[Tuple[int, Dict[str, Any], Any]] = []
+        batch: List[Tuple[int, Dict[str, Any], Any]] = []
+        try:
+            for done in range(1, len(products) + 1):
+                position, product, img, error = decoded.get()
+                in_flight.release()
+                if error:
+                    self.failed.append((product, error))
+                    logger.warning(f"✗ Failed {product.get('title')}: {error}")
+                else:
+                    batch.append((position, product, img))
+                    if len(batch) >= self.batch_size:
+                        self._encode(batch, results)
+                        batch = []
+                if self.progress_every and done % self.progress_every == 0:
+                    self._log_progress(done, len(products), started)
+            if batch:
+                self._encode(batch, results)
+        finally:
+            stop.set()
+            producer.join()
+            download_pool.shutdown(wait=True)
+            decode_pool.shutdown(wait=True)
+
+        self.wall_seconds = time.perf_counter() - started
+        self._log_progress(len(products), len(products), started)
+        results.sort(key=lambda item: item[0])
+        return [(product, embedding) for _, product, embedding in results]
+
+    def report(self) -> Dict[str, Any]:
+        wall = self.wall_seconds
+        return {
+            "wall_seconds": round(wall, 3),
+            "failed": len(self.failed),
+            "stages": {name: stats.summary(wall) for name, stats in self.stats.items()},
+        }
@@ -0,0 +1,206 @@
+import logging
+import math
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_retrieval.embedding_store import replace_file
+from data_retrieval.search_config import BM25_K1, BM25_B, LEXICAL_ONLY_MAX_DF, RRF_K
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset({"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "with"})
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    # Inverted index in CSR form: each term's postings are (row, weight) pairs, where the weight is the
+    # term's full BM25 contribution for that row, so a query only gathers and sums postings
+    def __init__(
+        self,
+        terms: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        weights: np.ndarray,
+        identifier_terms: np.ndarray,
+        product_ids: np.ndarray
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.identifier_terms = identifier_terms
+        self.product_ids = product_ids
+        self.term_ids = {str(term): i for i, term in enumerate(terms)}
+
+    @property
+    def num_rows(self) -> int:
+        return self.product_ids.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        texts: Sequence[str],
+        product_ids: np.ndarray,
+        brands: Optional[Sequence[Any]] = None,
+        k1: float = BM25_K1,
+        b: float = BM25_B
+    ) -> "BM25Index":
+        start = time.perf_counter()
+        num_rows = len(texts)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(num_rows, dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            for token in tokenize(text or ""):
+                counts[token] = counts.get(token, 0) + 1
+            lengths[row] = sum(counts.values())
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((row, count))
+
+        average_length = float(lengths.mean()) if num_rows and lengths.mean() > 0 else 1.0
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        rows = np.empty(sum(len(postings[term]) for term in terms), dtype=np.int32)
+        weights = np.empty(rows.shape[0], dtype=np.float32)
+        position = 0
+        for i, term in enumerate(terms):
+            term_rows = np.array([row for row, _ in postings[term]], dtype=np.int32)
+            tf = np.array([count for _, count in postings[term]], dtype=np.float32)
+            df = term_rows.shape[0]
+            idf = math.log(1 + (num_rows - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * lengths[term_rows] / average_length)
+            rows[position:position + df] = term_rows
+            weights[position:position + df] = idf * tf * (k1 + 1) / (tf + norm)
+            position += df
+            offsets[i + 1] = position
+
+        # Brand names and tokens with digits (model numbers, sizes) identify products rather than describe them
+        brand_tokens = {token for brand in (brands or []) if brand for token in tokenize(str(brand))}
+        identifier_terms = np.array([term in brand_tokens or any(c.isdigit() for c in term) for term in terms], dtype=bool)
+
+        logger.info(f"BM25 index built: {num_rows} rows, {len(terms)} terms, {rows.shape[0]} postings ({time.perf_counter() - start:.2f}s)")
+        return cls(np.array(terms, dtype=str), offsets, rows, weights, identifier_terms, np.asarray(product_ids))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Swapped in whole, so a serving process never loads a half-written index
+        replace_file(path, lambda f: np.savez(
+            f,
+            terms=self.terms,
+            offsets=self.offsets,
+            rows=self.rows,
+            weights=self.weights,
+            identifier_terms=self.identifier_terms,
+            product_ids=self.product_ids
+        ))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            return cls(data["terms"], data["offsets"], data["rows"], data["weights"], data["identifier_terms"], data["product_ids"])
+
+    def matches(self, product_ids: np.ndarray) -> bool:
+        return self.product_ids.shape == product_ids.shape and bool(np.all(self.product_ids == product_ids))
+
+    def _query_terms(self, query: str) -> Tuple[List[int], int]:
+        tokens = set(tokenize(query))
+        term_ids = [self.term_ids[token] for token in tokens if token in self.term_ids]
+        return term_ids, len(tokens)
+
+    def _gather(self, term_ids: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Candidate rows with their summed scores and how many query terms each contains
+        if not term_ids:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, np.empty(0, dtype=np.float32), empty
+        slices = [slice(self.offsets[i], self.offsets[i + 1]) for i in term_ids]
+        rows = np.concatenate([self.rows[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        return candidates, np.bincount(inverse, weights=weights).astype(np.float32), np.bincount(inverse)
+
+    def is_lexical_query(self, query: str, max_df: float = LEXICAL_ONLY_MAX_DF) -> bool:
+        # Exact-token lookups ("Beats Flex", "iPhone 9"): every term is known, one of them is a rare brand or
+        # model token, and some product contains them all; semantic matching adds nothing there
+        term_ids, num_tokens = self._query_terms(query)
+        if not term_ids or len(term_ids) != num_tokens:
+            return False
+        max_rows = max(1, int(max_df * self.num_rows))
+        if not any(self.identifier_terms[i] and self.offsets[i + 1] - self.offsets[i] <= max_rows for i in term_ids):
+            return False
+        _, _, matched_terms = self._gather(term_ids)
+        return bool(np.any(matched_terms == len(term_ids)))
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        require_all: bool = False
+    ) -> List[Tuple[int, float]]:
+        term_ids, _ = self._query_terms(query)
+        candidates, scores, matched_terms = self._gather(term_ids)
+        if require_all and candidates.shape[0]:
+            keep = matched_terms == len(term_ids)
+            candidates, scores = candidates[keep], scores[keep]
+        if mask is not None and candidates.shape[0]:
+            keep = mask[candidates]
+            candidates, scores = candidates[keep], scores[keep]
+        k = min(top_k, candidates.shape[0])
+        if k <= 0:
+            return []
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Tuple[int, float]]], top_k: int, k: int = RRF_K) -> List[Tuple[int, float]]:
+    # Only ranks are fused, so cosine similarities and BM25 scores never need a common scale
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(fused.items(), key=lambda item: -item[1])
+    return ordered[:top_k]
+
+
+def load_lexical_index(path: str, engine) -> Optional[BM25Index]:
+    # Only llama_config.py builds the index; a serving process never tokenizes the catalog itself
+    if not os.path.exists(path):
+        logger.warning(f"No BM25 index at {path}, using dense retrieval until llama_config.py builds it")
+        return None
+    try:
+        lexical_index = BM25Index.load(path)
+    except Exception as e:
+        logger.warning(f"Unreadable BM25 index at {path}, using dense retrieval: {e}")
+        return None
+    if lexical_index.num_rows != len(engine) or not lexical_index.matches(engine.product_ids):
+        logger.warning(f"BM25 index at {path} is stale, using dense retrieval until llama_config.py rebuilds it")
+        return None
+    logger.info(f"BM25 index loaded from {path}")
+    return lexical_index
+
+
+def build_lexical_index(engine) -> BM25Index:
+    metadata = engine.metadata
+    brands = metadata.column("brand") if hasattr(metadata, "column") else [m.get("brand") for m in metadata]
+    return BM25Index.build(engine.texts, engine.product_ids, brands=brands)
+
+
+def attach_lexical_index(engine, path: str) -> bool:
+    lexical_index = load_lexical_index(path, engine)
+    if lexical_index is None:
+        return False
+    engine.attach_lexical_index(lexical_index)
+    return True
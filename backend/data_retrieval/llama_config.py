@@ -1,16 +1,38 @@
+import argparse
 import json
 import os
+import sys
 from pathlib import Path
-from llama_index.core import Document, VectorStoreIndex, StorageContext
+from llama_index.core import VectorStoreIndex, StorageContext
 from llama_index.core.schema import ImageDocument
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.multi_modal_llms.openai import OpenAIMultiModal
 from llama_index.core.indices import MultiModalVectorStoreIndex
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.model_registry import get_clip_model
+from data_retrieval.vector_engine import VectorEngine
+from data_retrieval.ann_index import IVFFlatIndex, recall_at_k
+from data_retrieval.lexical_index import build_lexical_index
+from data_retrieval.embedding_store import write_embedding_store, read_manifest
+from data_retrieval.catalog_sync import (
+    text_document, image_metadata, product_text, embed_text_products, sync_store
+)
+from data_retrieval.ingestion import ImageIngestionPipeline
+from data_retrieval.search_config import (
+    IVF_NLIST, IVF_NPROBE, IVF_TRAIN_ITERATIONS, EMBEDDING_STORE_DTYPE,
+    INGEST_DOWNLOAD_WORKERS, INGEST_DECODE_WORKERS, INGEST_BATCH_SIZE, INGEST_ENCODE_THREADS
+)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 TEXT_STORAGE_PATH = os.path.join(BASE_DIR, "storage", "text_index")
 IMAGE_STORAGE_PATH = os.path.join(BASE_DIR, "storage", "image_index")
+TEXT_ANN_PATH = os.path.join(BASE_DIR, "storage", "text_ivf.npz")
+IMAGE_ANN_PATH = os.path.join(BASE_DIR, "storage", "image_ivf.npz")
+TEXT_STORE_PATH = os.path.join(BASE_DIR, "storage", "text_store")
+TEXT_LEXICAL_PATH = os.path.join(BASE_DIR, "storage", "text_bm25.npz")
+IMAGE_STORE_PATH = os.path.join(BASE_DIR, "storage", "image_store")
 CATALOG_PATH = os.path.join(BASE_DIR, "data", "product_catalog.json")
 
 def fetch_product_catalog():
@@ -19,7 +41,7 @@ def fetch_product_catalog():
     response = requests.get('https://dummyjson.com/products?limit=1000')
     data = response.json()
     
-    os.makedirs("./data", exist_ok=True)
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
     with open(CATALOG_PATH, 'w') as f:
         json.dump(data['products'], f, indent=2)
     
@@ -29,22 +51,7 @@ def fetch_product_catalog():
 def create_text_index(products):
     print("Creating text index...")
     
-    text_docs = [
-        Document(
-            text=f"{p['title']}. {p['description']}. Category: {p['category']}. Brand: {p.get('brand', 'Generic')}",
-            metadata={
-                "product_id": p['id'],
-                "title": p['title'],
-                "price": p['price'],
-                "category": p['category'],
-                "rating": p.get('rating', 0),
-                "stock": p.get('stock', 0),
-                "thumbnail": p['thumbnail'],
-                "brand": p.get('brand', 'Generic')
-            }
-        )
-        for p in products
-    ]
+    text_docs = [text_document(p) for p in products]
     
     embed_model = HuggingFaceEmbedding(
         model_name="BAAI/bge-small-en-v1.5"  
@@ -65,41 +72,30 @@ def create_text_index(products):
 def create_image_index(products):
     print("Creating image index with CLIP vision embeddings...")
     
-    import requests
-    from PIL import Image
-    from io import BytesIO
-    from sentence_transformers import SentenceTransformer
     from llama_index.core import Document, VectorStoreIndex, Settings
     
-    clip_model = SentenceTransformer('clip-ViT-B-32')
-    
-    docs_with_embeddings = []
-    
-    for p in products:
-        try:
-            response = requests.get(p['thumbnail'], timeout=10)
-            img = Image.open(BytesIO(response.content)).convert('RGB')
-            
-            image_embedding = clip_model.encode(img)
-            
-            doc = Document(
-                text=p['title'],
-                metadata={
-                    "product_id": p['id'],
-                    "title": p['title'],
-                    "price": p['price'],
-                    "category": p['category'],
-                    "thumbnail": p['thumbnail']
-                },
-                embedding=image_embedding.tolist()
-            )
-            docs_with_embeddings.append(doc)
-            print(f"✓ {p['title']}")
-            
-        except Exception as e:
-            print(f"✗ Failed {p['title']}: {e}")
+    clip_model = get_clip_model()
+    
+    pipeline = ImageIngestionPipeline(
+        clip_model,
+        download_workers=INGEST_DOWNLOAD_WORKERS,
+        decode_workers=INGEST_DECODE_WORKERS,
+        batch_size=INGEST_BATCH_SIZE,
+        encode_threads=INGEST_ENCODE_THREADS
+    )
+    embedded_products = pipeline.run(products)
+    
+    docs_with_embeddings = [
+        Document(
+            text=p['title'],
+            metadata=image_metadata(p),
+            embedding=image_embedding.tolist()
+        )
+        for p, image_embedding in embedded_products
+    ]
+    
+    print(f"Ingestion report: {json.dumps(pipeline.report(), indent=2)}")
     
-
     from llama_index.embeddings.huggingface import HuggingFaceEmbedding
     embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
     
@@ -115,22 +111,136 @@ def create_image_index(products):
     return image_index
 
 
-def initialize_indexes():
+def create_embedding_store(index, store_path):
+    print(f"Writing memory-mapped embedding store to {store_path}...")
+    
+    engine = VectorEngine.from_llama_index(index)
+    manifest = write_embedding_store(
+        store_path,
+        engine.matrix,
+        engine.metadata,
+        engine.texts,
+        dtype=EMBEDDING_STORE_DTYPE
+    )
+    
+    print(f"Embedding store v{manifest['version']}: {manifest['num_rows']} x {manifest['dim']} {manifest['dtype']}")
+    return engine
+
+
+def create_ann_index(engine, ann_path, recall_queries=100, top_k=5):
+    import numpy as np
+    
+    print(f"Creating IVF-flat ANN index at {ann_path}...")
+    
+    ann_index = IVFFlatIndex.build(
+        engine.matrix,
+        engine.product_ids,
+        nlist=IVF_NLIST,
+        iterations=IVF_TRAIN_ITERATIONS
+    )
+    ann_index.save(ann_path)
+    
+    engine.attach_ann_index(ann_index, IVF_NPROBE)
+    rng = np.random.default_rng(0)
+    sample_rows = rng.choice(len(engine), size=min(recall_queries, len(engine)), replace=False)
+    queries = engine.matrix[sample_rows] + rng.normal(0, 0.05, size=(len(sample_rows), engine.dim)).astype(np.float32)
+    report = recall_at_k(engine, queries, top_k=top_k)
+    
+    print(
+        f"ANN index: {report['nlist']} lists, nprobe={report['nprobe']}, "
+        f"recall@{top_k}={report['recall']}, "
+        f"{report['ann_ms_per_query']}ms vs {report['exact_ms_per_query']}ms exact per query"
+    )
+    return ann_index
+
+
+def create_lexical_index(engine, lexical_path):
+    print(f"Creating BM25 inverted index at {lexical_path}...")
+    
+    # Over the same product text the dense index embeds: title, description, category and brand
+    lexical_index = build_lexical_index(engine)
+    lexical_index.save(lexical_path)
+    engine.attach_lexical_index(lexical_index)
+    
+    print(f"BM25 index: {len(lexical_index.terms)} terms, {lexical_index.rows.shape[0]} postings")
+    return lexical_index
+
+
+def sync_indexes(products):
+    print("Syncing embedding stores with the fetched catalog...")
+    
+    text_stats = sync_store(
+        TEXT_STORE_PATH,
+        products,
+        lambda p: text_document(p).metadata,
+        product_text,
+        lambda changed: embed_text_products(changed, HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5"))
+    )
+    print(f"Text store: {json.dumps(text_stats)}")
+    
+    def embed_images(changed):
+        pipeline = ImageIngestionPipeline(
+            get_clip_model(),
+            download_workers=INGEST_DOWNLOAD_WORKERS,
+            decode_workers=INGEST_DECODE_WORKERS,
+            batch_size=INGEST_BATCH_SIZE,
+            encode_threads=INGEST_ENCODE_THREADS
+        )
+        embedded_products = pipeline.run(changed)
+        print(f"Ingestion report: {json.dumps(pipeline.report(), indent=2)}")
+        return embedded_products
+    
+    image_stats = sync_store(IMAGE_STORE_PATH, products, image_metadata, lambda p: p['title'], embed_images)
+    print(f"Image store: {json.dumps(image_stats)}")
+    
+    # Metadata-only versions keep the same rows, so the existing IVF lists stay valid
+    if text_stats["embeddings_changed"]:
+        text_engine = VectorEngine.from_store(TEXT_STORE_PATH)
+        create_ann_index(text_engine, TEXT_ANN_PATH)
+        create_lexical_index(text_engine, TEXT_LEXICAL_PATH)
+    if image_stats["embeddings_changed"]:
+        create_ann_index(VectorEngine.from_store(IMAGE_STORE_PATH), IMAGE_ANN_PATH)
+    
+    return text_stats, image_stats
+
+
+def initialize_indexes(incremental=False):
     print("Initializing product catalog indexes...")
     
 
     products = fetch_product_catalog()
     print(f"Fetched {len(products)} products")
     
+    if incremental and read_manifest(TEXT_STORE_PATH) and read_manifest(IMAGE_STORE_PATH):
+        sync_indexes(products)
+        print(f"\nStores synced: {TEXT_STORE_PATH}, {IMAGE_STORE_PATH}")
+        return None, None
+    if incremental:
+        print("No embedding stores found, falling back to a full build")
+    
     text_index = create_text_index(products)
     image_index = create_image_index(products)
     
+    text_engine = create_embedding_store(text_index, TEXT_STORE_PATH)
+    image_engine = create_embedding_store(image_index, IMAGE_STORE_PATH)
+    
+    create_ann_index(text_engine, TEXT_ANN_PATH)
+    create_ann_index(image_engine, IMAGE_ANN_PATH)
+    create_lexical_index(text_engine, TEXT_LEXICAL_PATH)
+    
     print("\nAll indexes created successfully!")
-    print(f"Text index: {TEXT_STORAGE_PATH}")
-    print(f"Image index: {IMAGE_STORAGE_PATH}")
+    print(f"Text index: {TEXT_STORAGE_PATH} (store: {TEXT_STORE_PATH}, BM25: {TEXT_LEXICAL_PATH})")
+    print(f"Image index: {IMAGE_STORAGE_PATH} (store: {IMAGE_STORE_PATH})")
     
     return text_index, image_index
 
 
 if __name__ == "__main__":
-    initialize_indexes()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build or sync the product search indexes")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Diff the catalog against the stored embeddings and only re-embed changed products"
+    )
+    args = parser.parse_args()
+    initialize_indexes(incremental=args.incremental)
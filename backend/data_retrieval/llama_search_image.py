@@ -1,51 +1,152 @@
-from llama_index.core import load_index_from_storage, StorageContext
-from llama_index.embeddings.clip import ClipEmbedding
 from typing import List, Dict, Any, Optional
+import atexit
 import os
 import base64
+import hashlib
 from io import BytesIO
 from PIL import Image
 import logging
+import re
+import threading
 import time
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from app import is_retryable_error, retry_operation
+from core.errors import is_retryable_error
+from core.retry import retry_operation
+from data_retrieval.model_registry import get_clip_model, CLIP_MODEL_NAME
+from data_retrieval.vector_engine import VectorEngine, spec_filters
+from data_retrieval.ann_index import attach_ann_index
+from data_retrieval.embedding_store import read_manifest, file_stamp
+from data_retrieval.caches import EmbeddingCache, SearchResultCache, search_cache_key
+from data_retrieval.micro_batcher import MicroBatcher
+from data_retrieval.search_config import (
+    IMAGE_SEARCH_MODE, STORE_RELOAD_INTERVAL, SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL,
+    IMAGE_EMBEDDING_CACHE_SIZE, IMAGE_EMBEDDING_CACHE_PATH, IMAGE_BATCH_WINDOW_MS, IMAGE_BATCH_MAX_SIZE,
+    UPLOAD_IMAGE_DIR
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 IMAGE_STORAGE_PATH = os.path.join(BASE_DIR, "storage", "image_index")
+IMAGE_ANN_PATH = os.path.join(BASE_DIR, "storage", "image_ivf.npz")
+IMAGE_STORE_PATH = os.path.join(BASE_DIR, "storage", "image_store")
+CLIP_EMBED_DIM = 512
+CONTENT_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
 
 
+def uploaded_image_hash(image_path: str) -> Optional[str]:
+    # /upload_image stores files as <sha256>.jpg, so for uploads the name already is the content hash;
+    # anywhere else (or through a symlink out of the upload directory) a hash-like name proves nothing
+    real_path = os.path.realpath(image_path)
+    stem = os.path.splitext(os.path.basename(real_path))[0]
+    if CONTENT_HASH_PATTERN.match(stem) and os.path.dirname(real_path) == os.path.realpath(UPLOAD_IMAGE_DIR):
+        return stem
+    return None
+
+
+def image_content_hash(image_path: str) -> str:
+    image_hash = uploaded_image_hash(image_path)
+    if image_hash is not None:
+        return image_hash
+    with open(image_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
 
 class ImageProductSearch:
     def __init__(self):
         self.index = None
-        self.embed_model = None
+        self.clip_model = get_clip_model()
+        self.engine = None
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = time.monotonic()
+        self._index_stamps: Dict[str, Optional[int]] = {}
+        self.result_cache = SearchResultCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+        self.embedding_cache = EmbeddingCache(
+            max_entries=IMAGE_EMBEDDING_CACHE_SIZE,
+            path=IMAGE_EMBEDDING_CACHE_PATH or None,
+            namespace=CLIP_MODEL_NAME
+        )
+        if IMAGE_EMBEDDING_CACHE_PATH:
+            atexit.register(self.embedding_cache.save)
+        self.image_batcher = MicroBatcher(
+            self._encode_images, "image_query", window_ms=IMAGE_BATCH_WINDOW_MS, max_batch=IMAGE_BATCH_MAX_SIZE
+        )
         self._load_index()
     
     def _load_index(self):
-        if not os.path.exists(IMAGE_STORAGE_PATH):
+        if not os.path.exists(IMAGE_STORE_PATH) and not os.path.exists(IMAGE_STORAGE_PATH):
             raise FileNotFoundError(
-                f"Image index not found at {IMAGE_STORAGE_PATH}. "
+                f"Image index not found at {IMAGE_STORE_PATH} or {IMAGE_STORAGE_PATH}. "
                 "Please run llama_search_config.py first to create indexes."
             )
         
         def _load():
-            self.embed_model = ClipEmbedding()
-            storage_context = StorageContext.from_defaults(persist_dir=IMAGE_STORAGE_PATH)
-            self.index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+            if read_manifest(IMAGE_STORE_PATH) is not None:
+                self.engine = VectorEngine.from_store(IMAGE_STORE_PATH)
+            else:
+                # Only the legacy docstore layout needs llama_index, so it is imported on this path alone
+                from llama_index.core import load_index_from_storage, StorageContext
+                from llama_index.core.embeddings import MockEmbedding
+                
+                # Queries always carry a precomputed CLIP embedding, so the index never embeds text itself
+                storage_context = StorageContext.from_defaults(persist_dir=IMAGE_STORAGE_PATH)
+                self.index = load_index_from_storage(
+                    storage_context, embed_model=MockEmbedding(embed_dim=CLIP_EMBED_DIM)
+                )
+                self.engine = VectorEngine.from_llama_index(self.index)
+            self._prepare_engine(self.engine)
             logger.info("Image index loaded successfully")
         
         try:
-            retry_operation(_load, max_retries=2)
+            retry_operation(_load, max_retries=2, dependency="image_index")
         except Exception as e:
             logger.error(f"Failed to load image index after retries: {e}")
             raise
     
+    def _prepare_engine(self, engine: VectorEngine):
+        if IMAGE_SEARCH_MODE == "ivf":
+            self._index_stamps[IMAGE_ANN_PATH] = file_stamp(IMAGE_ANN_PATH)
+            attach_ann_index(engine, IMAGE_ANN_PATH)
+        elif IMAGE_SEARCH_MODE != "exact":
+            raise ValueError(f"Unsupported search mode: {IMAGE_SEARCH_MODE}")
+    
+    def _maybe_reload(self):
+        # Picks up catalog syncs from llama_config --incremental without restarting the server
+        now = time.monotonic()
+        if now - self._last_reload_check < STORE_RELOAD_INTERVAL:
+            return
+        self._last_reload_check = now
+        
+        manifest = read_manifest(IMAGE_STORE_PATH)
+        if manifest is None:
+            return
+        if manifest["version"] == self.engine.version:
+            self._attach_rebuilt_indexes()
+            return
+        
+        with self._reload_lock:
+            if manifest["version"] == self.engine.version:
+                return
+            try:
+                engine = VectorEngine.from_store(IMAGE_STORE_PATH)
+                self._prepare_engine(engine)
+            except Exception as e:
+                logger.warning(f"Keeping image index v{self.engine.version}, reload failed: {e}")
+                return
+            self.engine = engine
+            logger.info(f"Image index reloaded at store v{engine.version} ({len(engine)} products)")
+    
+    def _attach_rebuilt_indexes(self):
+        # An index that was stale at load is served around until llama_config.py rewrites its file
+        if IMAGE_SEARCH_MODE == "ivf" and self.engine.ann_index is None and file_stamp(IMAGE_ANN_PATH) != self._index_stamps.get(IMAGE_ANN_PATH):
+            with self._reload_lock:
+                if self.engine.ann_index is None:
+                    self._index_stamps[IMAGE_ANN_PATH] = file_stamp(IMAGE_ANN_PATH)
+                    attach_ann_index(self.engine, IMAGE_ANN_PATH)
+    
     def _process_image_input(self, image_input: str) -> Image.Image:
         try:
             if os.path.exists(image_input):
@@ -69,6 +170,85 @@ class ImageProductSearch:
             logger.error(f"Failed to process image input: {e}")
             raise ValueError(f"Could not process image input: {e}")
     
+    def _encode_images(self, images: List[Image.Image]) -> List[Any]:
+        if len(images) == 1:
+            return [self.clip_model.encode(images[0])]
+        return list(self.clip_model.encode(images, batch_size=len(images)))
+    
+    def embed_image(self, image_path: str, image_hash: str) -> List[float]:
+        def _encode():
+            # Decoding stays on the caller's thread; only the CLIP forward pass is batched
+            img = Image.open(image_path).convert('RGB')
+            return retry_operation(lambda: self.image_batcher.encode(img), dependency="clip_model")
+        
+        return self.embedding_cache.get_or_compute(image_hash, _encode)
+    
+    def embed_images(self, image_paths: List[str]) -> List[List[float]]:
+        hashes = [image_content_hash(image_path) for image_path in image_paths]
+        embeddings = [self.embedding_cache.get(image_hash) for image_hash in hashes]
+        # Misses are submitted together so the micro-batcher encodes them in one CLIP pass
+        images = {}
+        for image_hash, image_path, embedding in zip(hashes, image_paths, embeddings):
+            if embedding is None and image_hash not in images:
+                images[image_hash] = Image.open(image_path).convert('RGB')
+        
+        def _encode():
+            futures = {image_hash: self.image_batcher.submit(img) for image_hash, img in images.items()}
+            return {image_hash: future.result() for image_hash, future in futures.items()}
+        
+        computed = retry_operation(_encode, dependency="clip_model") if images else {}
+        for image_hash, embedding in computed.items():
+            self.embedding_cache.put(image_hash, embedding)
+        return [
+            embedding if embedding is not None else computed[image_hash]
+            for image_hash, embedding in zip(hashes, embeddings)
+        ]
+    
+    def _validate(self, image_input: str, limit: int):
+        if not image_input:
+            raise ValueError("Image input cannot be empty")
+        
+        if limit < 1 or limit > 100:
+            raise ValueError("Limit must be between 1 and 100")
+    
+    def _build_result(self, engine: VectorEngine, row: int, score: float) -> Dict[str, Any]:
+        metadata = engine.metadata[row]
+        return {
+            "product_id": metadata.get("product_id"),
+            "title": metadata.get("title"),
+            "price": metadata.get("price"),
+            "category": metadata.get("category"),
+            "thumbnail": metadata.get("thumbnail"),
+            "similarity_score": score,
+            "rating": metadata.get("rating"),
+            "stock": metadata.get("stock"),
+            "brand": metadata.get("brand")
+        }
+    
+    def cached_search(
+        self,
+        image_input: str,
+        limit: int = 5,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        brand: Optional[str] = None,
+        in_stock: bool = False
+    ) -> Optional[List[Dict[str, Any]]]:
+        # Lookup only, cheap enough for the event loop; other images need their bytes hashed, which
+        # is left to the embedding stage
+        engine = self.engine
+        image_hash = uploaded_image_hash(image_input) if engine is not None and image_input else None
+        if image_hash is None:
+            return None
+        cache_key = search_cache_key(
+            engine.version, image_hash, limit,
+            category, min_price, max_price, min_rating, brand, in_stock
+        )
+        # search() counts the miss when it runs
+        return self.result_cache.get(cache_key, count_miss=False)
+    
     def search(
         self, 
         image_input: str, 
@@ -78,86 +258,145 @@ class ImageProductSearch:
         max_price: Optional[float] = None,
         min_rating: Optional[float] = None,
         brand: Optional[str] = None,
-        in_stock: bool = False
+        in_stock: bool = False,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
-        if not image_input:
-            raise ValueError("Image input cannot be empty")
+        self._validate(image_input, limit)
         
-        if limit < 1 or limit > 100:
-            raise ValueError("Limit must be between 1 and 100")
+        image_hash = image_content_hash(image_input)
+        
+        self._maybe_reload()
+        engine = self.engine
+        
+        self.result_cache.for_version(engine.version)
+        cache_key = search_cache_key(
+            engine.version, image_hash, limit,
+            category, min_price, max_price, min_rating, brand, in_stock
+        )
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Image search served {len(cached)} cached results for image {cache_key[1][:12]}")
+            return cached
         
         def _search():
-            from sentence_transformers import SentenceTransformer
-            from llama_index.core.schema import QueryBundle
-            from llama_index.core.vector_stores import MetadataFilters, MetadataFilter
+            embedding = query_embedding if query_embedding is not None else self.embed_image(image_input, image_hash)
             
-            img = Image.open(image_input).convert('RGB')
-            
-            clip_model = SentenceTransformer('clip-ViT-B-32')
-            query_embedding = clip_model.encode(img)
-            
-            query_bundle = QueryBundle(
-                query_str="",
-                embedding=query_embedding.tolist()
+            mask = engine.filter_mask(
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+                min_rating=min_rating,
+                brand=brand,
+                in_stock=in_stock
             )
+            hits = engine.search(embedding, limit, mask=mask)
             
-            filters = []
-            
-            if category:
-                filters.append(MetadataFilter(key="category", value=category, operator="=="))
-            if min_price is not None:
-                filters.append(MetadataFilter(key="price", value=min_price, operator=">="))
-            if max_price is not None:
-                filters.append(MetadataFilter(key="price", value=max_price, operator="<="))
-            if min_rating is not None:
-                filters.append(MetadataFilter(key="rating", value=min_rating, operator=">="))
-            if brand:
-                filters.append(MetadataFilter(key="brand", value=brand, operator="=="))
-            if in_stock:
-                filters.append(MetadataFilter(key="stock", value=0, operator=">"))
-            
-            retriever_kwargs = {"similarity_top_k": limit}
-            if filters:
-                retriever_kwargs["filters"] = MetadataFilters(filters=filters)
-            
-            retriever = self.index.as_retriever(**retriever_kwargs)
-            nodes = retriever.retrieve(query_bundle)
-            
-            results = []
-            for node in nodes:
-                result = {
-                    "product_id": node.metadata.get("product_id"),
-                    "title": node.metadata.get("title"),
-                    "price": node.metadata.get("price"),
-                    "category": node.metadata.get("category"),
-                    "thumbnail": node.metadata.get("thumbnail"),
-                    "similarity_score": node.score,
-                    "rating": node.metadata.get("rating"),
-                    "stock": node.metadata.get("stock"),
-                    "brand": node.metadata.get("brand")
-                }
-                results.append(result)
+            results = [self._build_result(engine, row, score) for row, score in hits]
             
             logger.info(f"Image search found {len(results)} results")
             return results
         
         try:
-            return retry_operation(_search, max_retries=2)
+            results = retry_operation(_search, max_retries=2, dependency="image_index")
+            self.result_cache.put(cache_key, results)
+            return results
         except Exception as e:
             error_type = "retryable" if is_retryable_error(e) else "non-retryable"
             logger.error(f"Image search failed ({error_type}): {e}", exc_info=True)
             raise
 
+    
+    def search_batch(
+        self,
+        searches: List[Dict[str, Any]],
+        query_embeddings: Optional[List[List[float]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        for spec in searches:
+            self._validate(spec.get("image_input"), spec.get("limit", 5))
+        
+        image_hashes = [image_content_hash(spec["image_input"]) for spec in searches]
+        
+        self._maybe_reload()
+        engine = self.engine
+        
+        self.result_cache.for_version(engine.version)
+        cache_keys = [
+            search_cache_key(engine.version, image_hash, spec.get("limit", 5), *spec_filters(spec).values())
+            for spec, image_hash in zip(searches, image_hashes)
+        ]
+        results = [self.result_cache.get(cache_key) for cache_key in cache_keys]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if not missing:
+            logger.info(f"Image batch search served all {len(searches)} images from cache")
+            return results
+        
+        def _search():
+            if query_embeddings is not None:
+                embeddings = [query_embeddings[i] for i in missing]
+            else:
+                embeddings = self.embed_images([searches[i]["image_input"] for i in missing])
+            masks = [engine.filter_mask(**spec_filters(searches[i])) for i in missing]
+            return engine.search_batch(embeddings, [searches[i].get("limit", 5) for i in missing], masks)
+        
+        try:
+            batch_hits = retry_operation(_search, max_retries=2, dependency="image_index")
+        except Exception as e:
+            error_type = "retryable" if is_retryable_error(e) else "non-retryable"
+            logger.error(f"Image batch search failed ({error_type}): {e}", exc_info=True)
+            raise
+        
+        for i, hits in zip(missing, batch_hits):
+            results[i] = [self._build_result(engine, row, score) for row, score in hits]
+            self.result_cache.put(cache_keys[i], results[i])
+        logger.info(f"Image batch search ran {len(missing)} of {len(searches)} images in one scoring pass")
+        return results
+
 
 _image_search_instance = None
+_image_search_lock = threading.Lock()
 
 def get_image_search() -> ImageProductSearch:
     global _image_search_instance
     if _image_search_instance is None:
-        _image_search_instance = ImageProductSearch()
+        with _image_search_lock:
+            if _image_search_instance is None:
+                _image_search_instance = ImageProductSearch()
     return _image_search_instance
 
 
+def get_result_cache_stats() -> Dict[str, Any]:
+    return get_image_search().result_cache.stats()
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    return get_image_search().embedding_cache.stats()
+
+
+def get_image_batcher_stats() -> Dict[str, Any]:
+    return get_image_search().image_batcher.stats()
+
+
+def cached_image_search(image_input: str, limit: int = 5, **filters) -> Optional[List[Dict[str, Any]]]:
+    # Never builds the searcher: before its first search there is nothing cached anyway
+    searcher = _image_search_instance
+    return searcher.cached_search(image_input, limit, **filters) if searcher is not None else None
+
+
+def embed_image_query(image_input: str) -> List[float]:
+    return get_image_search().embed_image(image_input, image_content_hash(image_input))
+
+
+def embed_image_queries(image_inputs: List[str]) -> List[List[float]]:
+    return get_image_search().embed_images(image_inputs)
+
+
+def search_products_by_image_batch(
+    searches: List[Dict[str, Any]],
+    query_embeddings: Optional[List[List[float]]] = None
+) -> List[List[Dict[str, Any]]]:
+    return get_image_search().search_batch(searches, query_embeddings=query_embeddings)
+
+
 def search_products_by_image(
     image_input: str,
     limit: int = 5,
@@ -166,7 +405,8 @@ def search_products_by_image(
     max_price: Optional[float] = None,
     min_rating: Optional[float] = None,
     brand: Optional[str] = None,
-    in_stock: bool = False
+    in_stock: bool = False,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     searcher = get_image_search()
     return searcher.search(
@@ -177,5 +417,6 @@ def search_products_by_image(
         max_price=max_price,
         min_rating=min_rating,
         brand=brand,
-        in_stock=in_stock
-    )
\ No newline at end of file
+        in_stock=in_stock,
+        query_embedding=query_embedding
+    )
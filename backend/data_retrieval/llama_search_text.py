@@ -1,47 +1,291 @@
-from llama_index.core import load_index_from_storage, StorageContext
-from llama_index.core.vector_stores import MetadataFilters, MetadataFilter
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import atexit
 import os
 import logging
+import threading
 import time
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from app import is_retryable_error, retry_operation
+from core.errors import is_retryable_error
+from core.retry import retry_operation
+from data_retrieval.vector_engine import VectorEngine, spec_filters
+from data_retrieval.ann_index import attach_ann_index
+from data_retrieval.lexical_index import attach_lexical_index, reciprocal_rank_fusion
+from data_retrieval.embedding_store import read_manifest, file_stamp
+from data_retrieval.caches import EmbeddingCache, SearchResultCache, normalize_query_text, search_cache_key
+from data_retrieval.micro_batcher import MicroBatcher
+from data_retrieval.search_config import (
+    TEXT_SEARCH_MODE, TEXT_RETRIEVAL_MODE, HYBRID_CANDIDATES, STORE_RELOAD_INTERVAL,
+    QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL, QUERY_EMBEDDING_CACHE_PATH,
+    SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL, QUERY_BATCH_WINDOW_MS, QUERY_BATCH_MAX_SIZE
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEXT_STORAGE_PATH = os.path.join(BASE_DIR, "storage", "text_index")
+TEXT_ANN_PATH = os.path.join(BASE_DIR, "storage", "text_ivf.npz")
+TEXT_STORE_PATH = os.path.join(BASE_DIR, "storage", "text_store")
+TEXT_LEXICAL_PATH = os.path.join(BASE_DIR, "storage", "text_bm25.npz")
+TEXT_EMBED_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+# The BGE prompt HuggingFaceEmbedding puts before queries, pinned so batched and single queries embed alike
+TEXT_QUERY_INSTRUCTION = "Represent this question for searching relevant passages: "
 
 
 class TextProductSearch:
     def __init__(self):
         self.index = None
         self.embed_model = None
+        self.engine = None
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = time.monotonic()
+        self._index_stamps: Dict[str, Optional[int]] = {}
+        self.retrieval_counts = {"dense": 0, "hybrid": 0, "lexical": 0}
+        self.query_cache = EmbeddingCache(
+            max_entries=QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=QUERY_EMBEDDING_CACHE_TTL,
+            path=QUERY_EMBEDDING_CACHE_PATH or None,
+            namespace=TEXT_EMBED_MODEL_NAME
+        )
+        if QUERY_EMBEDDING_CACHE_PATH:
+            atexit.register(self.query_cache.save)
+        self.result_cache = SearchResultCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+        self.query_batcher = MicroBatcher(
+            self._embed_queries, "text_query", window_ms=QUERY_BATCH_WINDOW_MS, max_batch=QUERY_BATCH_MAX_SIZE
+        )
         self._load_index()
     
     def _load_index(self):
-        if not os.path.exists(TEXT_STORAGE_PATH):
+        if not os.path.exists(TEXT_STORE_PATH) and not os.path.exists(TEXT_STORAGE_PATH):
             raise FileNotFoundError(
-                f"Text index not found at {TEXT_STORAGE_PATH}. "
+                f"Text index not found at {TEXT_STORE_PATH} or {TEXT_STORAGE_PATH}. "
                 "Please run llama_search_config.py first to create indexes."
             )
         
         def _load():
-            self.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
-            storage_context = StorageContext.from_defaults(persist_dir=TEXT_STORAGE_PATH)
-            self.index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+            # Imported here: llama_index and torch add seconds to the startup of every process importing this module
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+            
+            self.embed_model = HuggingFaceEmbedding(
+                model_name=TEXT_EMBED_MODEL_NAME,
+                query_instruction=TEXT_QUERY_INSTRUCTION,
+                embed_batch_size=max(QUERY_BATCH_MAX_SIZE, 1)
+            )
+            if read_manifest(TEXT_STORE_PATH) is not None:
+                self.engine = VectorEngine.from_store(TEXT_STORE_PATH)
+            else:
+                from llama_index.core import load_index_from_storage, StorageContext
+                storage_context = StorageContext.from_defaults(persist_dir=TEXT_STORAGE_PATH)
+                self.index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+                self.engine = VectorEngine.from_llama_index(self.index)
+            self._prepare_engine(self.engine)
             logger.info("Text index loaded successfully")
         
         try:
-            retry_operation(_load, max_retries=2)
+            retry_operation(_load, max_retries=2, dependency="text_index")
         except Exception as e:
             logger.error(f"Failed to load text index after retries: {e}")
             raise
     
+    def _prepare_engine(self, engine: VectorEngine):
+        if TEXT_SEARCH_MODE == "ivf":
+            self._index_stamps[TEXT_ANN_PATH] = file_stamp(TEXT_ANN_PATH)
+            attach_ann_index(engine, TEXT_ANN_PATH)
+        elif TEXT_SEARCH_MODE != "exact":
+            raise ValueError(f"Unsupported search mode: {TEXT_SEARCH_MODE}")
+        if TEXT_RETRIEVAL_MODE in ("hybrid", "bm25"):
+            self._index_stamps[TEXT_LEXICAL_PATH] = file_stamp(TEXT_LEXICAL_PATH)
+            attach_lexical_index(engine, TEXT_LEXICAL_PATH)
+        elif TEXT_RETRIEVAL_MODE != "dense":
+            raise ValueError(f"Unsupported retrieval mode: {TEXT_RETRIEVAL_MODE}")
+    
+    def _maybe_reload(self):
+        # Picks up catalog syncs from llama_config --incremental without restarting the server
+        now = time.monotonic()
+        if now - self._last_reload_check < STORE_RELOAD_INTERVAL:
+            return
+        self._last_reload_check = now
+        
+        manifest = read_manifest(TEXT_STORE_PATH)
+        if manifest is None:
+            return
+        if manifest["version"] == self.engine.version:
+            self._attach_rebuilt_indexes()
+            return
+        
+        with self._reload_lock:
+            if manifest["version"] == self.engine.version:
+                return
+            try:
+                engine = VectorEngine.from_store(TEXT_STORE_PATH)
+                self._prepare_engine(engine)
+            except Exception as e:
+                logger.warning(f"Keeping text index v{self.engine.version}, reload failed: {e}")
+                return
+            self.engine = engine
+            logger.info(f"Text index reloaded at store v{engine.version} ({len(engine)} products)")
+    
+    def _attach_rebuilt_indexes(self):
+        # An index that was stale at load is served around until llama_config.py rewrites its file
+        if TEXT_SEARCH_MODE == "ivf" and self.engine.ann_index is None and file_stamp(TEXT_ANN_PATH) != self._index_stamps.get(TEXT_ANN_PATH):
+            with self._reload_lock:
+                if self.engine.ann_index is None:
+                    self._index_stamps[TEXT_ANN_PATH] = file_stamp(TEXT_ANN_PATH)
+                    attach_ann_index(self.engine, TEXT_ANN_PATH)
+        if (
+            TEXT_RETRIEVAL_MODE in ("hybrid", "bm25") and self.engine.lexical_index is None
+            and file_stamp(TEXT_LEXICAL_PATH) != self._index_stamps.get(TEXT_LEXICAL_PATH)
+        ):
+            with self._reload_lock:
+                if self.engine.lexical_index is None:
+                    self._index_stamps[TEXT_LEXICAL_PATH] = file_stamp(TEXT_LEXICAL_PATH)
+                    attach_lexical_index(self.engine, TEXT_LEXICAL_PATH)
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if len(queries) == 1:
+            return [self.embed_model.get_query_embedding(queries[0])]
+        # BGE has no document prompt, so prefixing the query prompt gives get_query_embedding's input in one forward pass
+        return self.embed_model.get_text_embedding_batch([TEXT_QUERY_INSTRUCTION + query for query in queries])
+    
+    def is_lexical_query(self, query: str, filters: Optional[Dict[str, Any]] = None) -> bool:
+        engine = self.engine
+        lexical_index = engine.lexical_index if engine is not None else None
+        if lexical_index is None:
+            return False
+        if TEXT_RETRIEVAL_MODE == "bm25":
+            return True
+        if not lexical_index.is_lexical_query(query):
+            return False
+        # Decided here, on the embedding stage: a lookup whose matches the filters all remove falls
+        # back to dense retrieval, so its embedding must not be left for the scoring stage to compute
+        mask = engine.filter_mask(**filters) if filters else None
+        return mask is None or bool(engine.lexical_search(query, 1, mask=mask, require_all=True))
+    
+    def embed_query(self, query: str, filters: Optional[Dict[str, Any]] = None) -> Optional[List[float]]:
+        # None for queries the BM25 index answers alone: the embedding model is never run for them
+        if self.is_lexical_query(query, filters):
+            return None
+        return self._embed_dense(query)
+    
+    def _embed_dense(self, query: str) -> List[float]:
+        return self.query_cache.get_or_compute(
+            normalize_query_text(query),
+            lambda: retry_operation(lambda: self.query_batcher.encode(query), dependency="text_embedding")
+        )
+    
+    def _validate(self, query: str, limit: int):
+        if not query or not query.strip():
+            raise ValueError("Query cannot be empty")
+        
+        # Same rule the tools and POST /search/batch apply, so a spec they accept never fails a whole batch here
+        if len(query.strip()) > 500:
+            raise ValueError("Query too long (max 500 characters)")
+        
+        if limit < 1 or limit > 100:
+            raise ValueError("Limit must be between 1 and 100")
+    
+    def _build_result(self, engine: VectorEngine, row: int, score: float) -> Dict[str, Any]:
+        metadata = engine.metadata[row]
+        text = engine.texts[row]
+        return {
+            "product_id": metadata.get("product_id"),
+            "title": metadata.get("title"),
+            "price": metadata.get("price"),
+            "category": metadata.get("category"),
+            "rating": metadata.get("rating"),
+            "stock": metadata.get("stock"),
+            "brand": metadata.get("brand"),
+            "thumbnail": metadata.get("thumbnail"),
+            "similarity_score": score,
+            "text_snippet": text[:200] + "..." if len(text) > 200 else text
+        }
+    
+    def embed_queries(
+        self,
+        queries: List[str],
+        filters: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Optional[List[float]]]:
+        lexical = [self.is_lexical_query(query, filters[i] if filters else None) for i, query in enumerate(queries)]
+        keys = [normalize_query_text(query) for query in queries]
+        embeddings = [None if is_lexical else self.query_cache.get(key) for key, is_lexical in zip(keys, lexical)]
+        # Misses are submitted together so the micro-batcher encodes them in one forward pass
+        missing = {}
+        for key, query, embedding, is_lexical in zip(keys, queries, embeddings, lexical):
+            if embedding is None and not is_lexical:
+                missing.setdefault(key, query)
+        
+        def _encode():
+            futures = {key: self.query_batcher.submit(query) for key, query in missing.items()}
+            return {key: future.result() for key, future in futures.items()}
+        
+        computed = retry_operation(_encode, dependency="text_embedding") if missing else {}
+        for key, embedding in computed.items():
+            self.query_cache.put(key, embedding)
+        return [
+            None if is_lexical else embedding if embedding is not None else computed[key]
+            for key, embedding, is_lexical in zip(keys, embeddings, lexical)
+        ]
+    
+    def _retrieve(
+        self,
+        engine: VectorEngine,
+        queries: List[str],
+        embeddings: List[Optional[List[float]]],
+        limits: List[int],
+        masks: List[Any]
+    ) -> List[List[Tuple[int, float]]]:
+        results: List[Any] = [None] * len(queries)
+        dense = []
+        for i, (query, embedding, limit, mask) in enumerate(zip(queries, embeddings, limits, masks)):
+            if engine.lexical_index is not None and (TEXT_RETRIEVAL_MODE == "bm25" or embedding is None):
+                # An exact-token lookup only returns products containing every term, not partial matches
+                hits = engine.lexical_search(query, limit, mask=mask, require_all=TEXT_RETRIEVAL_MODE != "bm25")
+                if hits or TEXT_RETRIEVAL_MODE == "bm25":
+                    results[i] = hits
+                    self.retrieval_counts["lexical"] += 1
+                    continue
+            dense.append(i)
+        if not dense:
+            return results
+        
+        hybrid = engine.lexical_index is not None and TEXT_RETRIEVAL_MODE == "hybrid"
+        depths = [max(limits[i], HYBRID_CANDIDATES) if hybrid else limits[i] for i in dense]
+        # The embedding stage already embeds lookups the filters empty; this only runs if the index was
+        # reloaded in between, or for in-process callers that left embedding to search()
+        vectors = [embeddings[i] if embeddings[i] is not None else self._embed_dense(queries[i]) for i in dense]
+        batch_hits = engine.search_batch(vectors, depths, [masks[i] for i in dense])
+        for i, depth, hits in zip(dense, depths, batch_hits):
+            if hybrid:
+                lexical_hits = engine.lexical_search(queries[i], depth, mask=masks[i])
+                hits = reciprocal_rank_fusion([hits, lexical_hits], limits[i])
+            results[i] = hits
+            self.retrieval_counts["hybrid" if hybrid else "dense"] += 1
+        return results
+    
+    def cached_search(
+        self,
+        query: str,
+        limit: int = 5,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        brand: Optional[str] = None,
+        in_stock: bool = False
+    ) -> Optional[List[Dict[str, Any]]]:
+        # Lookup only, cheap enough for the event loop: a hit skips the embedding and scoring stages
+        engine = self.engine
+        if engine is None or not query or not query.strip():
+            return None
+        cache_key = search_cache_key(
+            engine.version, normalize_query_text(query), limit,
+            category, min_price, max_price, min_rating, brand, in_stock
+        )
+        # search() counts the miss when it runs
+        return self.result_cache.get(cache_key, count_miss=False)
+    
     def search(
         self, 
         query: str, 
@@ -51,76 +295,158 @@ class TextProductSearch:
         max_price: Optional[float] = None,
         min_rating: Optional[float] = None,
         brand: Optional[str] = None,
-        in_stock: bool = False
+        in_stock: bool = False,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
-        if not query or not query.strip():
-            raise ValueError("Query cannot be empty")
+        self._validate(query, limit)
         
-        if len(query) > 500:
-            raise ValueError("Query too long (max 500 characters)")
+        self._maybe_reload()
+        engine = self.engine
         
-        if limit < 1 or limit > 100:
-            raise ValueError("Limit must be between 1 and 100")
+        self.result_cache.for_version(engine.version)
+        cache_key = search_cache_key(
+            engine.version, normalize_query_text(query), limit,
+            category, min_price, max_price, min_rating, brand, in_stock
+        )
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Text search served {len(cached)} cached results for query: '{query}'")
+            return cached
+        
+        filters = {
+            "category": category, "min_price": min_price, "max_price": max_price,
+            "min_rating": min_rating, "brand": brand, "in_stock": in_stock
+        }
         
         def _search():
-            filters = []
-            
-            if category:
-                filters.append(MetadataFilter(key="category", value=category, operator="=="))
-            if min_price is not None:
-                filters.append(MetadataFilter(key="price", value=min_price, operator=">="))
-            if max_price is not None:
-                filters.append(MetadataFilter(key="price", value=max_price, operator="<="))
-            if min_rating is not None:
-                filters.append(MetadataFilter(key="rating", value=min_rating, operator=">="))
-            if brand:
-                filters.append(MetadataFilter(key="brand", value=brand, operator="=="))
-            if in_stock:
-                filters.append(MetadataFilter(key="stock", value=0, operator=">"))
-            
-            retriever_kwargs = {"similarity_top_k": limit}
-            if filters:
-                retriever_kwargs["filters"] = MetadataFilters(filters=filters)
-            
-            retriever = self.index.as_retriever(**retriever_kwargs)
-            nodes = retriever.retrieve(query)
+            embedding = query_embedding if query_embedding is not None else self.embed_query(query, filters)
+            mask = engine.filter_mask(
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+                min_rating=min_rating,
+                brand=brand,
+                in_stock=in_stock
+            )
+            hits = self._retrieve(engine, [query], [embedding], [limit], [mask])[0]
             
-            results = []
-            for node in nodes:
-                result = {
-                    "product_id": node.metadata.get("product_id"),
-                    "title": node.metadata.get("title"),
-                    "price": node.metadata.get("price"),
-                    "category": node.metadata.get("category"),
-                    "rating": node.metadata.get("rating"),
-                    "stock": node.metadata.get("stock"),
-                    "brand": node.metadata.get("brand"),
-                    "thumbnail": node.metadata.get("thumbnail"),
-                    "similarity_score": node.score,
-                    "text_snippet": node.text[:200] + "..." if len(node.text) > 200 else node.text
-                }
-                results.append(result)
+            results = [self._build_result(engine, row, score) for row, score in hits]
             
-            logger.info(f"Text search found {len(results)} results for query: '{query}'")
+            cache_stats = self.query_cache.stats()
+            logger.info(
+                f"Text search found {len(results)} results for query: '{query}' "
+                f"(query cache {cache_stats['hits']} hits / {cache_stats['misses']} misses)"
+            )
             return results
         
         try:
-            return retry_operation(_search, max_retries=2)
+            results = retry_operation(_search, max_retries=2, dependency="text_index")
+            self.result_cache.put(cache_key, results)
+            return results
         except Exception as e:
             error_type = "retryable" if is_retryable_error(e) else "non-retryable"
             logger.error(f"Text search failed ({error_type}): {e}", exc_info=True)
             raise
 
+    
+    def search_batch(
+        self,
+        searches: List[Dict[str, Any]],
+        query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        for spec in searches:
+            self._validate(spec.get("query"), spec.get("limit", 5))
+        
+        self._maybe_reload()
+        engine = self.engine
+        
+        self.result_cache.for_version(engine.version)
+        cache_keys = [
+            search_cache_key(
+                engine.version, normalize_query_text(spec["query"]), spec.get("limit", 5),
+                *spec_filters(spec).values()
+            )
+            for spec in searches
+        ]
+        results = [self.result_cache.get(cache_key) for cache_key in cache_keys]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if not missing:
+            logger.info(f"Text batch search served all {len(searches)} queries from cache")
+            return results
+        
+        def _search():
+            queries = [searches[i]["query"] for i in missing]
+            if query_embeddings is not None:
+                embeddings = [query_embeddings[i] for i in missing]
+            else:
+                embeddings = self.embed_queries(queries, [spec_filters(searches[i]) for i in missing])
+            masks = [engine.filter_mask(**spec_filters(searches[i])) for i in missing]
+            return self._retrieve(engine, queries, embeddings, [searches[i].get("limit", 5) for i in missing], masks)
+        
+        try:
+            batch_hits = retry_operation(_search, max_retries=2, dependency="text_index")
+        except Exception as e:
+            error_type = "retryable" if is_retryable_error(e) else "non-retryable"
+            logger.error(f"Text batch search failed ({error_type}): {e}", exc_info=True)
+            raise
+        
+        for i, hits in zip(missing, batch_hits):
+            results[i] = [self._build_result(engine, row, score) for row, score in hits]
+            self.result_cache.put(cache_keys[i], results[i])
+        logger.info(f"Text batch search ran {len(missing)} of {len(searches)} queries in one scoring pass")
+        return results
+
 
 _text_search_instance = None
+_text_search_lock = threading.Lock()
 
 def get_text_search() -> TextProductSearch:
     global _text_search_instance
     if _text_search_instance is None:
-        _text_search_instance = TextProductSearch()
+        # Executor threads can race on the first query; only one of them builds the searcher
+        with _text_search_lock:
+            if _text_search_instance is None:
+                _text_search_instance = TextProductSearch()
     return _text_search_instance
 
 
+def get_result_cache_stats() -> Dict[str, Any]:
+    return get_text_search().result_cache.stats()
+
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    return get_text_search().query_cache.stats()
+
+
+def get_query_batcher_stats() -> Dict[str, Any]:
+    return get_text_search().query_batcher.stats()
+
+
+def get_retrieval_stats() -> Dict[str, Any]:
+    return {"mode": TEXT_RETRIEVAL_MODE, **get_text_search().retrieval_counts}
+
+
+def cached_text_search(query: str, limit: int = 5, **filters) -> Optional[List[Dict[str, Any]]]:
+    # Never builds the searcher: before its first search there is nothing cached anyway
+    searcher = _text_search_instance
+    return searcher.cached_search(query, limit, **filters) if searcher is not None else None
+
+
+def embed_text_query(query: str, filters: Optional[Dict[str, Any]] = None) -> Optional[List[float]]:
+    return get_text_search().embed_query(query, filters)
+
+
+def embed_text_queries(queries: List[str], filters: Optional[List[Dict[str, Any]]] = None) -> List[Optional[List[float]]]:
+    return get_text_search().embed_queries(queries, filters)
+
+
+def search_products_by_text_batch(
+    searches: List[Dict[str, Any]],
+    query_embeddings: Optional[List[Optional[List[float]]]] = None
+) -> List[List[Dict[str, Any]]]:
+    return get_text_search().search_batch(searches, query_embeddings=query_embeddings)
+
+
 def search_products_by_text(
     query: str, 
     limit: int = 5,
@@ -129,7 +455,8 @@ def search_products_by_text(
     max_price: Optional[float] = None,
     min_rating: Optional[float] = None,
     brand: Optional[str] = None,
-    in_stock: bool = False
+    in_stock: bool = False,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     searcher = get_text_search()
     return searcher.search(
@@ -140,5 +467,6 @@ def search_products_by_text(
         max_price=max_price,
         min_rating=min_rating,
         brand=brand,
-        in_stock=in_stock
+        in_stock=in_stock,
+        query_embedding=query_embedding
     )
\ No newline at end of file
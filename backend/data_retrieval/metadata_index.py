@@ -0,0 +1,130 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from data_retrieval.embedding_store import CodedColumn, NumericColumn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = ("category", "brand")
+NUMERIC_FIELDS = ("price", "rating", "stock")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _column(metadata: Sequence[Dict[str, Any]], field: str) -> List[Any]:
+    if hasattr(metadata, "column"):
+        return metadata.column(field)
+    return [m.get(field) for m in metadata]
+
+
+class MetadataIndex:
+    def __init__(self, metadata: Sequence[Dict[str, Any]]):
+        self.num_rows = len(metadata)
+        self._empty_bitmap = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+
+        # Categorical fields: one packed bitmap per distinct value
+        self.bitmaps: Dict[str, Dict[Any, np.ndarray]] = {}
+        for field in CATEGORICAL_FIELDS:
+            column = _column(metadata, field)
+            if isinstance(column, CodedColumn):
+                self.bitmaps[field] = self._coded_bitmaps(column)
+                continue
+            rows_by_value: Dict[Any, List[int]] = {}
+            for row, value in enumerate(column):
+                if value is not None:
+                    rows_by_value.setdefault(value, []).append(row)
+            self.bitmaps[field] = {
+                value: self._rows_to_bitmap(np.array(rows, dtype=np.int64))
+                for value, rows in rows_by_value.items()
+            }
+
+        # Numeric fields: values sorted ascending with the row each value came from
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.sorted_rows: Dict[str, np.ndarray] = {}
+        for field in NUMERIC_FIELDS:
+            column = _column(metadata, field)
+            if isinstance(column, NumericColumn):
+                # Mapped store: straight from the array, no Python object per row
+                rows = np.flatnonzero(column.valid())
+                values = np.asarray(column.values[rows], dtype=np.float64)
+            else:
+                rows = [row for row, value in enumerate(column) if _is_number(value)]
+                values = np.array([column[row] for row in rows], dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            self.sorted_values[field] = values[order]
+            self.sorted_rows[field] = np.array(rows, dtype=np.int64)[order]
+
+        logger.info(
+            f"Metadata index built for {self.num_rows} rows "
+            f"({', '.join(f'{len(v)} {k} values' for k, v in self.bitmaps.items())})"
+        )
+
+    def _coded_bitmaps(self, column: CodedColumn) -> Dict[Any, np.ndarray]:
+        # Rows grouped by code with one sort instead of a pass per distinct value
+        order = np.argsort(column.codes, kind="stable")
+        bounds = np.searchsorted(column.codes[order], np.arange(len(column.vocabulary) + 1))
+        return {
+            value: self._rows_to_bitmap(order[bounds[code]:bounds[code + 1]])
+            for code, value in enumerate(column.vocabulary)
+            if bounds[code + 1] > bounds[code]
+        }
+
+    def _rows_to_bitmap(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def equals_bitmap(self, field: str, value: Any) -> np.ndarray:
+        return self.bitmaps[field].get(value, self._empty_bitmap)
+
+    def range_bitmap(
+        self,
+        field: str,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        low_inclusive: bool = True
+    ) -> np.ndarray:
+        values = self.sorted_values[field]
+        start = 0
+        end = values.shape[0]
+        if low is not None:
+            start = np.searchsorted(values, low, side="left" if low_inclusive else "right")
+        if high is not None:
+            end = np.searchsorted(values, high, side="right")
+        if start >= end:
+            return self._empty_bitmap
+        return self._rows_to_bitmap(self.sorted_rows[field][start:end])
+
+    def candidate_mask(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        brand: Optional[str] = None,
+        in_stock: bool = False
+    ) -> Optional[np.ndarray]:
+        bitmaps = []
+        if category:
+            bitmaps.append(self.equals_bitmap("category", category))
+        if brand:
+            bitmaps.append(self.equals_bitmap("brand", brand))
+        if min_price is not None or max_price is not None:
+            bitmaps.append(self.range_bitmap("price", low=min_price, high=max_price))
+        if min_rating is not None:
+            bitmaps.append(self.range_bitmap("rating", low=min_rating))
+        if in_stock:
+            bitmaps.append(self.range_bitmap("stock", low=0, low_inclusive=False))
+
+        if not bitmaps:
+            return None
+
+        combined = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            combined = np.bitwise_and(combined, bitmap)
+        return np.unpackbits(combined, count=self.num_rows).view(bool)
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    # Callers on any thread block on their own future while one encoder thread runs the model on
+    # everything that arrived within the window, so concurrent queries share a forward pass
+    def __init__(self, encode_batch: Callable[[List[Any]], List[Any]], name: str, window_ms: float = 5, max_batch: int = 32):
+        self.encode_batch = encode_batch
+        self.name = name
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+
+        self._pending: deque = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.encode_seconds = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        with self._condition:
+            self._ensure_thread()
+            self._pending.append((item, future, time.monotonic()))
+            self._condition.notify()
+        return future
+
+    def encode(self, item: Any) -> Any:
+        if self.max_batch == 1:
+            # Batching disabled: encode on the caller's thread exactly as before
+            return self.encode_batch([item])[0]
+        return self.submit(item).result()
+
+    def _next_batch(self) -> List[tuple]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            # Measured from the oldest arrival: queries that already waited out an encode go straight in
+            deadline = self._pending[0][2] + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._next_batch()
+                self._encode(batch)
+            except Exception as e:
+                # Whatever went wrong, no caller may be left blocked on a future that never resolves
+                logger.error(f"{self.name} batcher error: {e}")
+                self._fail(batch, e)
+
+    def _encode(self, batch: List[tuple]):
+        items = [item for item, _, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = list(self.encode_batch(items))
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+            self._fail(batch, e)
+            return
+        self.encode_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.items += len(items)
+        self.largest_batch = max(self.largest_batch, len(items))
+        if len(results) != len(batch):
+            # Rows can no longer be matched to callers, so none of them is trusted
+            message = f"{self.name} encoder returned {len(results)} results for {len(batch)} items"
+            logger.error(message)
+            self._fail(batch, RuntimeError(message))
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _fail(self, batch: List[tuple], error: Exception):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "encode_ms_per_item": round(self.encode_seconds * 1000 / self.items, 3) if self.items else 0.0,
+        }
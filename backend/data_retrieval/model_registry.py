@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLIP_MODEL_NAME = "clip-ViT-B-32"
+
+
+def _load_clip():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(CLIP_MODEL_NAME)
+
+
+def _warm_clip(model):
+    from PIL import Image
+    model.encode(Image.new("RGB", (224, 224)))
+
+
+_MODEL_LOADERS: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {
+    "clip": (_load_clip, _warm_clip),
+}
+
+_models: Dict[str, Any] = {}
+_model_stats: Dict[str, Dict[str, float]] = {}
+_registry_lock = threading.Lock()
+
+
+def get_resident_memory_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    import sys
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def get_model(name: str) -> Any:
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if name not in _MODEL_LOADERS:
+        raise ValueError(f"Unknown model: {name}")
+
+    with _registry_lock:
+        if name not in _models:
+            loader, _ = _MODEL_LOADERS[name]
+            rss_before = get_resident_memory_mb()
+            start = time.perf_counter()
+            _models[name] = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = get_resident_memory_mb()
+            _model_stats[name] = {
+                "load_seconds": round(load_seconds, 3),
+                "rss_before_mb": round(rss_before, 1),
+                "rss_after_mb": round(rss_after, 1),
+                "rss_delta_mb": round(rss_after - rss_before, 1),
+            }
+            logger.info(
+                f"Loaded model '{name}' in {load_seconds:.2f}s "
+                f"(RSS {rss_before:.0f}MB -> {rss_after:.0f}MB)"
+            )
+    return _models[name]
+
+
+def get_clip_model():
+    return get_model("clip")
+
+
+def warm_up_models(*names: str) -> Dict[str, Dict[str, float]]:
+    for name in names or tuple(_MODEL_LOADERS):
+        model = get_model(name)
+        _, warm = _MODEL_LOADERS[name]
+        start = time.perf_counter()
+        warm(model)
+        warm_seconds = time.perf_counter() - start
+        _model_stats[name]["warm_seconds"] = round(warm_seconds, 3)
+        logger.info(f"Warmed model '{name}' in {warm_seconds:.2f}s")
+    return get_model_stats()
+
+
+def get_model_stats() -> Dict[str, Dict[str, float]]:
+    return {name: dict(stats) for name, stats in _model_stats.items()}
@@ -0,0 +1,131 @@
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.embedding_store import file_stamp, open_embedding_store, read_manifest
+from data_retrieval.search_config import STORE_RELOAD_INTERVAL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Both stores carry the full product metadata; the text store is read first
+CATALOG_STORE_PATHS = [
+    os.path.join(BASE_DIR, "storage", "text_store"),
+    os.path.join(BASE_DIR, "storage", "image_store"),
+]
+# Without a store the searchers serve the legacy LlamaIndex JSON indexes, so the catalog reads their docstores
+CATALOG_INDEX_PATHS = [
+    os.path.join(BASE_DIR, "storage", "text_index"),
+    os.path.join(BASE_DIR, "storage", "image_index"),
+]
+DOCSTORE_FILE = "docstore.json"
+CATALOG_FIELDS = ("title", "price", "brand", "category", "rating", "stock", "thumbnail")
+
+
+class ProductCatalog:
+    # product_id -> display fields, read from the embedding store's metadata (or a legacy index's docstore) so the
+    # API process can resolve the ids the agent answers with without loading an index or a model
+    def __init__(self, store_paths: List[str] = CATALOG_STORE_PATHS, index_paths: List[str] = CATALOG_INDEX_PATHS):
+        self.store_paths = store_paths
+        self.index_paths = index_paths
+        self.products: Dict[str, Dict[str, Any]] = {}
+        self.store_path: Optional[str] = None
+        self.version = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._missing_logged = False
+
+    def _set_products(self, source: str, products: Dict[str, Dict[str, Any]], version: Any):
+        self.products = products
+        self.store_path = source
+        self.version = version
+        logger.info(f"Product catalog loaded from {source} v{version}: {len(products)} products")
+
+    def _load(self, store_path: str):
+        _, metadata, _, manifest = open_embedding_store(store_path)
+        columns = {field: metadata.column(field) for field in CATALOG_FIELDS + ("product_id",)}
+        products = {}
+        for row, product_id in enumerate(columns["product_id"]):
+            if product_id is not None:
+                products[str(product_id)] = {field: columns[field][row] for field in CATALOG_FIELDS}
+        self._set_products(store_path, products, manifest["version"])
+
+    def _load_index(self, index_path: str, stamp: int):
+        # Only the docstore is read: node metadata is what VectorEngine.from_llama_index serves, and no embedding model is needed
+        from llama_index.core.storage.docstore import SimpleDocumentStore
+
+        docstore = SimpleDocumentStore.from_persist_dir(index_path)
+        products = {}
+        for node in docstore.docs.values():
+            product_id = node.metadata.get("product_id")
+            if product_id is not None:
+                products[str(product_id)] = {field: node.metadata.get(field) for field in CATALOG_FIELDS}
+        self._set_products(index_path, products, stamp)
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._last_check and now - self._last_check < STORE_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            if self._last_check and now - self._last_check < STORE_RELOAD_INTERVAL:
+                return
+            self._last_check = now
+            for store_path in self.store_paths:
+                manifest = read_manifest(store_path)
+                if manifest is None:
+                    continue
+                if store_path == self.store_path and manifest["version"] == self.version:
+                    return
+                try:
+                    self._load(store_path)
+                except Exception as e:
+                    logger.warning(f"Product catalog reload from {store_path} failed: {e}")
+                    continue
+                return
+            for index_path in self.index_paths:
+                stamp = file_stamp(os.path.join(index_path, DOCSTORE_FILE))
+                if stamp is None:
+                    continue
+                if index_path == self.store_path and stamp == self.version:
+                    return
+                try:
+                    self._load_index(index_path, stamp)
+                except Exception as e:
+                    logger.warning(f"Product catalog reload from {index_path} failed: {e}")
+                    continue
+                return
+            if not self._missing_logged:
+                logger.warning("No embedding store or index found; product ids from the agent cannot be resolved to thumbnails")
+                self._missing_logged = True
+
+    def get(self, product_id: Any) -> Optional[Dict[str, Any]]:
+        # Lookups never reload; the owning process calls refresh() off its event loop
+        return self.products.get(str(product_id).strip().lstrip("#"))
+
+    def thumbnails(self, product_ids: Iterable[Any]) -> List[str]:
+        urls = []
+        for product_id in product_ids:
+            product = self.get(product_id)
+            if product and product.get("thumbnail"):
+                urls.append(product["thumbnail"])
+        return urls
+
+    def stats(self) -> Dict[str, Any]:
+        return {"products": len(self.products), "store": self.store_path, "version": self.version}
+
+
+_catalog_instance = None
+_catalog_lock = threading.Lock()
+
+def get_product_catalog() -> ProductCatalog:
+    global _catalog_instance
+    if _catalog_instance is None:
+        with _catalog_lock:
+            if _catalog_instance is None:
+                _catalog_instance = ProductCatalog()
+    return _catalog_instance
@@ -0,0 +1,69 @@
+import os
+
+# "exact" scans the full embedding matrix, "ivf" probes an IVF-flat approximate index
+SEARCH_INDEX_MODE = os.getenv("SEARCH_INDEX_MODE", "exact")
+TEXT_SEARCH_MODE = os.getenv("TEXT_SEARCH_MODE", SEARCH_INDEX_MODE)
+IMAGE_SEARCH_MODE = os.getenv("IMAGE_SEARCH_MODE", SEARCH_INDEX_MODE)
+
+# Text retrieval: "dense" (BGE only), "bm25" (inverted index only, no embedding model at query time) or
+# "hybrid" (both, fused by reciprocal rank; exact-token queries such as "Beats Flex" skip the embedding)
+TEXT_RETRIEVAL_MODE = os.getenv("TEXT_RETRIEVAL_MODE", "hybrid")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Reciprocal rank fusion constant: larger values flatten the advantage of the very top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Rows each retriever contributes to the fusion in hybrid mode
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+# A query is answered lexically only if one of its brand or model terms is in at most this share of products
+LEXICAL_ONLY_MAX_DF = float(os.getenv("LEXICAL_ONLY_MAX_DF", "0.05"))
+
+# Number of IVF clusters; 0 picks roughly sqrt(catalog size)
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+# Clusters probed per query: higher means better recall and slower queries
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_TRAIN_ITERATIONS = int(os.getenv("IVF_TRAIN_ITERATIONS", "20"))
+
+# Precision of the memory-mapped embedding store: "float32" or "float16" (half the disk and page cache)
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+
+# Image ingestion pipeline used by llama_config.create_image_index
+INGEST_DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "16"))
+INGEST_DECODE_WORKERS = int(os.getenv("INGEST_DECODE_WORKERS", "4"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "32"))
+# Torch intra-op threads for CLIP encoding; 0 keeps the torch default
+INGEST_ENCODE_THREADS = int(os.getenv("INGEST_ENCODE_THREADS", "0"))
+
+# Seconds between manifest checks in running searchers; 0 checks on every query
+STORE_RELOAD_INTERVAL = float(os.getenv("STORE_RELOAD_INTERVAL", "5"))
+
+# Query text -> BGE embedding cache in TextProductSearch; size 0 disables it
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+# Seconds an entry stays valid; 0 keeps entries until evicted
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+# File the cache is persisted to across restarts; empty keeps it in memory only
+QUERY_EMBEDDING_CACHE_PATH = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")
+
+# Full search results per (index version, query, filters); size 0 disables it
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "512"))
+# Entries are dropped on every index version change; the TTL is an extra bound, 0 disables it
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "0"))
+
+# Directory /upload_image writes <sha256>.jpg files to; only names inside it are trusted as content hashes
+UPLOAD_IMAGE_DIR = os.getenv("UPLOAD_IMAGE_DIR", "./temp_images")
+# Uploaded image content hash -> CLIP embedding cache in ImageProductSearch; size 0 disables it
+IMAGE_EMBEDDING_CACHE_SIZE = int(os.getenv("IMAGE_EMBEDDING_CACHE_SIZE", "256"))
+# File the image embedding cache is persisted to across restarts; empty keeps it in memory only
+IMAGE_EMBEDDING_CACHE_PATH = os.getenv("IMAGE_EMBEDDING_CACHE_PATH", "")
+
+
+# Concurrent query embeddings arriving within the window share one forward pass; max size 1 disables batching
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+IMAGE_BATCH_WINDOW_MS = float(os.getenv("IMAGE_BATCH_WINDOW_MS", "5"))
+IMAGE_BATCH_MAX_SIZE = int(os.getenv("IMAGE_BATCH_MAX_SIZE", "16"))
+
+# Searches accepted by one batch tool call or POST /search/batch request
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", "8"))
+
+# Seconds one search tool call may spend across all of its attempts; retries stop once it runs out
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "30"))
@@ -0,0 +1,240 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_retrieval.metadata_index import MetadataIndex
+from data_retrieval.embedding_store import ColumnarMetadata, open_embedding_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Below this fraction of matching rows, score only the candidates instead of the whole matrix
+PREFILTER_MAX_SELECTIVITY = 0.25
+# Keyword arguments of filter_mask, as carried by batch search specs
+FILTER_FIELDS = ("category", "min_price", "max_price", "min_rating", "brand", "in_stock")
+
+
+def spec_filters(spec: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: spec.get(field, False if field == "in_stock" else None) for field in FILTER_FIELDS}
+
+# Smaller batches score query by query: BLAS matrix-matrix kernels only pay off from a few queries up
+BATCH_GEMM_MIN_QUERIES = 3
+# Reduced-precision matrices are upcast to float32 this many rows at a time while scoring
+SCORE_CHUNK_ROWS = 65536
+
+
+class VectorEngine:
+    def __init__(
+        self,
+        embeddings: Any,
+        metadata: Sequence[Dict[str, Any]],
+        texts: Optional[Sequence[str]] = None,
+        normalized: bool = False
+    ):
+        if not normalized:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2:
+            raise ValueError(f"Embeddings must be a 2D matrix, got shape {embeddings.shape}")
+        if len(metadata) != embeddings.shape[0]:
+            raise ValueError("Embeddings and metadata must have the same number of rows")
+
+        if normalized:
+            # Already unit rows (e.g. a memory-mapped store): keep the mapping, never copy it
+            self.matrix = embeddings
+        else:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = np.ascontiguousarray(embeddings / norms, dtype=np.float32)
+
+        self.metadata = metadata if isinstance(metadata, ColumnarMetadata) else list(metadata)
+        # A mapped store's texts stay in their blob and are decoded per row
+        self.texts = texts if texts is not None else [""] * len(self.metadata)
+        if isinstance(self.metadata, ColumnarMetadata):
+            self.product_ids = np.array(self.metadata.column("product_id"))
+        else:
+            self.product_ids = np.array([m.get("product_id") for m in self.metadata])
+        self.metadata_index = MetadataIndex(self.metadata)
+        self.ann_index = None
+        self.nprobe = 0
+        self.lexical_index = None
+        self.version = 0
+
+    @classmethod
+    def from_llama_index(cls, index) -> "VectorEngine":
+        embedding_dict = index.vector_store.data.embedding_dict
+        node_ids = list(embedding_dict.keys())
+        nodes = index.docstore.get_nodes(node_ids)
+
+        embeddings = np.array([embedding_dict[node_id] for node_id in node_ids], dtype=np.float32)
+        metadata = [dict(node.metadata) for node in nodes]
+        texts = [getattr(node, "text", "") or "" for node in nodes]
+
+        logger.info(f"Vector engine built with {len(node_ids)} rows of dimension {embeddings.shape[1] if len(node_ids) else 0}")
+        return cls(embeddings, metadata, texts)
+
+    @classmethod
+    def from_store(cls, store_path: str) -> "VectorEngine":
+        embeddings, metadata, texts, manifest = open_embedding_store(store_path)
+        engine = cls(embeddings, metadata, texts, normalized=manifest["normalized"])
+        engine.version = manifest["version"]
+        logger.info(f"Vector engine mapped {manifest['num_rows']} rows ({manifest['dtype']}) from {store_path}")
+        return engine
+
+    def attach_ann_index(self, ann_index, nprobe: int):
+        if ann_index.num_rows != len(self) or not ann_index.matches(self.product_ids):
+            raise ValueError("ANN index does not match the rows of this engine")
+        self.ann_index = ann_index
+        self.nprobe = nprobe
+
+    def attach_lexical_index(self, lexical_index):
+        if lexical_index.num_rows != len(self) or not lexical_index.matches(self.product_ids):
+            raise ValueError("BM25 index does not match the rows of this engine")
+        self.lexical_index = lexical_index
+
+    def lexical_search(
+        self,
+        query_text: str,
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        require_all: bool = False
+    ) -> List[Tuple[int, float]]:
+        if self.lexical_index is None:
+            raise ValueError("Engine has no BM25 index")
+        return self.lexical_index.search(query_text, top_k, mask=mask, require_all=require_all)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def normalize_query(self, query_embedding: Any) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Vector dimension mismatch: query has {query.shape[0]}, index has {self.dim}")
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else query
+
+    def filter_mask(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        brand: Optional[str] = None,
+        in_stock: bool = False
+    ) -> Optional[np.ndarray]:
+        return self.metadata_index.candidate_mask(
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+            brand=brand,
+            in_stock=in_stock
+        )
+
+    def _score_all(self, query: np.ndarray) -> np.ndarray:
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+        scores = np.empty(self.matrix.shape[0], dtype=np.float32)
+        for start in range(0, self.matrix.shape[0], SCORE_CHUNK_ROWS):
+            chunk = self.matrix[start:start + SCORE_CHUNK_ROWS]
+            scores[start:start + chunk.shape[0]] = chunk.astype(np.float32) @ query
+        return scores
+
+    def _score_all_batch(self, queries: np.ndarray) -> np.ndarray:
+        # One (rows x queries) matrix-matrix product over the row-major matrix, transposed so each
+        # query's scores are a contiguous row
+        if self.matrix.dtype == np.float32:
+            return np.ascontiguousarray((self.matrix @ queries.T).T)
+        scores = np.empty((queries.shape[0], self.matrix.shape[0]), dtype=np.float32)
+        for start in range(0, self.matrix.shape[0], SCORE_CHUNK_ROWS):
+            chunk = self.matrix[start:start + SCORE_CHUNK_ROWS]
+            scores[:, start:start + chunk.shape[0]] = (chunk.astype(np.float32) @ queries.T).T
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def search(
+        self,
+        query_embedding: Any,
+        top_k: int,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        if self.ann_index is None:
+            return self.exact_search(query_embedding, top_k, mask=mask)
+
+        query = self.normalize_query(query_embedding)
+        if mask is not None and np.count_nonzero(mask) <= PREFILTER_MAX_SELECTIVITY * len(self):
+            # Selective filters leave few enough candidates that exact scoring beats probing
+            return self.exact_search(query, top_k, mask=mask)
+        return self.ann_index.search(self.matrix, query, top_k, self.nprobe, mask=mask)
+
+    def exact_search(
+        self,
+        query_embedding: Any,
+        top_k: int,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        query = self.normalize_query(query_embedding)
+
+        if mask is None:
+            scores = self._score_all(query)
+            top_rows = self._top_k(scores, min(top_k, scores.shape[0]))
+            return [(int(row), float(scores[row])) for row in top_rows]
+
+        candidate_rows = np.flatnonzero(mask)
+        k = min(top_k, candidate_rows.shape[0])
+        if k <= 0:
+            return []
+
+        if candidate_rows.shape[0] <= PREFILTER_MAX_SELECTIVITY * len(self):
+            # Pre-filter: gather the few candidate rows and score only those
+            scores = self.matrix[candidate_rows].astype(np.float32, copy=False) @ query
+            top = self._top_k(scores, k)
+            return [(int(candidate_rows[i]), float(scores[i])) for i in top]
+
+        # Post-filter: one full matrix-vector product, then drop non-candidates
+        scores = self._score_all(query)
+        scores[~mask] = -np.inf
+        top_rows = self._top_k(scores, k)
+        return [(int(row), float(scores[row])) for row in top_rows]
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[Any],
+        top_ks: Sequence[int],
+        masks: Optional[Sequence[Optional[np.ndarray]]] = None
+    ) -> List[List[Tuple[int, float]]]:
+        if masks is None:
+            masks = [None] * len(query_embeddings)
+        if not (len(query_embeddings) == len(top_ks) == len(masks)):
+            raise ValueError("Batch search needs one top_k and one mask per query")
+        if len(query_embeddings) == 0:
+            return []
+        if self.ann_index is not None or len(query_embeddings) < BATCH_GEMM_MIN_QUERIES:
+            # With an ANN index each query probes its own IVF lists; a full matrix product would undo it
+            return [self.search(query, top_k, mask=mask) for query, top_k, mask in zip(query_embeddings, top_ks, masks)]
+
+        queries = np.stack([self.normalize_query(query) for query in query_embeddings])
+        all_scores = self._score_all_batch(queries)
+        results = []
+        for scores, top_k, mask in zip(all_scores, top_ks, masks):
+            if mask is not None:
+                scores[~mask] = -np.inf
+                k = min(top_k, int(np.count_nonzero(mask)))
+            else:
+                k = min(top_k, scores.shape[0])
+            if k <= 0:
+                results.append([])
+                continue
+            top_rows = self._top_k(scores, k)
+            results.append([(int(row), float(scores[row])) for row in top_rows])
+        return results
@@ -1,11 +1,15 @@
 import asyncio
+import os
 from mcp_agent.core.fastagent import FastAgent
 
 fast = FastAgent("Commerce Agent")
 
-@fast.agent(
-    name="CartPal",
-    instruction="""
+AGENT_NAME = "CartPal"
+# Agents that can run turns at once; all share one fast.run() context and so one search server process
+AGENT_WORKERS = max(1, int(os.getenv("AGENT_WORKERS", "4")))
+AGENT_WORKER_NAMES = [AGENT_NAME] + [f"{AGENT_NAME}-{i}" for i in range(1, AGENT_WORKERS)]
+
+AGENT_INSTRUCTION = """
     You are CartPal, an intelligent shopping assistant with a retro, energetic personality. You're knowledgeable, helpful, and enthusiastic about helping customers find exactly what they need.
 
     ## CRITICAL: Response Format
@@ -17,11 +21,11 @@ fast = FastAgent("Commerce Agent")
     [Your response in clean markdown format here]
     %%
 
-    **For image results (when products have thumbnails):**
+    **For product images (whenever you present products):**
     %%RESPONSE_IMAGE
-    ##IMAGE_URL: https://example.com/product1.jpg##
-    ##IMAGE_URL: https://example.com/product2.jpg##
-    ##IMAGE_URL: https://example.com/product3.jpg##
+    ##PRODUCT_ID: 107##
+    ##PRODUCT_ID: 100##
+    ##PRODUCT_ID: 103##
     %%
 
     ## CRITICAL: Single Response Rule
@@ -107,9 +111,9 @@ fast = FastAgent("Commerce Agent")
     %%
 
     %%RESPONSE_IMAGE
-    ##IMAGE_URL: https://cdn.dummyjson.com/product-images/107/thumbnail.webp##
-    ##IMAGE_URL: https://cdn.dummyjson.com/product-images/100/thumbnail.webp##
-    ##IMAGE_URL: https://cdn.dummyjson.com/product-images/103/thumbnail.webp##
+    ##PRODUCT_ID: 107##
+    ##PRODUCT_ID: 100##
+    ##PRODUCT_ID: 103##
     %%
 
     ## Your Capabilities
@@ -127,9 +131,14 @@ fast = FastAgent("Commerce Agent")
         * "Apple headphones under $200" → `semantic_search_text(query="headphones", brand="Apple", max_price=200, top_k=5)`
         * "laptops between $500-$1000" → `semantic_search_text(query="laptops", category="laptops", min_price=500, max_price=1000, top_k=5)`
         * "highly rated smartphones" → `semantic_search_text(query="smartphones", category="smartphones", min_rating=4.0, top_k=5)`
+    
+    - **Comparisons and multi-part requests:** use `semantic_search_text_batch` once instead of several `semantic_search_text` calls
+        * "Apple vs Samsung phones under $800" → `semantic_search_text_batch(searches=[{"query": "phones", "brand": "Apple", "max_price": 800}, {"query": "phones", "brand": "Samsung", "max_price": 800}])`
+        * Each entry takes the same parameters as `semantic_search_text`; results come back in the same order
 
     2. **Image-Based Search**
     - Use `semantic_search_image` when users upload images
+    - Several uploaded images, or one image with several filter sets → one `semantic_search_image_batch` call
     - Extract base64 string from "[IMAGE_UPLOADED: base64_string]"
     - Apply same filters when mentioned in text
     - Explain visual similarities between uploaded image and results
@@ -193,11 +202,11 @@ fast = FastAgent("Commerce Agent")
     - Short, punchy sentences
     - Lots of visual breaks (bullets, separators)
 
-    **Image URLs:**
-    - ALWAYS extract all thumbnail URLs from search results
-    - Place in %%RESPONSE_IMAGE%% tags
-    - One ##IMAGE_URL: url## per line
-    - Critical for visual product display
+    **Product Images:**
+    - ALWAYS list the id of every product you present, taken from the id column of the search results
+    - Place in %%RESPONSE_IMAGE%% tags, in the order the products appear in your response
+    - One ##PRODUCT_ID: id## per line
+    - Never write image URLs; the server turns each id into the product's thumbnail
 
     **Constraints:**
     - Only recommend products from actual search results
@@ -215,15 +224,22 @@ fast = FastAgent("Commerce Agent")
     - Proactive in offering alternatives
 
     Remember: Your goal is to help shoppers find exactly what they need quickly and enjoyably. Use filters intelligently, format responses beautifully, and always include product images!
-""",
-    model="gpt-4o",
-    servers=["SemanticSearchServer"],
-    use_history=True,
-)
+"""
+
 async def commerce_agent():
     async with fast.run() as agent:
         await agent()
 
+for worker_name in AGENT_WORKER_NAMES:
+    fast.agent(
+        name=worker_name,
+        instruction=AGENT_INSTRUCTION,
+        model="gpt-4o",
+        servers=["SemanticSearchServer"],
+        use_history=True,
+        default=worker_name == AGENT_NAME,
+    )(commerce_agent)
+
 async def main():
     await commerce_agent()
 
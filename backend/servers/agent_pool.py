@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from servers.history_manager import HistoryManager, resolve_llm
+from servers.tool_session import bind_tool_session, session_scope
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sessions whose history is kept; a session is only its compacted message list, so this bounds memory, not processes
+AGENT_POOL_MAX_SIZE = int(os.getenv("AGENT_POOL_MAX_SIZE", "256"))
+# Idle sessions are forgotten after this many seconds
+AGENT_POOL_IDLE_TIMEOUT = float(os.getenv("AGENT_POOL_IDLE_TIMEOUT", "900"))
+AGENT_POOL_SWEEP_INTERVAL = float(os.getenv("AGENT_POOL_SWEEP_INTERVAL", "60"))
+
+DEFAULT_SESSION_ID = "default"
+
+
+class AgentPoolExhausted(Exception):
+    pass
+
+
+class SessionState:
+    def __init__(self):
+        self.messages: List[Any] = []
+        self.lock = asyncio.Lock()
+        self.active = 0
+        self.turns = 0
+        self.closed = False
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+def worker_memory(worker) -> Any:
+    memory = getattr(resolve_llm(worker), "history", None)
+    if memory is None or not hasattr(memory, "set"):
+        raise RuntimeError(f"Agent {getattr(worker, 'name', worker)} has no LLM history to swap sessions in and out of")
+    return memory
+
+
+class AgentPool:
+    # One fast.run() context, and so one MCP search server, shared by every session. Its worker agents
+    # run turns concurrently; a turn checks one out, swaps the session's history into its LLM, and swaps it back out
+    def __init__(
+        self,
+        context_factory: Callable[[], Any],
+        worker_names: Sequence[str],
+        max_size: int = AGENT_POOL_MAX_SIZE,
+        idle_timeout: float = AGENT_POOL_IDLE_TIMEOUT,
+        sweep_interval: float = AGENT_POOL_SWEEP_INTERVAL,
+        history: Optional[HistoryManager] = None
+    ):
+        self.context_factory = context_factory
+        self.worker_names = list(worker_names)
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.history = history
+
+        self.sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self.workers: Optional[asyncio.Queue] = None
+        self._context = None
+        self._sweep_task: Optional[asyncio.Task] = None
+
+        self.turns = 0
+        self.worker_waits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def start(self):
+        start = time.perf_counter()
+        context = self.context_factory()
+        agent_app = await context.__aenter__()
+        self._context = context
+        self.workers = asyncio.Queue()
+        for name in self.worker_names:
+            # Tool calls from this worker carry the session of the turn it is running
+            self.workers.put_nowait(bind_tool_session(agent_app[name]))
+        if self.sweep_interval > 0:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+        logger.info(f"Agent pool started in {time.perf_counter() - start:.2f}s: {len(self.worker_names)} workers, max {self.max_size} sessions")
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        context, self._context, self.workers = self._context, None, None
+        self.sessions.clear()
+        if context is not None:
+            try:
+                await context.__aexit__(None, None, None)
+            except Exception as e:
+                logger.error(f"Failed to stop agent context: {e}")
+        logger.info("Agent pool stopped")
+
+    def _evict_lru(self):
+        # Only sessions without a request in flight can go
+        for session_id, state in self.sessions.items():
+            if state.active == 0:
+                del self.sessions[session_id]
+                state.closed = True
+                self.evictions += 1
+                logger.info(f"Evicting least recently used agent session {session_id}")
+                return
+        raise AgentPoolExhausted(f"All {self.max_size} agent sessions are busy")
+
+    def _acquire(self, session_id: str) -> SessionState:
+        state = self.sessions.get(session_id)
+        if state is None:
+            if len(self.sessions) >= self.max_size:
+                self._evict_lru()
+            state = SessionState()
+            self.sessions[session_id] = state
+        self.sessions.move_to_end(session_id)
+        state.active += 1
+        return state
+
+    @asynccontextmanager
+    async def session(self, session_id: str = DEFAULT_SESSION_ID):
+        if self.workers is None:
+            raise RuntimeError("Agent pool is not started")
+        while True:
+            state = self._acquire(session_id)
+            try:
+                async with state.lock:
+                    if state.closed:
+                        # Reset or evicted while this request was queued behind the previous turn
+                        continue
+                    if self.workers.empty():
+                        self.worker_waits += 1
+                    worker = await self.workers.get()
+                    memory = worker_memory(worker)
+                    try:
+                        memory.set(state.messages)
+                        with session_scope(session_id):
+                            yield worker
+                        state.turns += 1
+                        self.turns += 1
+                        if self.history is not None:
+                            try:
+                                self.history.after_turn(worker)
+                            except Exception as e:
+                                logger.error(f"History compaction failed for session {session_id}: {e}")
+                        # A failed turn never gets here, so the session keeps its history from before it
+                        if not state.closed:
+                            state.messages = list(memory.history)
+                        return
+                    finally:
+                        memory.clear()
+                        # fast-agent's display transcript sits beside the provider history and would collect every session's turns
+                        transcript = getattr(resolve_llm(worker), "message_history", None)
+                        if isinstance(transcript, list):
+                            transcript.clear()
+                        if self.workers is not None:
+                            self.workers.put_nowait(worker)
+            finally:
+                state.active -= 1
+                state.last_used = time.monotonic()
+
+    async def reset(self, session_id: str = DEFAULT_SESSION_ID) -> bool:
+        state = self.sessions.pop(session_id, None)
+        if state is None:
+            return False
+        state.closed = True
+        async with state.lock:
+            state.messages = []
+        logger.info(f"Agent session {session_id} reset after {state.turns} turns")
+        return True
+
+    async def sweep(self) -> int:
+        now = time.monotonic()
+        expired = [
+            session_id for session_id, state in self.sessions.items()
+            if state.active == 0 and now - state.last_used > self.idle_timeout
+        ]
+        for session_id in expired:
+            self.sessions.pop(session_id).closed = True
+        self.expirations += len(expired)
+        if expired:
+            logger.info(f"Forgot {len(expired)} idle agent sessions")
+        return len(expired)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Agent pool sweep failed: {e}")
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self.sessions
+
+    def stats(self) -> Dict[str, Any]:
+        idle_workers = self.workers.qsize() if self.workers is not None else 0
+        return {
+            "sessions": len(self.sessions),
+            "active_sessions": sum(1 for state in self.sessions.values() if state.active),
+            "max_size": self.max_size,
+            "workers": len(self.worker_names),
+            "busy_workers": len(self.worker_names) - idle_workers if self.workers is not None else 0,
+            "turns": self.turns,
+            "worker_waits": self.worker_waits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "history": self.history.stats() if self.history is not None else None,
+        }
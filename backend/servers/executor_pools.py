@@ -0,0 +1,191 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.retry import bind_cancel_event, retries_deferred_to_caller
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "thread" or "process" per pool; torch releases the GIL during inference, so threads are the default
+TEXT_EMBED_EXECUTOR = os.getenv("TEXT_EMBED_EXECUTOR", "thread")
+# Embedding workers mostly wait on the micro-batcher, which runs the model one batch at a time,
+# so these bound concurrent queries rather than concurrent forward passes
+TEXT_EMBED_WORKERS = int(os.getenv("TEXT_EMBED_WORKERS", "8"))
+# Calls allowed to wait for a worker; past this the pool answers "server busy" instead of queueing
+TEXT_EMBED_MAX_QUEUE = int(os.getenv("TEXT_EMBED_MAX_QUEUE", "16"))
+
+IMAGE_EMBED_EXECUTOR = os.getenv("IMAGE_EMBED_EXECUTOR", "thread")
+IMAGE_EMBED_WORKERS = int(os.getenv("IMAGE_EMBED_WORKERS", "4"))
+IMAGE_EMBED_MAX_QUEUE = int(os.getenv("IMAGE_EMBED_MAX_QUEUE", "8"))
+
+# Filter masks, matrix scoring and result assembly
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "thread")
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "4"))
+SCORING_MAX_QUEUE = int(os.getenv("SCORING_MAX_QUEUE", "32"))
+
+# Completed calls between stats log lines per pool; 0 disables them
+EXECUTOR_STATS_LOG_EVERY = int(os.getenv("EXECUTOR_STATS_LOG_EVERY", "100"))
+# Recent calls kept per pool for the wait/exec percentiles
+EXECUTOR_LATENCY_WINDOW = 1024
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict):
+    # Runs in the worker; time.monotonic is system-wide on Linux, so it is comparable across processes
+    started = time.monotonic()
+    with retries_deferred_to_caller():
+        result = func(*args, **kwargs)
+    return result, started, time.monotonic()
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_queue: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind for {name}: {kind}")
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.kind = kind
+        self._executor = None
+
+        # Only touched on the event loop thread
+        self.inflight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._saturated = False
+        self.queue_waits: deque = deque(maxlen=EXECUTOR_LATENCY_WINDOW)
+        self.exec_times: deque = deque(maxlen=EXECUTOR_LATENCY_WINDOW)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                # Fork after torch has started its thread pools can deadlock the child
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.inflight - self.workers)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        if self.inflight >= self.workers + self.max_queue:
+            self.rejected += 1
+            if not self._saturated:
+                # Once per burst rather than once per rejected call
+                self._saturated = True
+                logger.warning(f"{self.name} executor saturated: {self.inflight} calls in flight, rejecting")
+            raise ExecutorSaturated(
+                f"Server busy: {self.name} queue full ({self.queued} waiting for {self.workers} workers)"
+            )
+
+        self._saturated = False
+        loop = asyncio.get_running_loop()
+        submitted_at = time.monotonic()
+        cancel_event = threading.Event()
+        if self.kind == "thread":
+            # The request deadline follows the call into the worker, and the event cancels the call's
+            # retry loop if the caller goes away
+            context = contextvars.copy_context()
+            context.run(bind_cancel_event, cancel_event)
+            future = self._get_executor().submit(context.run, _timed_call, func, args, kwargs)
+        else:
+            future = self._get_executor().submit(_timed_call, func, args, kwargs)
+        self.inflight += 1
+        self.submitted += 1
+        # Released when the worker finishes, not when the caller stops waiting, so a cancelled
+        # caller does not free a slot that is still busy
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._on_done, f, submitted_at))
+        try:
+            result, _, _ = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+        return result
+
+    def _on_done(self, future, submitted_at: float):
+        self.inflight -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+            return
+        _, started, finished = future.result()
+        self.completed += 1
+        self.queue_waits.append(started - submitted_at)
+        self.exec_times.append(finished - started)
+        if EXECUTOR_STATS_LOG_EVERY and self.completed % EXECUTOR_STATS_LOG_EVERY == 0:
+            logger.info(f"{self.name} executor: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_p50_ms": round(_percentile(self.queue_waits, 0.5) * 1000, 2),
+            "queue_wait_p99_ms": round(_percentile(self.queue_waits, 0.99) * 1000, 2),
+            "exec_p50_ms": round(_percentile(self.exec_times, 0.5) * 1000, 2),
+            "exec_p99_ms": round(_percentile(self.exec_times, 0.99) * 1000, 2),
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_executors: Dict[str, BoundedExecutor] = {}
+
+EXECUTOR_SETTINGS = {
+    "text_embed": (TEXT_EMBED_WORKERS, TEXT_EMBED_MAX_QUEUE, TEXT_EMBED_EXECUTOR),
+    "image_embed": (IMAGE_EMBED_WORKERS, IMAGE_EMBED_MAX_QUEUE, IMAGE_EMBED_EXECUTOR),
+    "scoring": (SCORING_WORKERS, SCORING_MAX_QUEUE, SCORING_EXECUTOR),
+}
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    executor = _executors.get(name)
+    if executor is None:
+        workers, max_queue, kind = EXECUTOR_SETTINGS[name]
+        executor = _executors[name] = BoundedExecutor(name, workers, max_queue, kind)
+    return executor
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown_executors(wait: bool = True):
+    for executor in _executors.values():
+        executor.shutdown(wait=wait)
+    _executors.clear()
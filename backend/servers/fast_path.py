@@ -0,0 +1,365 @@
+import logging
+import os
+import re
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.product_catalog import ProductCatalog, get_product_catalog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "on" answers confident plain searches without the agent, "shadow" only logs what it would have done, "off" disables routing;
+# shadow by default, so the rules are checked against real traffic before they replace agent answers
+FAST_PATH_MODE = os.getenv("FAST_PATH_MODE", "shadow")
+# Share of the prompt's words the rules must account for before the agent is skipped
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+# Longer prompts are rarely a bare search and always go to the agent
+FAST_PATH_MAX_WORDS = int(os.getenv("FAST_PATH_MAX_WORDS", "16"))
+FAST_PATH_TOP_K = int(os.getenv("FAST_PATH_TOP_K", "3"))
+# Sessions whose fast-path answers are held for the agent's next turn; the oldest are forgotten first
+FAST_PATH_CONTEXT_SESSIONS = int(os.getenv("FAST_PATH_CONTEXT_SESSIONS", "1024"))
+FAST_PATH_CONTEXT_TURNS = 3
+
+# Used until the catalog has loaded; afterwards brands come from the catalog so the filter matches exactly
+DEFAULT_BRANDS = ["Apple", "Samsung", "Nike", "Adidas", "Sony", "Lenovo", "HP", "Dell", "Asus", "Microsoft", "Google", "Beats"]
+# Same mapping the agent's prompt asks it to apply
+CATEGORY_KEYWORDS = {
+    "laptop": "laptops", "laptops": "laptops", "notebook": "laptops", "notebooks": "laptops",
+    "phone": "smartphones", "phones": "smartphones", "smartphone": "smartphones", "smartphones": "smartphones",
+    "headphone": "mobile-accessories", "headphones": "mobile-accessories", "earbuds": "mobile-accessories",
+    "earphones": "mobile-accessories", "speaker": "mobile-accessories", "speakers": "mobile-accessories",
+    "tablet": "tablets", "tablets": "tablets",
+}
+# Product words that must not become a category filter
+UNFILTERED_PRODUCT_WORDS = {"clothes", "clothing", "fashion", "outfit", "outfits", "apparel", "products", "items", "stuff", "gear"}
+FILLER_WORDS = {
+    "show", "me", "find", "search", "get", "give", "list", "i", "im", "i'm", "want", "need", "looking", "look", "for",
+    "some", "any", "a", "an", "the", "please", "with", "of", "in", "on", "by", "from", "to", "can", "you", "could",
+    "pls", "help", "good", "great", "nice", "best", "top", "new", "options", "price", "priced", "dollars",
+}
+# Any of these left after the filters are removed means a conversation, not a search
+BLOCKERS = [
+    ("comparison", re.compile(r"\b(?:vs|versus|compare|comparison|difference|better|best between)\b")),
+    ("follow_up", re.compile(r"\b(?:these|those|them|it|that|this|first|second|third|last|another|more|cheaper|instead|again|similar|same|also|else|previous|above|other)\b")),
+    ("question", re.compile(r"^(?:what|which|why|how|is|are|does|do|should|would|will|who|when|where|tell|explain)\b")),
+    ("chit_chat", re.compile(r"\b(?:hi|hello|hey|thanks|thank|recommend|advice|suggest|gift|my|our)\b")),
+    ("vague_price", re.compile(r"\b(?:cheap|cheapest|affordable|budget|expensive|premium)\b")),
+    ("multi_part", re.compile(r"\b(?:and|or|plus)\b|[,&]")),
+]
+
+NUMBER = r"\$?\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(k)?(?:\s*(?:dollars|usd|bucks))?"
+PRICE_RANGE = re.compile(
+    rf"\b(?:between|from)\s+{NUMBER}\s*(?:and|to|-)\s*{NUMBER}|\$\s*(\d+(?:,\d{{3}})*(?:\.\d+)?)\s*(k)?\s*(?:-|to)\s*{NUMBER}"
+)
+PRICE_MAX = re.compile(rf"\b(?:under|below|less than|cheaper than|at most|up to|max(?:imum)?|no more than|within)\s+{NUMBER}|<=?\s*{NUMBER}")
+PRICE_MIN = re.compile(rf"\b(?:over|above|more than|at least|min(?:imum)?|starting at)\s+{NUMBER}|>=?\s*{NUMBER}")
+RATING_NUMBER = re.compile(
+    r"\b(?:rated|rating|ratings)\s+(?:of\s+)?(?:at least\s+|above\s+|over\s+)?([0-5](?:\.\d+)?)\s*(?:\+|stars?)?"
+    r"|\b(?:at least\s+)?([0-5](?:\.\d+)?)\s*(?:\+\s*)?stars?(?:\s+(?:and up|or (?:more|higher|better|above)))?(?:\s+rating)?"
+    r"|\b([0-5](?:\.\d+)?)\+"
+)
+RATING_WORDS = re.compile(r"\b(?:highly|top|best|well|high)[\s-]+(?:rated|reviewed)\b")
+IN_STOCK = re.compile(r"\b(?:in[\s-]stock|available(?:\s+now)?)\b")
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+UNSAFE_ECHO = re.compile(r"[%#\n\r`*_\[\]]+")
+
+
+def _price(groups: Tuple[Optional[str], ...]) -> Optional[float]:
+    # The first (number, k-suffix) pair that matched
+    for number, thousands in zip(groups[::2], groups[1::2]):
+        if number:
+            value = float(number.replace(",", ""))
+            return value * 1000 if thousands else value
+    return None
+
+
+def _words(text: str) -> List[str]:
+    return WORD.findall(text.lower())
+
+
+def _alternation(phrases: List[str]) -> Optional[re.Pattern]:
+    if not phrases:
+        return None
+    # Longest first, so "mobile accessories" wins over "mobile"
+    ordered = sorted(set(phrases), key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(phrase) for phrase in ordered) + r")\b")
+
+
+class FastPathRouter:
+    # Decides whether a prompt is a plain product search the server can answer itself: filters are pulled
+    # out with rules, and confidence is the share of the prompt's words the rules and the catalog explain
+    def __init__(
+        self,
+        catalog: Optional[ProductCatalog] = None,
+        mode: str = FAST_PATH_MODE,
+        min_confidence: float = FAST_PATH_MIN_CONFIDENCE,
+        max_words: int = FAST_PATH_MAX_WORDS,
+        top_k: int = FAST_PATH_TOP_K
+    ):
+        self.catalog = catalog
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.max_words = max_words
+        self.top_k = top_k
+
+        self._vocab_key = None
+        self.brands: Dict[str, str] = {}
+        self.categories: Dict[str, str] = {}
+        self.vocabulary: set = set()
+        self._brand_lookup: Tuple[Optional[re.Pattern], Dict[str, str]] = (None, {})
+        self._category_lookup: Tuple[Optional[re.Pattern], Dict[str, str]] = (None, {})
+        self._build_vocabulary({})
+
+        self._context: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.latency: Dict[str, Dict[str, float]] = {}
+        self.fallbacks: Dict[str, int] = {}
+        self.shadow_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("on", "shadow")
+
+    def _build_vocabulary(self, products: Dict[str, Dict[str, Any]]):
+        brands = {product.get("brand") for product in products.values()} - {None, "", "Generic"}
+        categories = {product.get("category") for product in products.values()} - {None, ""}
+        brand_names = {brand.lower(): brand for brand in (brands or DEFAULT_BRANDS)}
+
+        # Category names as users write them, restricted to categories that exist once the catalog is known
+        phrases = {keyword: category for keyword, category in CATEGORY_KEYWORDS.items() if not categories or category in categories}
+        for category in categories:
+            phrase = category.lower().replace("-", " ")
+            phrases[phrase] = category
+            if phrase.endswith("s"):
+                phrases.setdefault(phrase[:-1], category)
+
+        vocabulary = set(CATEGORY_KEYWORDS) | UNFILTERED_PRODUCT_WORDS
+        for product in products.values():
+            for field in ("title", "category", "brand"):
+                vocabulary.update(word for word in _words(str(product.get(field) or "")) if len(word) > 1)
+        self.brands, self.categories, self.vocabulary = brand_names, phrases, vocabulary
+        # Each pattern is swapped in with its own mapping, since a refresh thread can rebuild while route() reads
+        self._brand_lookup = (_alternation(list(brand_names)), brand_names)
+        self._category_lookup = (_alternation(list(phrases)), phrases)
+
+    def refresh(self):
+        # Reads the store and rebuilds the vocabulary, so it runs in a thread; route() only reads what was built here
+        catalog = self.catalog or get_product_catalog()
+        catalog.refresh()
+        key = (id(catalog.products), catalog.version)
+        if key != self._vocab_key:
+            self._build_vocabulary(catalog.products)
+            self._vocab_key = key
+            logger.info(f"Fast path vocabulary: {len(self.brands)} brands, {len(self.categories)} category phrases, {len(self.vocabulary)} words")
+
+    def _known(self, word: str) -> bool:
+        return word in self.vocabulary or (word.endswith("s") and word[:-1] in self.vocabulary) or f"{word}s" in self.vocabulary
+
+    def extract(self, prompt: str) -> Dict[str, Any]:
+        text = " " + prompt.lower().replace("’", "'") + " "
+        filters: Dict[str, Any] = {}
+
+        def _take(pattern: re.Pattern, handle) -> None:
+            nonlocal text
+            match = pattern.search(text)
+            if match:
+                handle(match)
+                text = text[:match.start()] + " " + text[match.end():]
+
+        def _range(match):
+            low, high = _price(match.groups()[:2] + match.groups()[4:6]), _price(match.groups()[2:4] + match.groups()[6:8])
+            filters["min_price"], filters["max_price"] = min(low, high), max(low, high)
+
+        def _rating(match):
+            value = float(next(group for group in match.groups() if group))
+            if value <= 5:
+                filters["min_rating"] = value
+
+        _take(RATING_NUMBER, _rating)
+        _take(RATING_WORDS, lambda match: filters.setdefault("min_rating", 4.0))
+        _take(PRICE_RANGE, _range)
+        if "max_price" not in filters:
+            _take(PRICE_MAX, lambda match: filters.__setitem__("max_price", _price(match.groups())))
+        if "min_price" not in filters:
+            _take(PRICE_MIN, lambda match: filters.__setitem__("min_price", _price(match.groups())))
+        _take(IN_STOCK, lambda match: filters.__setitem__("in_stock", True))
+
+        product_words: List[str] = []
+        brand_pattern, brands = self._brand_lookup
+        if brand_pattern:
+            _take(brand_pattern, lambda match: filters.__setitem__("brand", brands[match.group(1)]))
+        category_pattern, categories = self._category_lookup
+        if category_pattern:
+            def _category(match):
+                filters["category"] = categories[match.group(1)]
+                product_words.append(match.group(1))
+            _take(category_pattern, _category)
+        return {"filters": filters, "residual": text, "product_words": product_words}
+
+    def route(self, prompt: str) -> Dict[str, Any]:
+        decision: Dict[str, Any] = {"take": False, "confidence": 0.0, "reason": None, "search": None, "prompt": prompt}
+        if not self.enabled:
+            decision["reason"] = "disabled"
+            return decision
+
+        words = _words(prompt)
+        if "[image_uploaded:" in prompt.lower():
+            decision["reason"] = "image"
+        elif not words:
+            decision["reason"] = "empty"
+        elif len(words) > self.max_words:
+            decision["reason"] = "too_long"
+        if decision["reason"]:
+            return self._fallback(decision)
+
+        extracted = self.extract(prompt)
+        residual = extracted["residual"]
+        for reason, pattern in BLOCKERS:
+            if pattern.search(residual.strip()):
+                decision["reason"] = reason
+                return self._fallback(decision)
+
+        residual_words = _words(residual)
+        product_words = extracted["product_words"] + [word for word in residual_words if word not in FILLER_WORDS and self._known(word)]
+        unknown = [word for word in residual_words if word not in FILLER_WORDS and not self._known(word)]
+        filters = extracted["filters"]
+        decision["confidence"] = round(1 - len(unknown) / len(words), 3)
+
+        # Filter words stay out of the query, as in the agent's own tool calls; a bare brand search queries the brand
+        query_terms = {word for phrase in product_words for word in _words(phrase)} - UNFILTERED_PRODUCT_WORDS
+        query_words = [word for word in words if word in query_terms]
+        query = " ".join(query_words) or filters.get("brand") or " ".join(product_words)
+        if not product_words and "category" not in filters:
+            decision["reason"] = "no_product"
+        elif decision["confidence"] < self.min_confidence:
+            decision["reason"] = "low_confidence"
+        if decision["reason"]:
+            return self._fallback(decision, unknown)
+
+        decision["search"] = {"query": query, "limit": self.top_k, **filters}
+        if self.mode == "shadow":
+            self.shadow_hits += 1
+            logger.info(f"Fast path (shadow) would answer {prompt!r} with {decision['search']} at confidence {decision['confidence']}")
+            decision["reason"] = "shadow"
+            return decision
+        decision["take"] = True
+        return decision
+
+    def _fallback(self, decision: Dict[str, Any], unknown: Optional[List[str]] = None) -> Dict[str, Any]:
+        self.record_fallback(decision["reason"])
+        logger.info(
+            f"Fast path declined ({decision['reason']}, confidence {decision['confidence']})"
+            + (f", unrecognized: {' '.join(unknown)}" if unknown else "")
+        )
+        return decision
+
+    def record_fallback(self, reason: str):
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+
+    def record_latency(self, path: str, seconds: float):
+        entry = self.latency.setdefault(path, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        ms = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        entry["last_ms"] = ms
+
+    def render(self, decision: Dict[str, Any], products: List[Dict[str, Any]]) -> str:
+        # Same tagged layout the agent's prompt prescribes, so both parsers and the frontend treat it alike
+        search = decision["search"]
+        heading = UNSAFE_ECHO.sub(" ", decision["prompt"]).strip()[:80].upper()
+        filters = self.describe_filters(search)
+        count = len(products)
+        lines = [
+            f'## HERE\'S WHAT I FOUND FOR "{heading}"',
+            "",
+            f"I found {count} option{'s' if count != 1 else ''}" + (f" matching {filters}." if filters else "."),
+        ]
+        for i, product in enumerate(products):
+            if i:
+                lines += ["", "---"]
+            lines += ["", f"### {product.get('title')}{self._price_text(product.get('price'))}", ""]
+            lines += [f"- {detail}" for detail in self._details(product)]
+        lines += ["", "Want me to narrow these down, compare a couple of them, or look for something else?"]
+
+        image_lines = [f"##PRODUCT_ID: {product.get('product_id')}##" for product in products if product.get("product_id") is not None]
+        return "%%RESPONSE\n" + "\n".join(lines) + "\n%%\n\n%%RESPONSE_IMAGE\n" + "\n".join(image_lines) + "\n%%"
+
+    def describe_filters(self, search: Dict[str, Any]) -> str:
+        parts = []
+        if search.get("brand"):
+            parts.append(f"**Brand:** {search['brand']}")
+        if search.get("category"):
+            parts.append(f"**Category:** {search['category']}")
+        if search.get("min_price") is not None:
+            parts.append(f"**Min Price:** ${search['min_price']:g}")
+        if search.get("max_price") is not None:
+            parts.append(f"**Max Price:** ${search['max_price']:g}")
+        if search.get("min_rating") is not None:
+            parts.append(f"**Min Rating:** {search['min_rating']:g}⭐")
+        if search.get("in_stock"):
+            parts.append("**Stock:** In stock only")
+        return " • ".join(parts)
+
+    def _price_text(self, price: Any) -> str:
+        try:
+            return f" - ${float(price):.2f}"
+        except (TypeError, ValueError):
+            return ""
+
+    def _details(self, product: Dict[str, Any]) -> List[str]:
+        details = []
+        # The indexed text is "title. description. Category: ..."; its first description sentence is the pitch
+        snippet = str(product.get("text_snippet") or "")
+        title = str(product.get("title") or "")
+        if snippet.startswith(f"{title}. "):
+            sentence = snippet[len(title) + 2:].split(". ")[0].rstrip(".")
+            if sentence and not sentence.startswith("Category:"):
+                details.append(sentence if len(sentence) <= 140 else sentence[:137].rstrip() + "...")
+        if product.get("brand") and product["brand"] != "Generic":
+            details.append(f"**Brand:** {product['brand']}")
+        rating = product.get("rating")
+        if isinstance(rating, (int, float)) and rating > 4.0:
+            details.append(f"**Rating:** {rating:.2f}/5 ⭐")
+        stock = product.get("stock")
+        if isinstance(stock, (int, float)):
+            details.append("Out of stock" if stock <= 0 else f"Only {stock:.0f} left" if stock < 10 else "In stock")
+        return details
+
+    def remember(self, session_id: str, decision: Dict[str, Any], products: List[Dict[str, Any]]):
+        # The agent never saw this turn; its next turn gets a one-line summary so follow-ups still make sense
+        shown = "; ".join(f"#{product.get('product_id')} {product.get('title')}{self._price_text(product.get('price'))}" for product in products)
+        notes = self._context.pop(session_id, [])
+        notes = (notes + [f'"{UNSAFE_ECHO.sub(" ", decision["prompt"]).strip()}" -> {shown}'])[-FAST_PATH_CONTEXT_TURNS:]
+        self._context[session_id] = notes
+        while len(self._context) > FAST_PATH_CONTEXT_SESSIONS:
+            self._context.popitem(last=False)
+
+    def with_context(self, session_id: str, message: str) -> str:
+        notes = self._context.get(session_id)
+        if not notes:
+            return message
+        return "[Earlier searches already answered and shown to the user: " + " | ".join(notes) + "]\n" + message
+
+    def clear_context(self, session_id: str):
+        self._context.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "min_confidence": self.min_confidence,
+            "paths": {
+                path: {
+                    "count": entry["count"],
+                    "mean_ms": round(entry["total_ms"] / entry["count"], 1) if entry["count"] else 0,
+                    "max_ms": round(entry["max_ms"], 1),
+                    "last_ms": round(entry["last_ms"], 1),
+                }
+                for path, entry in self.latency.items()
+            },
+            "fallbacks": dict(self.fallbacks),
+            "shadow_hits": self.shadow_hits,
+            "sessions_with_context": len(self._context),
+        }
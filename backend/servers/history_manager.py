@@ -0,0 +1,231 @@
+import logging
+import os
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from servers.result_encoding import decode_tool_result
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Most recent user turns kept in the agent's history; 0 keeps every turn
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "8"))
+# Most recent turns whose tool outputs stay verbatim; older ones are reduced to product summaries
+HISTORY_FULL_TOOL_TURNS = int(os.getenv("HISTORY_FULL_TOOL_TURNS", "1"))
+# Estimated tokens the kept history may use; 0 disables the budget
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+# Rough characters per token for the estimate, close enough for gpt-4 class tokenizers on English and JSON
+HISTORY_CHARS_PER_TOKEN = float(os.getenv("HISTORY_CHARS_PER_TOKEN", "4"))
+# Characters kept from a tool output that is not a search result
+HISTORY_FALLBACK_CHARS = int(os.getenv("HISTORY_FALLBACK_CHARS", "200"))
+
+COMPACTED_PREFIX = "[compacted]"
+
+
+def resolve_llm(agent) -> Any:
+    # Takes the agent itself (AgentPool looks workers up with agent_app[name]); fast-agent-mcp 0.2.36, pinned
+    # in requirements.txt, keeps its LLM only in _llm
+    return getattr(agent, "llm", None) or getattr(agent, "_llm", None)
+
+
+def _field(message: Any, name: str, default: Any = None) -> Any:
+    if isinstance(message, dict):
+        return message.get(name, default)
+    return getattr(message, name, default)
+
+
+def message_text(message: Any) -> str:
+    content = _field(message, "content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(getattr(part, "text", "")) for part in content)
+    return ""
+
+
+def _product_line(product: Dict[str, Any]) -> str:
+    # Tables decode to strings and use the short "id" name; the pretty-printed format keeps "product_id"
+    product_id = product.get("id", product.get("product_id"))
+    try:
+        price_text = f" ${float(product.get('price')):.2f}"
+    except (TypeError, ValueError):
+        price_text = ""
+    return f"#{product_id} {product.get('title')}{price_text}"
+
+
+def _search_summary(result: Dict[str, Any]) -> str:
+    if result.get("status") != "success":
+        return f"failed: {result.get('message', 'unknown error')}"
+    products = result.get("products") or []
+    if not products:
+        return "no products"
+    return "; ".join(_product_line(product) for product in products)
+
+
+def summarize_tool_output(text: str) -> str:
+    result = decode_tool_result(text)
+
+    if isinstance(result, dict) and "searches" in result:
+        parts = []
+        for search in result["searches"]:
+            label = search.get("query") or "image"
+            parts.append(f"{label}: {_search_summary(search)}")
+        return f"{COMPACTED_PREFIX} batch search results - " + " | ".join(parts)
+    if isinstance(result, dict) and ("products" in result or result.get("status") == "error"):
+        return f"{COMPACTED_PREFIX} search results - {_search_summary(result)}"
+
+    if len(text) <= HISTORY_FALLBACK_CHARS:
+        return text
+    return f"{COMPACTED_PREFIX} {text[:HISTORY_FALLBACK_CHARS]}..."
+
+
+class HistoryManager:
+    # Keeps a pooled agent's LLM history bounded between turns: a sliding window of recent turns,
+    # old search outputs reduced to product ids, titles and prices, and an overall token budget
+    def __init__(
+        self,
+        max_turns: int = HISTORY_MAX_TURNS,
+        full_tool_turns: int = HISTORY_FULL_TOOL_TURNS,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        chars_per_token: float = HISTORY_CHARS_PER_TOKEN
+    ):
+        self.max_turns = max_turns
+        self.full_tool_turns = max(0, full_tool_turns)
+        self.token_budget = token_budget
+        self.chars_per_token = max(1.0, chars_per_token)
+        self._usage_seen: "weakref.WeakKeyDictionary[Any, int]" = weakref.WeakKeyDictionary()
+        self._unsupported_logged = False
+
+        self.turns = 0
+        self.tool_outputs_compacted = 0
+        self.turns_dropped = 0
+        self.tokens_saved = 0
+        self.last_prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        self.prompt_tokens_total = 0
+        self.prompt_token_turns = 0
+        self.last_history_tokens = 0
+
+    def estimate_tokens(self, message: Any) -> int:
+        chars = len(message_text(message))
+        for tool_call in _field(message, "tool_calls") or []:
+            function = _field(tool_call, "function") or {}
+            chars += len(str(_field(function, "name", ""))) + len(str(_field(function, "arguments", "")))
+        # Per-message framing the chat format adds around role and content
+        return int(chars / self.chars_per_token) + 4
+
+    def _split_turns(self, messages: List[Any]) -> List[List[Any]]:
+        # A turn starts at a user message, so assistant tool calls stay with their tool results
+        turns: List[List[Any]] = []
+        for message in messages:
+            if _field(message, "role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _compact_turn(self, turn: List[Any]) -> Tuple[List[Any], int]:
+        compacted = 0
+        result = []
+        for message in turn:
+            # OpenAI-format history holds plain dicts; anything else is left as it is
+            if isinstance(message, dict) and message.get("role") == "tool":
+                text = message_text(message)
+                summary = text if text.startswith(COMPACTED_PREFIX) else summarize_tool_output(text)
+                if summary != text:
+                    message = {**message, "content": summary}
+                    compacted += 1
+            result.append(message)
+        return result, compacted
+
+    def compact_messages(self, messages: List[Any]) -> Tuple[List[Any], Dict[str, int]]:
+        turns = self._split_turns(messages)
+        dropped = 0
+        if self.max_turns > 0 and len(turns) > self.max_turns:
+            dropped = len(turns) - self.max_turns
+            turns = turns[dropped:]
+
+        compacted = 0
+        for i in range(len(turns) - self.full_tool_turns):
+            turns[i], count = self._compact_turn(turns[i])
+            compacted += count
+
+        if self.token_budget > 0:
+            sizes = [sum(self.estimate_tokens(message) for message in turn) for turn in turns]
+            verbatim = max(0, len(turns) - self.full_tool_turns)
+            while sum(sizes) > self.token_budget:
+                if verbatim < len(turns):
+                    # Over budget: the recent verbatim tool outputs go first, then whole turns from the front
+                    turns[verbatim], count = self._compact_turn(turns[verbatim])
+                    sizes[verbatim] = sum(self.estimate_tokens(message) for message in turns[verbatim])
+                    compacted += count
+                    verbatim += 1
+                elif len(turns) > 1:
+                    turns.pop(0)
+                    sizes.pop(0)
+                    verbatim -= 1
+                    dropped += 1
+                else:
+                    break
+
+        kept = [message for turn in turns for message in turn]
+        return kept, {"turns_dropped": dropped, "tool_outputs_compacted": compacted, "turns_kept": len(turns)}
+
+    def _turn_prompt_tokens(self, llm) -> Tuple[int, int]:
+        usage = getattr(getattr(llm, "usage_accumulator", None), "turns", None)
+        if not isinstance(usage, list):
+            return 0, 0
+        seen = self._usage_seen.get(llm, 0)
+        self._usage_seen[llm] = len(usage)
+        calls = usage[seen:]
+        if not calls:
+            return 0, 0
+        # The first call carries the history in; later calls in the turn add this turn's tool results
+        return getattr(calls[0], "input_tokens", 0), len(calls)
+
+    def after_turn(self, agent) -> Optional[Dict[str, Any]]:
+        llm = resolve_llm(agent)
+        memory = getattr(llm, "history", None)
+        messages = getattr(memory, "history", None)
+        if not isinstance(messages, list) or not hasattr(memory, "set"):
+            if not self._unsupported_logged:
+                logger.warning("Agent LLM history is not a message list; history compaction disabled")
+                self._unsupported_logged = True
+            return None
+
+        before = sum(self.estimate_tokens(message) for message in messages)
+        kept, changes = self.compact_messages(messages)
+        after = sum(self.estimate_tokens(message) for message in kept)
+        if changes["turns_dropped"] or changes["tool_outputs_compacted"]:
+            memory.set(kept)
+
+        prompt_tokens, calls = self._turn_prompt_tokens(llm)
+        self.turns += 1
+        self.turns_dropped += changes["turns_dropped"]
+        self.tool_outputs_compacted += changes["tool_outputs_compacted"]
+        self.tokens_saved += before - after
+        self.last_history_tokens = after
+        if calls:
+            self.last_prompt_tokens = prompt_tokens
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+            self.prompt_tokens_total += prompt_tokens
+            self.prompt_token_turns += 1
+
+        logger.info(
+            f"Turn prompt tokens: {prompt_tokens if calls else 'n/a'} over {calls} LLM calls; "
+            f"history ~{before} -> ~{after} tokens, {changes['turns_kept']} turns kept"
+        )
+        return {"prompt_tokens": prompt_tokens, "llm_calls": calls, "history_tokens": after, **changes}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "turns": self.turns,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "mean_prompt_tokens": round(self.prompt_tokens_total / self.prompt_token_turns) if self.prompt_token_turns else 0,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "last_history_tokens": self.last_history_tokens,
+            "tool_outputs_compacted": self.tool_outputs_compacted,
+            "turns_dropped": self.turns_dropped,
+            "estimated_tokens_saved": self.tokens_saved,
+        }
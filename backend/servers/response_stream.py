@@ -0,0 +1,156 @@
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from servers.history_manager import resolve_llm
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESPONSE_MARKER = "%%RESPONSE"
+IMAGE_SUFFIX = "_IMAGE"
+BLOCK_END = "%%"
+IMAGE_URL_MARKER = "##IMAGE_URL:"
+PRODUCT_ID_MARKER = "##PRODUCT_ID:"
+IMAGE_URL_END = "##"
+# Image block entries: a URL as written by the model, or a product id the server resolves to its thumbnail
+IMAGE_MARKERS = ((IMAGE_URL_MARKER, "image_url"), (PRODUCT_ID_MARKER, "product_id"))
+
+
+class IncrementalResponseParser:
+    # Streaming counterpart of app.parse_agent_response: same first-block-wins rules, emitted as chunks arrive
+    def __init__(self):
+        self.buffer = ""
+        self.state = "outside"
+        self.text_done = False
+        self.images_done = False
+        self.text_started = False
+        self.text = ""
+        self.image_refs: List[Tuple[str, str]] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.buffer += chunk
+        events: List[Tuple[str, str]] = []
+        while True:
+            if self.state == "outside":
+                progressed = self._parse_outside()
+            elif self.state == "text":
+                progressed = self._parse_text(events)
+            elif self.state == "images":
+                progressed = self._parse_images(events)
+            else:
+                progressed = self._parse_skip()
+            if not progressed:
+                return events
+
+    def finish(self) -> List[Tuple[str, str]]:
+        events: List[Tuple[str, str]] = []
+        if self.state == "text":
+            # Unterminated block: flush what was held back for a possible closing marker
+            self._emit_text(self.buffer.rstrip(), events)
+        self.buffer = ""
+        self.state = "outside"
+        return events
+
+    def _parse_outside(self) -> bool:
+        index = self.buffer.find(RESPONSE_MARKER)
+        if index == -1:
+            # Keep only a tail that could still grow into a marker
+            keep = len(RESPONSE_MARKER) - 1
+            self.buffer = self.buffer[-keep:] if len(self.buffer) > keep else self.buffer
+            return False
+
+        after = self.buffer[index + len(RESPONSE_MARKER):]
+        if len(after) < len(IMAGE_SUFFIX) and IMAGE_SUFFIX.startswith(after):
+            self.buffer = self.buffer[index:]
+            return False
+
+        if after.startswith(IMAGE_SUFFIX):
+            self.buffer = after[len(IMAGE_SUFFIX):]
+            self.state = "skip" if self.images_done else "images"
+        else:
+            self.buffer = after
+            self.state = "skip" if self.text_done else "text"
+        return True
+
+    def _parse_text(self, events: List[Tuple[str, str]]) -> bool:
+        if not self.text_started:
+            self.buffer = self.buffer.lstrip()
+            if not self.buffer:
+                return False
+
+        end = self.buffer.find(BLOCK_END)
+        if end != -1:
+            self._emit_text(self.buffer[:end].rstrip(), events)
+            self.buffer = self.buffer[end + len(BLOCK_END):]
+            self.text_done = True
+            self.state = "outside"
+            return True
+
+        # Hold back trailing whitespace (stripped if the block ends here) and a lone "%" that may open "%%"
+        ready = self.buffer[:-1] if self.buffer.endswith("%") else self.buffer
+        ready = ready.rstrip()
+        self._emit_text(ready, events)
+        self.buffer = self.buffer[len(ready):]
+        return False
+
+    def _emit_text(self, text: str, events: List[Tuple[str, str]]):
+        if text:
+            self.text_started = True
+            self.text += text
+            events.append(("text", text))
+
+    def _parse_images(self, events: List[Tuple[str, str]]) -> bool:
+        end = self.buffer.find(BLOCK_END)
+        found = [(self.buffer.find(marker), marker, kind) for marker, kind in IMAGE_MARKERS]
+        found = [entry for entry in found if entry[0] != -1]
+        marker_index, marker, kind = min(found) if found else (-1, "", "")
+        if end != -1 and (marker_index == -1 or end < marker_index):
+            self.buffer = self.buffer[end + len(BLOCK_END):]
+            self.images_done = True
+            self.state = "outside"
+            return True
+        if marker_index == -1:
+            return False
+
+        value_start = marker_index + len(marker)
+        value_end = self.buffer.find(IMAGE_URL_END, value_start)
+        if value_end == -1:
+            return False
+        value = self.buffer[value_start:value_end].strip()
+        self.image_refs.append((kind, value))
+        events.append((kind, value))
+        self.buffer = self.buffer[value_end + len(IMAGE_URL_END):]
+        return True
+
+    def _parse_skip(self) -> bool:
+        end = self.buffer.find(BLOCK_END)
+        if end == -1:
+            self.buffer = self.buffer[-(len(BLOCK_END) - 1):]
+            return False
+        self.buffer = self.buffer[end + len(BLOCK_END):]
+        self.state = "outside"
+        return True
+
+
+def attach_stream_listener(agent, listener: Callable[[str], None]) -> Optional[Callable[[], None]]:
+    # fast-agent 0.2.36 has no token listener API, but its OpenAI and Anthropic LLMs hand every streamed text
+    # delta to _update_streaming_progress; wrapping it on the worker's LLM forwards the deltas as they arrive
+    try:
+        llm = resolve_llm(agent)
+        update_progress = getattr(llm, "_update_streaming_progress", None)
+        if update_progress is None:
+            return None
+
+        def _update_streaming_progress(content: Any, model: str, estimated_tokens: int) -> int:
+            if isinstance(content, str) and content:
+                try:
+                    listener(content)
+                except Exception as e:
+                    logger.warning(f"Dropping streamed chunk: {e}")
+            return update_progress(content, model, estimated_tokens)
+
+        llm._update_streaming_progress = _update_streaming_progress
+        return lambda: vars(llm).pop("_update_streaming_progress", None)
+    except Exception as e:
+        logger.warning(f"Token streaming unavailable, falling back to full replies: {e}")
+        return None
@@ -0,0 +1,124 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+# How search tools serialize results for the LLM: "table" (one row per product), "compact" (minified JSON)
+# or "json" (the original pretty-printed payload with every field)
+TOOL_RESULT_FORMAT = os.getenv("TOOL_RESULT_FORMAT", "table")
+# Product fields sent to the LLM in the table and compact formats, in column order; thumbnails are
+# resolved from product ids by the API server, so they only need adding back without an embedding store
+TOOL_RESULT_FIELDS = [
+    field.strip() for field in os.getenv(
+        "TOOL_RESULT_FIELDS", "product_id,title,price,rating,stock,brand,category"
+    ).split(",") if field.strip()
+]
+
+# product_id is the catalog's own integer id, so it doubles as the short id the model refers back to
+SHORT_NAMES = {"product_id": "id", "similarity_score": "score", "text_snippet": "snippet"}
+COMPACT_SEPARATORS = (",", ":")
+
+
+def _compact_value(field: str, value: Any) -> Any:
+    if field == "similarity_score" and isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def _compact_product(product: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    return {
+        SHORT_NAMES.get(field, field): _compact_value(field, product[field])
+        for field in fields if product.get(field) is not None
+    }
+
+
+def _compact_meta(response: Dict[str, Any]) -> Dict[str, Any]:
+    meta = {key: value for key, value in response.items() if key not in ("products", "searches", "filters_applied")}
+    # Only the filters that were actually set; the full block repeated on every result is noise to the model
+    filters = {key: value for key, value in (response.get("filters_applied") or {}).items() if value is not None and value is not False}
+    if filters:
+        meta["filters_applied"] = filters
+    return meta
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = round(value, 3)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _table_lines(response: Dict[str, Any], fields: List[str]) -> List[str]:
+    lines = [json.dumps(_compact_meta(response), separators=COMPACT_SEPARATORS)]
+    products = response.get("products")
+    if products:
+        lines.append("|".join(SHORT_NAMES.get(field, field) for field in fields))
+        lines.extend("|".join(_cell(product.get(field)) for field in fields) for product in products)
+    return lines
+
+
+def result_format_hint(result_format: Optional[str] = None) -> str:
+    # Appended to the tool descriptions so the model knows how to read the rows it gets back
+    result_format = result_format or TOOL_RESULT_FORMAT
+    if result_format == "table":
+        return (
+            "\nResults: a JSON line with status and counts, then a '|'-separated header row and one row per product. "
+            "Batch results repeat the JSON line and table for each search, in order.\n"
+        )
+    if result_format == "compact":
+        return "\nResults: minified JSON; each product's \"id\" is its product_id.\n"
+    return ""
+
+
+def encode_tool_result(response: Dict[str, Any], result_format: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+    result_format = result_format or TOOL_RESULT_FORMAT
+    fields = fields or TOOL_RESULT_FIELDS
+    if result_format == "json":
+        return json.dumps(response, indent=2)
+
+    if result_format == "compact":
+        def _compact(part: Dict[str, Any]) -> Dict[str, Any]:
+            encoded = _compact_meta(part)
+            if "products" in part:
+                encoded["products"] = [_compact_product(product, fields) for product in part["products"]]
+            return encoded
+
+        encoded = _compact(response)
+        if "searches" in response:
+            encoded["searches"] = [_compact(search) for search in response["searches"]]
+        return json.dumps(encoded, separators=COMPACT_SEPARATORS)
+
+    lines = _table_lines(response, fields)
+    for search in response.get("searches") or []:
+        lines.extend(_table_lines(search, fields))
+    return "\n".join(lines)
+
+
+def decode_tool_result(text: str) -> Optional[Dict[str, Any]]:
+    # Reads any of the formats back into the response shape, products keyed by their short field names
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    parts: List[Dict[str, Any]] = []
+    header: Optional[List[str]] = None
+    for line in text.splitlines():
+        if line.startswith("{"):
+            try:
+                parts.append(json.loads(line))
+            except ValueError:
+                return None
+            header = None
+        elif not parts:
+            return None
+        elif header is None:
+            header = line.split("|")
+        else:
+            parts[-1].setdefault("products", []).append(dict(zip(header, line.split("|"))))
+
+    if not parts:
+        return None
+    if "num_searches" in parts[0]:
+        return {**parts[0], "searches": parts[1:]}
+    return parts[0]
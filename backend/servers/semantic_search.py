@@ -1,23 +1,51 @@
 import json
-from mcp.server.fastmcp import FastMCP
 import sys
 import os
 from textwrap import dedent
+from typing import List, Optional
 import logging
-import asyncio
+from pydantic import BaseModel
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from data_retrieval.llama_search_text import search_products_by_text
-from data_retrieval.llama_search_image import search_products_by_image
+from data_retrieval.llama_search_text import (
+    search_products_by_text, embed_text_query, search_products_by_text_batch, embed_text_queries, cached_text_search
+)
+from data_retrieval.llama_search_image import (
+    search_products_by_image, embed_image_query, search_products_by_image_batch, embed_image_queries, cached_image_search
+)
+from data_retrieval.model_registry import warm_up_models
+from data_retrieval.search_config import BATCH_SEARCH_MAX_QUERIES, SEARCH_DEADLINE_SECONDS
+from servers.executor_pools import get_executor, executor_stats
+from servers.result_encoding import encode_tool_result, result_format_hint
+from servers.tool_session import SessionScopedMCP, current_session_id
 from tooling_updates.websocket_http_sender import send_to_frontend
 
-from app import is_retryable_error, async_retry_operation
+from core.errors import is_retryable_error
+from core.retry import async_retry_operation, deadline_scope
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-mcp = FastMCP("Semantic Search Agent")
+mcp = SessionScopedMCP("Semantic Search Agent")
+
+
+def filters_summary(category, min_price, max_price, min_rating, brand, in_stock) -> str:
+    filters_desc = []
+    if category:
+        filters_desc.append(f"**Category:** {category}")
+    if min_price:
+        filters_desc.append(f"**Min Price:** ${min_price}")
+    if max_price:
+        filters_desc.append(f"**Max Price:** ${max_price}")
+    if min_rating:
+        filters_desc.append(f"**Min Rating:** {min_rating}⭐")
+    if brand:
+        filters_desc.append(f"**Brand:** {brand}")
+    if in_stock:
+        filters_desc.append("**Stock:** In stock only")
+    
+    return " • ".join(filters_desc) if filters_desc else "No filters applied"
 
 
 semantic_search_image_description = """
@@ -36,7 +64,38 @@ You can filter results by:
 - in_stock: Set to true to only show available products
 """
 
-@mcp.tool("semantic_search_image", semantic_search_image_description)
+async def run_image_search(image_path: str, top_k: int, filters: dict) -> list:
+    frontend_tool_update = dedent(f"""
+    ## SEARCH IN PROGRESS
+
+    Searching by image using CLIP embeddings...
+
+    **Search Parameters:**
+
+    - Searching for: {top_k} visually similar products
+    - {filters_summary(**filters)}
+
+    *Processing image data and comparing with catalog...*
+    """)
+    
+    try:
+        await send_to_frontend(frontend_tool_update.strip(), coalesce_key="search_progress", session_id=current_session_id.get())
+    except Exception as ws_error:
+        logger.warning(f"WebSocket update failed: {ws_error}")
+    
+    async def _search():
+        logger.info(f"Image search: {image_path}, top_k={top_k}")
+        # CLIP inference and scoring run on separate bounded pools so neither can starve the other
+        query_embedding = await get_executor("image_embed").run(embed_image_query, image_path)
+        return await get_executor("scoring").run(
+            search_products_by_image, image_path, top_k, query_embedding=query_embedding, **filters
+        )
+    
+    with deadline_scope(SEARCH_DEADLINE_SECONDS):
+        return await async_retry_operation(_search, max_retries=2)
+
+
+@mcp.tool("semantic_search_image", semantic_search_image_description + result_format_hint())
 async def semantic_search_image(
     image_path: str,
     top_k: int = 3,
@@ -70,58 +129,16 @@ async def semantic_search_image(
                 "error_type": "file_not_found"
             })
         
-        filters_desc = []
-        if category:
-            filters_desc.append(f"**Category:** {category}")
-        if min_price:
-            filters_desc.append(f"**Min Price:** ${min_price}")
-        if max_price:
-            filters_desc.append(f"**Max Price:** ${max_price}")
-        if min_rating:
-            filters_desc.append(f"**Min Rating:** {min_rating}⭐")
-        if brand:
-            filters_desc.append(f"**Brand:** {brand}")
-        if in_stock:
-            filters_desc.append("**Stock:** In stock only")
-        
-        filters_text = " • ".join(filters_desc) if filters_desc else "No filters applied"
-        
-        frontend_tool_update = dedent(f"""
-        ## SEARCH IN PROGRESS
-
-        Searching by image using CLIP embeddings...
-
-        **Search Parameters:**
-
-        - Searching for: {top_k} visually similar products
-        - {filters_text}
-
-        *Processing image data and comparing with catalog...*
-        """)
-        
-        try:
-            await send_to_frontend(frontend_tool_update.strip())
-        except Exception as ws_error:
-            logger.warning(f"WebSocket update failed: {ws_error}")
-        
-        async def _search():
-            logger.info(f"Image search: {image_path}, top_k={top_k}")
-            loop = asyncio.get_event_loop()
-            results = await loop.run_in_executor(
-                None,
-                search_products_by_image,
-                image_path,
-                top_k,
-                category,
-                min_price,
-                max_price,
-                min_rating,
-                brand,
-                in_stock
-            )
-            return results
-        
-        results = await async_retry_operation(_search, max_retries=2)
+        filters = {
+            "category": category, "min_price": min_price, "max_price": max_price,
+            "min_rating": min_rating, "brand": brand, "in_stock": in_stock
+        }
+        # Checked before anything is queued on the pools: a repeated search costs no CLIP pass
+        results = cached_image_search(image_path, top_k, **filters)
+        if results is not None:
+            logger.info(f"Image search served {len(results)} cached results")
+        else:
+            results = await run_image_search(image_path, top_k, filters)
         
         logger.info(f"Image search complete: {len(results)} results")
         
@@ -139,7 +156,7 @@ async def semantic_search_image(
             "products": results
         }
         
-        return json.dumps(response, indent=2)
+        return encode_tool_result(response)
     
     except Exception as e:
         error_type = "retryable_error" if is_retryable_error(e) else "non_retryable_error"
@@ -176,7 +193,37 @@ IMPORTANT: Extract price ranges, brand names, categories, and rating requirement
 and pass them as filter parameters for better results.
 """
 
-@mcp.tool("semantic_search_text", semantic_search_text_description)
+async def run_text_search(query: str, top_k: int, filters: dict) -> list:
+    frontend_tool_update = dedent(f"""
+    ## SEARCH IN PROGRESS
+
+    Searching by text: **"{query}"**
+
+    **Search Parameters:**
+
+    - Looking for: {top_k} best matches
+    - {filters_summary(**filters)}
+
+    *Analyzing product descriptions with AI embeddings...*
+    """)
+    
+    try:
+        await send_to_frontend(frontend_tool_update.strip(), coalesce_key="search_progress", session_id=current_session_id.get())
+    except Exception as ws_error:
+        logger.warning(f"WebSocket update failed: {ws_error}")
+    
+    async def _search():
+        logger.info(f"Text search: '{query}', top_k={top_k}")
+        query_embedding = await get_executor("text_embed").run(embed_text_query, query, filters)
+        return await get_executor("scoring").run(
+            search_products_by_text, query, top_k, query_embedding=query_embedding, **filters
+        )
+    
+    with deadline_scope(SEARCH_DEADLINE_SECONDS):
+        return await async_retry_operation(_search, max_retries=2)
+
+
+@mcp.tool("semantic_search_text", semantic_search_text_description + result_format_hint())
 async def semantic_search_text(
     query: str,
     top_k: int = 3,
@@ -210,58 +257,16 @@ async def semantic_search_text(
                 "error_type": "validation_error"
             })
         
-        filters_desc = []
-        if category:
-            filters_desc.append(f"**Category:** {category}")
-        if min_price:
-            filters_desc.append(f"**Min Price:** ${min_price}")
-        if max_price:
-            filters_desc.append(f"**Max Price:** ${max_price}")
-        if min_rating:
-            filters_desc.append(f"**Min Rating:** {min_rating}⭐")
-        if brand:
-            filters_desc.append(f"**Brand:** {brand}")
-        if in_stock:
-            filters_desc.append("**Stock:** In stock only")
-        
-        filters_text = " • ".join(filters_desc) if filters_desc else "No filters applied"
-        
-        frontend_tool_update = dedent(f"""
-        ## SEARCH IN PROGRESS
-
-        Searching by text: **"{query}"**
-
-        **Search Parameters:**
-
-        - Looking for: {top_k} best matches
-        - {filters_text}
-
-        *Analyzing product descriptions with AI embeddings...*
-        """)
-        
-        try:
-            await send_to_frontend(frontend_tool_update.strip())
-        except Exception as ws_error:
-            logger.warning(f"WebSocket update failed: {ws_error}")
-        
-        async def _search():
-            logger.info(f"Text search: '{query}', top_k={top_k}")
-            loop = asyncio.get_event_loop()
-            results = await loop.run_in_executor(
-                None,
-                search_products_by_text,
-                query,
-                top_k,
-                category,
-                min_price,
-                max_price,
-                min_rating,
-                brand,
-                in_stock
-            )
-            return results
-        
-        results = await async_retry_operation(_search, max_retries=2)
+        filters = {
+            "category": category, "min_price": min_price, "max_price": max_price,
+            "min_rating": min_rating, "brand": brand, "in_stock": in_stock
+        }
+        # Checked before anything is queued on the pools: a repeated search costs no BGE pass
+        results = cached_text_search(query, top_k, **filters)
+        if results is not None:
+            logger.info(f"Text search served {len(results)} cached results")
+        else:
+            results = await run_text_search(query, top_k, filters)
         
         logger.info(f"Text search complete: {len(results)} results")
         
@@ -280,7 +285,7 @@ async def semantic_search_text(
             "products": results
         }
         
-        return json.dumps(response, indent=2)
+        return encode_tool_result(response)
     
     except Exception as e:
         error_type = "retryable_error" if is_retryable_error(e) else "non_retryable_error"
@@ -293,5 +298,222 @@ async def semantic_search_text(
         })
 
 
+class TextSearchSpec(BaseModel):
+    query: str
+    top_k: int = 3
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    brand: Optional[str] = None
+    in_stock: bool = False
+
+
+class ImageSearchSpec(BaseModel):
+    image_path: str
+    top_k: int = 3
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    brand: Optional[str] = None
+    in_stock: bool = False
+
+
+def spec_filters_applied(spec) -> dict:
+    return {
+        "category": spec.category,
+        "min_price": spec.min_price,
+        "max_price": spec.max_price,
+        "min_rating": spec.min_rating,
+        "brand": spec.brand,
+        "in_stock": spec.in_stock
+    }
+
+
+def spec_error(message: str, error_type: str = "validation_error", **extra) -> dict:
+    return {"status": "error", "message": message, "error_type": error_type, **extra}
+
+
+semantic_search_text_batch_description = """
+Run several text product searches in one call.
+
+Use this instead of repeated semantic_search_text calls when a request has several parts,
+such as comparisons ("Apple vs Samsung phones under $800") or lists of different items.
+Each entry in searches takes the same fields as semantic_search_text:
+query, top_k, category, min_price, max_price, min_rating, brand and in_stock.
+
+Results come back in the same order as searches, each with its own status.
+"""
+
+@mcp.tool("semantic_search_text_batch", semantic_search_text_batch_description + result_format_hint())
+async def semantic_search_text_batch(searches: List[TextSearchSpec]) -> str:
+    try:
+        if not searches:
+            return json.dumps(spec_error("At least one search is required"))
+        
+        if len(searches) > BATCH_SEARCH_MAX_QUERIES:
+            return json.dumps(spec_error(f"Too many searches (max {BATCH_SEARCH_MAX_QUERIES} per call)"))
+        
+        responses = [None] * len(searches)
+        valid = []
+        for i, spec in enumerate(searches):
+            if not spec.query or not spec.query.strip():
+                responses[i] = spec_error("Query text is required", query=spec.query)
+            elif len(spec.query.strip()) > 500:
+                responses[i] = spec_error("Query too long (max 500 characters)", query=spec.query)
+            elif spec.top_k < 1 or spec.top_k > 50:
+                responses[i] = spec_error("top_k must be between 1 and 50", query=spec.query)
+            else:
+                valid.append(i)
+        
+        # Checked before anything is queued on the pools: specs with cached results cost no BGE pass
+        batch_results = {}
+        for i in valid:
+            cached = cached_text_search(searches[i].query, searches[i].top_k, **spec_filters_applied(searches[i]))
+            if cached is not None:
+                batch_results[i] = cached
+        pending = [i for i in valid if i not in batch_results]
+        
+        if pending:
+            # One progress update for the whole batch instead of one per query
+            lines = "\n".join(
+                f"- **\"{searches[i].query}\"**: {filters_summary(**spec_filters_applied(searches[i]))}"
+                for i in pending
+            )
+            try:
+                await send_to_frontend(
+                    f"## SEARCH IN PROGRESS\n\nRunning {len(pending)} text searches together:\n\n{lines}",
+                    coalesce_key="search_progress",
+                    session_id=current_session_id.get()
+                )
+            except Exception as ws_error:
+                logger.warning(f"WebSocket update failed: {ws_error}")
+            
+            batch = [
+                {"query": searches[i].query, "limit": searches[i].top_k, **spec_filters_applied(searches[i])}
+                for i in pending
+            ]
+            
+            async def _search():
+                logger.info(f"Text batch search: {len(batch)} queries")
+                query_embeddings = await get_executor("text_embed").run(
+                    embed_text_queries, [spec["query"] for spec in batch], [spec_filters_applied(searches[i]) for i in pending]
+                )
+                return await get_executor("scoring").run(search_products_by_text_batch, batch, query_embeddings)
+            
+            with deadline_scope(SEARCH_DEADLINE_SECONDS):
+                batch_results.update(zip(pending, await async_retry_operation(_search, max_retries=2)))
+        
+        for i in valid:
+            responses[i] = {
+                "status": "success",
+                "query": searches[i].query,
+                "num_results": len(batch_results[i]),
+                "filters_applied": spec_filters_applied(searches[i]),
+                "products": batch_results[i]
+            }
+        if valid:
+            logger.info(
+                f"Text batch search complete: {sum(len(results) for results in batch_results.values())} results "
+                f"({len(valid) - len(pending)} of {len(valid)} searches cached)"
+            )
+        
+        return encode_tool_result({"status": "success", "num_searches": len(searches), "searches": responses})
+    
+    except Exception as e:
+        error_type = "retryable_error" if is_retryable_error(e) else "non_retryable_error"
+        logger.error(f"Text batch search error ({error_type}): {e}", exc_info=True)
+        return json.dumps(spec_error(str(e), error_type))
+
+
+semantic_search_image_batch_description = """
+Run several image similarity searches in one call.
+
+Use this when the user uploads several images, or wants one image searched with different filters.
+Each entry in searches takes the same fields as semantic_search_image:
+image_path, top_k, category, min_price, max_price, min_rating, brand and in_stock.
+
+Results come back in the same order as searches, each with its own status.
+"""
+
+@mcp.tool("semantic_search_image_batch", semantic_search_image_batch_description + result_format_hint())
+async def semantic_search_image_batch(searches: List[ImageSearchSpec]) -> str:
+    try:
+        if not searches:
+            return json.dumps(spec_error("At least one search is required"))
+        
+        if len(searches) > BATCH_SEARCH_MAX_QUERIES:
+            return json.dumps(spec_error(f"Too many searches (max {BATCH_SEARCH_MAX_QUERIES} per call)"))
+        
+        responses = [None] * len(searches)
+        valid = []
+        for i, spec in enumerate(searches):
+            if not spec.image_path or not spec.image_path.strip():
+                responses[i] = spec_error("Image path is required")
+            elif spec.top_k < 1 or spec.top_k > 50:
+                responses[i] = spec_error("top_k must be between 1 and 50")
+            elif not os.path.exists(spec.image_path):
+                responses[i] = spec_error(f"Image file not found: {spec.image_path}", "file_not_found")
+            else:
+                valid.append(i)
+        
+        # Checked before anything is queued on the pools: specs with cached results cost no CLIP pass
+        batch_results = {}
+        for i in valid:
+            cached = cached_image_search(searches[i].image_path, searches[i].top_k, **spec_filters_applied(searches[i]))
+            if cached is not None:
+                batch_results[i] = cached
+        pending = [i for i in valid if i not in batch_results]
+        
+        if pending:
+            try:
+                await send_to_frontend(
+                    f"## SEARCH IN PROGRESS\n\nSearching {len(pending)} images together using CLIP embeddings...",
+                    coalesce_key="search_progress",
+                    session_id=current_session_id.get()
+                )
+            except Exception as ws_error:
+                logger.warning(f"WebSocket update failed: {ws_error}")
+            
+            batch = [
+                {"image_input": searches[i].image_path, "limit": searches[i].top_k, **spec_filters_applied(searches[i])}
+                for i in pending
+            ]
+            
+            async def _search():
+                logger.info(f"Image batch search: {len(batch)} images")
+                query_embeddings = await get_executor("image_embed").run(embed_image_queries, [spec["image_input"] for spec in batch])
+                return await get_executor("scoring").run(search_products_by_image_batch, batch, query_embeddings)
+            
+            with deadline_scope(SEARCH_DEADLINE_SECONDS):
+                batch_results.update(zip(pending, await async_retry_operation(_search, max_retries=2)))
+        
+        for i in valid:
+            responses[i] = {
+                "status": "success",
+                "num_results": len(batch_results[i]),
+                "filters_applied": spec_filters_applied(searches[i]),
+                "products": batch_results[i]
+            }
+        if valid:
+            logger.info(
+                f"Image batch search complete: {sum(len(results) for results in batch_results.values())} results "
+                f"({len(valid) - len(pending)} of {len(valid)} searches cached)"
+            )
+        
+        return encode_tool_result({"status": "success", "num_searches": len(searches), "searches": responses})
+    
+    except Exception as e:
+        error_type = "retryable_error" if is_retryable_error(e) else "non_retryable_error"
+        logger.error(f"Image batch search error ({error_type}): {e}", exc_info=True)
+        return json.dumps(spec_error(str(e), error_type))
+
+
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    model_stats = warm_up_models("clip")
+    logger.info(f"Search models ready: {model_stats}")
+    try:
+        mcp.run()
+    finally:
+        logger.info(f"Search executor stats at shutdown: {executor_stats()}")
\ No newline at end of file
@@ -0,0 +1,47 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hidden tool argument carrying the chat session; it is in no tool schema, so the model never sees or sets it
+SESSION_ARGUMENT = "_session_id"
+
+current_session_id: ContextVar[Optional[str]] = ContextVar("current_session_id", default=None)
+
+
+@contextmanager
+def session_scope(session_id: Optional[str]):
+    token = current_session_id.set(session_id)
+    try:
+        yield
+    finally:
+        current_session_id.reset(token)
+
+
+def bind_tool_session(agent):
+    # Every tool call the agent's LLM makes goes through agent.call_tool, which stamps the calling turn's session
+    call_tool = agent.call_tool
+
+    async def _call_tool(name: str, arguments: Optional[Dict[str, Any]] = None):
+        session_id = current_session_id.get()
+        if session_id is not None:
+            arguments = {**(arguments or {}), SESSION_ARGUMENT: session_id}
+        return await call_tool(name, arguments)
+
+    agent.call_tool = _call_tool
+    return agent
+
+
+class SessionScopedMCP(FastMCP):
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        arguments = dict(arguments or {})
+        session_id = arguments.pop(SESSION_ARGUMENT, None)
+        if session_id is None:
+            logger.warning(f"Tool {name} called without a session; its progress updates will be dropped")
+        with session_scope(session_id):
+            return await super().call_tool(name, arguments)
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from servers.agent_pool import AgentPool
+from servers.tool_session import SESSION_ARGUMENT
+
+WORKER_NAMES = ["CartPal", "CartPal-1", "CartPal-2", "CartPal-3"]
+
+
+class StubMemory:
+    def __init__(self):
+        self.history = []
+
+    def set(self, messages):
+        self.history = list(messages)
+
+    def clear(self):
+        self.history = []
+
+
+class StubLLM:
+    def __init__(self):
+        self.history = StubMemory()
+
+
+class StubWorker:
+    # An agent whose LLM sleeps instead of calling a model and runs one search tool per turn
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+        self._llm = StubLLM()
+        self.tool_calls = []
+
+    async def call_tool(self, name, arguments=None):
+        self.tool_calls.append(arguments)
+
+    async def __call__(self, message: str) -> str:
+        self._llm.history.history.append({"role": "user", "content": message})
+        await self.call_tool("semantic_search_text", {"query": message})
+        await asyncio.sleep(self.latency)
+        reply = f"seen {sum(1 for m in self._llm.history.history if m['role'] == 'user')} user messages"
+        self._llm.history.history.append({"role": "assistant", "content": reply})
+        return reply
+
+
+class StubContext:
+    entered = 0
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def __aenter__(self):
+        StubContext.entered += 1
+        return {name: StubWorker(name, self.latency) for name in WORKER_NAMES}
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def make_pool(latency: float = 0.05, **kwargs) -> AgentPool:
+    return AgentPool(lambda: StubContext(latency), WORKER_NAMES, sweep_interval=0, **kwargs)
+
+
+async def run_sessions(pool: AgentPool, sessions: int, turns: int) -> float:
+    async def user(session: int):
+        for turn in range(turns):
+            async with pool.session(f"session-{session}") as agent:
+                await agent(f"session {session} turn {turn}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(session) for session in range(sessions)))
+    return sessions * turns / (time.perf_counter() - start)
+
+
+def test_throughput_scales_with_concurrent_sessions():
+    async def main():
+        pool = make_pool()
+        await pool.start()
+        single = await run_sessions(pool, sessions=1, turns=4)
+        concurrent = await run_sessions(pool, sessions=len(WORKER_NAMES), turns=4)
+        stats = pool.stats()
+        await pool.stop()
+        return single, concurrent, stats
+
+    StubContext.entered = 0
+    single, concurrent, stats = asyncio.run(main())
+    assert concurrent > 3 * single
+    # Every session ran on the one shared context, so on one search server
+    assert StubContext.entered == 1
+    assert stats["sessions"] == len(WORKER_NAMES)
+    assert stats["busy_workers"] == 0
+
+
+def test_sessions_beyond_workers_queue_for_a_worker():
+    async def main():
+        pool = make_pool()
+        await pool.start()
+        throughput = await run_sessions(pool, sessions=2 * len(WORKER_NAMES), turns=2)
+        stats = pool.stats()
+        await pool.stop()
+        return throughput, stats
+
+    throughput, stats = asyncio.run(main())
+    assert stats["turns"] == 4 * len(WORKER_NAMES)
+    assert stats["worker_waits"] > 0
+    assert throughput < 1.5 * len(WORKER_NAMES) / 0.05
+
+
+def test_each_session_sees_only_its_own_history():
+    async def main():
+        pool = make_pool(latency=0.01)
+        await pool.start()
+        replies = {}
+
+        async def user(session_id: str, turns: int):
+            for turn in range(turns):
+                async with pool.session(session_id) as agent:
+                    replies[session_id] = await agent(f"{session_id} turn {turn}")
+
+        await asyncio.gather(user("alice", 3), user("bob", 1), user("carol", 2))
+        histories = {session_id: state.messages for session_id, state in pool.sessions.items()}
+        await pool.stop()
+        return replies, histories
+
+    replies, histories = asyncio.run(main())
+    assert replies == {"alice": "seen 3 user messages", "bob": "seen 1 user messages", "carol": "seen 2 user messages"}
+    for session_id, messages in histories.items():
+        assert all(m["content"].startswith(session_id) for m in messages if m["role"] == "user")
+
+
+def test_tool_calls_carry_the_calling_session():
+    async def main():
+        pool = make_pool(latency=0.01)
+        await pool.start()
+        async with pool.session("alice") as agent:
+            await agent("hello")
+        calls = list(agent.tool_calls)
+        await pool.stop()
+        return calls
+
+    assert asyncio.run(main()) == [{"query": "hello", SESSION_ARGUMENT: "alice"}]
+
+
+def test_failed_turn_keeps_previous_history_and_frees_the_worker():
+    async def main():
+        pool = make_pool(latency=0.01)
+        await pool.start()
+        async with pool.session("alice") as agent:
+            await agent("first")
+        with pytest.raises(RuntimeError):
+            async with pool.session("alice") as agent:
+                await agent("second")
+                raise RuntimeError("LLM call failed")
+        messages = pool.sessions["alice"].messages
+        stats = pool.stats()
+        await pool.stop()
+        return messages, stats
+
+    messages, stats = asyncio.run(main())
+    assert [m["content"] for m in messages] == ["first", "seen 1 user messages"]
+    assert stats["busy_workers"] == 0
+
+
+def test_reset_and_eviction_drop_only_history():
+    async def main():
+        pool = make_pool(latency=0.01, max_size=2)
+        await pool.start()
+        for session_id in ("alice", "bob"):
+            async with pool.session(session_id) as agent:
+                await agent("hi")
+        assert await pool.reset("alice")
+        assert not await pool.reset("alice")
+        for session_id in ("carol", "dave"):
+            async with pool.session(session_id) as agent:
+                await agent("hi")
+        sessions = list(pool.sessions)
+        stats = pool.stats()
+        await pool.stop()
+        return sessions, stats
+
+    StubContext.entered = 0
+    sessions, stats = asyncio.run(main())
+    assert sessions == ["carol", "dave"]
+    assert stats["evictions"] == 1
+    assert StubContext.entered == 1
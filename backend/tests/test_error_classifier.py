@@ -0,0 +1,72 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core import errors
+from core.errors import NON_RETRYABLE_ERROR_KEYWORDS, RETRYABLE_ERROR_KEYWORDS, classify_error, is_retryable_error
+
+
+def legacy_is_retryable_error(error: Exception) -> bool:
+    # The linear keyword scan the compiled classifier replaced; the reference for the regression check
+    if isinstance(error, TimeoutError):
+        return True
+
+    if isinstance(error, (ConnectionError, ConnectionRefusedError)):
+        return False
+
+    error_msg = str(error).lower()
+
+    if any(keyword in error_msg for keyword in RETRYABLE_ERROR_KEYWORDS):
+        return True
+
+    if any(keyword in error_msg for keyword in NON_RETRYABLE_ERROR_KEYWORDS):
+        return False
+
+    return False
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def regression_cases(rng: random.Random):
+    keywords = RETRYABLE_ERROR_KEYWORDS + NON_RETRYABLE_ERROR_KEYWORDS
+    cases = [TimeoutError(""), TimeoutError("invalid input"), ConnectionRefusedError("server busy"), ConnectionResetError("")]
+    cases += [UpstreamError(keyword) for keyword in keywords]
+    cases += [UpstreamError(keyword.upper()) for keyword in keywords]
+    cases += [ValueError(f"Request failed: {keyword} (code 17)") for keyword in keywords]
+    # Overlaps where a non-retryable keyword starts first: "connection" before "connection timeout",
+    # "invalid" before a later "rate limit", and keywords split across word boundaries
+    cases += [
+        UpstreamError("Connection timeout while reaching the index"),
+        UpstreamError("Invalid response, then rate limit hit"),
+        UpstreamError("network unreachable"),
+        UpstreamError("network is unreachable"),
+        UpstreamError("socket closed: server busy"),
+        UpstreamError("connectiontimeout"),
+        UpstreamError("unknown error"),
+        UpstreamError(""),
+        KeyError("missing field"),
+        RuntimeError("Max retries exceeded: Service temporarily unavailable: llm circuit open"),
+    ]
+    for _ in range(2000):
+        words = [rng.choice(keywords) if rng.random() < 0.3 else rng.choice(["error", "while", "calling", "model", "index", "the", "x"]) for _ in range(rng.randint(0, 8))]
+        cases.append(rng.choice([UpstreamError, ValueError, RuntimeError, OSError])(" ".join(words)))
+    return cases
+
+
+def test_compiled_classifier_matches_the_keyword_scan():
+    cases = regression_cases(random.Random(0))
+    mismatches = [
+        f"{type(error).__name__}({str(error)!r}) legacy={legacy_is_retryable_error(error)}"
+        for error in cases if is_retryable_error(error) != legacy_is_retryable_error(error)
+    ]
+    assert mismatches == []
+
+
+def test_cached_verdicts_match_cold_ones():
+    cases = regression_cases(random.Random(1))
+    errors._classify_message.cache_clear()
+    cold = [classify_error(error) for error in cases]
+    assert [classify_error(error) for error in cases] == cold
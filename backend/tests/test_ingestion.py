@@ -0,0 +1,54 @@
+import os
+import sys
+
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_ingestion import FakeCDN, FakeClip
+from data_retrieval.ingestion import ImageIngestionPipeline
+
+
+class FlakyClip(FakeClip):
+    # Rejects the given calls, as CLIP does with a corrupt tensor or an out-of-memory batch
+    def __init__(self, failing_calls):
+        super().__init__(call_overhead=0.0, per_image=0.0, dim=8)
+        self.failing_calls = failing_calls
+        self.calls = 0
+
+    def encode(self, images, batch_size: int = 32):
+        self.calls += 1
+        if self.calls in self.failing_calls:
+            raise RuntimeError("CLIP rejected the batch")
+        return super().encode(images, batch_size)
+
+
+def catalog(cdn: FakeCDN, count: int):
+    return [
+        {"id": i, "title": f"Product {i}", "thumbnail": f"{cdn.base_url}/product-images/{i}/thumbnail.png"}
+        for i in range(count)
+    ]
+
+
+def test_pipeline_embeds_every_reachable_image_in_order():
+    with FakeCDN(40, latency=0.005, missing_every=10) as cdn:
+        pipeline = ImageIngestionPipeline(FakeClip(0.0, 0.0, dim=8), download_workers=8, decode_workers=2, batch_size=8, progress_every=0)
+        embedded = pipeline.run(catalog(cdn, 40))
+
+    missing = [i for i in range(40) if i % 10 == 9]
+    assert [product["id"] for product, _ in embedded] == [i for i in range(40) if i not in missing]
+    assert all(embedding.shape == (8,) for _, embedding in embedded)
+    assert sorted(product["id"] for product, _ in pipeline.failed) == missing
+    report = pipeline.report()
+    assert report["stages"]["download"]["failures"] == len(missing)
+    assert report["stages"]["encode"]["items"] == 36
+
+
+def test_failed_clip_batch_only_fails_its_own_products():
+    with FakeCDN(12, latency=0.0) as cdn:
+        pipeline = ImageIngestionPipeline(FlakyClip({2}), download_workers=4, decode_workers=2, batch_size=4, progress_every=0)
+        embedded = pipeline.run(catalog(cdn, 12))
+
+    assert len(embedded) == 8
+    assert len(pipeline.failed) == 4
+    assert all(error.startswith("encode failed") for _, error in pipeline.failed)
+    assert {product["id"] for product, _ in embedded} | {product["id"] for product, _ in pipeline.failed} == set(range(12))
+    assert pipeline.report()["stages"]["encode"]["failures"] == 4
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_retrieval.catalog_sync import image_metadata
+from data_retrieval.embedding_store import write_embedding_store
+from data_retrieval.product_catalog import ProductCatalog
+
+
+def products(count: int, host: str):
+    return [
+        {"id": i, "title": f"Product {i}", "price": 10.0 + i, "category": "audio", "thumbnail": f"https://{host}/{i}/thumbnail.png"}
+        for i in range(1, count + 1)
+    ]
+
+
+def write_legacy_index(index_path: str, catalog):
+    from llama_index.core import Document, VectorStoreIndex
+    from llama_index.core.embeddings import MockEmbedding
+
+    # Laid out as llama_config.create_image_index persists it
+    docs = [Document(text=p["title"], metadata=image_metadata(p), embedding=[0.1, 0.2, 0.3, 0.4]) for p in catalog]
+    VectorStoreIndex(docs, embed_model=MockEmbedding(embed_dim=4)).storage_context.persist(persist_dir=index_path)
+
+
+def test_catalog_resolves_thumbnails_from_the_legacy_json_index(tmp_path):
+    index_path = str(tmp_path / "image_index")
+    write_legacy_index(index_path, products(3, "legacy.example"))
+    catalog = ProductCatalog(store_paths=[str(tmp_path / "image_store")], index_paths=[index_path])
+    catalog.refresh()
+
+    assert catalog.store_path == index_path
+    assert catalog.get("#2")["thumbnail"] == "https://legacy.example/2/thumbnail.png"
+    assert catalog.thumbnails([3, 1, 99]) == ["https://legacy.example/3/thumbnail.png", "https://legacy.example/1/thumbnail.png"]
+
+
+def test_catalog_prefers_the_embedding_store_over_the_legacy_index(tmp_path):
+    index_path, store_path = str(tmp_path / "image_index"), str(tmp_path / "image_store")
+    write_legacy_index(index_path, products(3, "legacy.example"))
+    catalog_products = products(2, "store.example")
+    write_embedding_store(
+        store_path, np.ones((2, 4), dtype=np.float32), [image_metadata(p) for p in catalog_products], [p["title"] for p in catalog_products]
+    )
+    catalog = ProductCatalog(store_paths=[store_path], index_paths=[index_path])
+    catalog.refresh()
+
+    assert catalog.store_path == store_path
+    assert catalog.thumbnails([1, 3]) == ["https://store.example/1/thumbnail.png"]
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from mcp_agent.context import Context
+from mcp_agent.llm.providers.augmented_llm_openai import OpenAIAugmentedLLM
+from openai.types.chat import ChatCompletionChunk
+
+from app import ChatManager
+from servers.agent_pool import AgentPool
+
+MODEL = "gpt-4.1"
+REPLY = ["%%RESPONSE Wireless ", "headphones under $100 ", "are in stock. %%"]
+
+
+def completion_chunk(text, finish_reason=None) -> ChatCompletionChunk:
+    delta = {"role": "assistant", "content": text} if text is not None else {}
+    return ChatCompletionChunk.model_validate({
+        "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": MODEL,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    })
+
+
+class StreamingWorker:
+    # The pinned fast-agent OpenAI LLM, fed a scripted completion stream that stalls after its first delta
+    # until the caller has received that delta
+    def __init__(self, name: str, first_chunk_seen: asyncio.Event):
+        self.name = name
+        self._llm = OpenAIAugmentedLLM(context=Context(), name=name, model=MODEL)
+        self.first_chunk_seen = first_chunk_seen
+
+    async def call_tool(self, name, arguments=None):
+        pass
+
+    async def _completion_stream(self):
+        yield completion_chunk(REPLY[0])
+        await asyncio.wait_for(self.first_chunk_seen.wait(), timeout=2)
+        for text in REPLY[1:]:
+            yield completion_chunk(text)
+        yield completion_chunk(None, "stop")
+
+    async def __call__(self, message: str) -> str:
+        completion = await self._llm._process_stream(self._completion_stream(), MODEL)
+        return completion.choices[0].message.content
+
+
+class StreamingContext:
+    def __init__(self, first_chunk_seen: asyncio.Event):
+        self.first_chunk_seen = first_chunk_seen
+
+    async def __aenter__(self):
+        return {"CartPal": StreamingWorker("CartPal", self.first_chunk_seen)}
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_chat_stream_emits_a_chunk_before_the_reply_finishes():
+    async def main():
+        first_chunk_seen = asyncio.Event()
+        manager = ChatManager()
+        manager.pool = AgentPool(lambda: StreamingContext(first_chunk_seen), ["CartPal"], sweep_interval=0)
+        items = []
+        async for item in manager.chat_stream("Compare these headphones with the ones I bought last year", "alice"):
+            items.append(item)
+            if item["type"] == "chunk":
+                first_chunk_seen.set()
+        worker = await manager.pool.workers.get()
+        await manager.stop()
+        return items, worker
+
+    items, worker = asyncio.run(main())
+    assert [item["text"] for item in items if item["type"] == "chunk"] == REPLY
+    assert items[0]["type"] == "chunk"
+    assert items[-1] == {"type": "result", "result": "".join(REPLY), "streamed": True}
+    # The listener is gone once the turn ends, so the next session's tokens never reach this one
+    assert "_update_streaming_progress" not in vars(worker._llm)
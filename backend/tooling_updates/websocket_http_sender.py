@@ -1,19 +1,189 @@
+import asyncio
 import httpx
 import logging
+import os
+from collections import deque
+from typing import Any, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
-async def send_to_frontend(message_content: str):
+PROGRESS_ENDPOINT_URL = os.getenv("PROGRESS_ENDPOINT_URL", "http://localhost:8000/internal/websocket_send_batch")
+# Set when app.py is also served on a Unix socket (uvicorn --uds); skips TCP entirely
+PROGRESS_UDS_PATH = os.getenv("PROGRESS_UDS_PATH", "")
+# Messages published within this window go out in one request
+PROGRESS_BATCH_WINDOW_MS = float(os.getenv("PROGRESS_BATCH_WINDOW_MS", "10"))
+PROGRESS_MAX_BATCH = int(os.getenv("PROGRESS_MAX_BATCH", "32"))
+PROGRESS_MAX_PENDING = int(os.getenv("PROGRESS_MAX_PENDING", "256"))
+
+
+async def _close_client(client: httpx.AsyncClient):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "http://localhost:8000/internal/websocket_send",
-                json={"message": message_content},
-                timeout=5.0
-            )
+        await client.aclose()
+    except Exception as e:
+        logger.warning(f"Failed to close stale progress client: {e}")
+
+
+class ProgressChannel:
+    def __init__(
+        self,
+        url: str = PROGRESS_ENDPOINT_URL,
+        uds_path: str = PROGRESS_UDS_PATH,
+        batch_window: float = PROGRESS_BATCH_WINDOW_MS / 1000,
+        max_batch: int = PROGRESS_MAX_BATCH,
+        max_pending: int = PROGRESS_MAX_PENDING
+    ):
+        self.url = url
+        self.uds_path = uds_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self.pending: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.unscoped = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._discard_client(loop)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # One keep-alive connection reused for every batch instead of a new client per message
+        transport = httpx.AsyncHTTPTransport(uds=self.uds_path) if self.uds_path else None
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            timeout=5.0,
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=2)
+        )
+        self._task = loop.create_task(self._run())
+
+    def _discard_client(self, loop):
+        client, old_loop, task = self._client, self._loop, self._task
+        self._client = None
+        if client is None:
+            return
+        if old_loop is not None and old_loop is not loop and old_loop.is_running():
+            # Its connections belong to the loop it was created on, so it is closed there
+            if task is not None:
+                old_loop.call_soon_threadsafe(task.cancel)
+            asyncio.run_coroutine_threadsafe(_close_client(client), old_loop)
+        else:
+            loop.create_task(_close_client(client))
+
+    def publish(self, message_content: str, coalesce_key: Optional[str] = None, session_id: Optional[str] = None):
+        if session_id is None:
+            # Without a session there is no right recipient; guessing one leaks progress across users
+            self.unscoped += 1
+            logger.warning(f"Dropping progress message without a session: {message_content[:80]!r}")
+            return
+        self._ensure_running()
+        self.published += 1
+        message = {"message": message_content, "coalesce_key": coalesce_key, "session_id": session_id}
+
+        if coalesce_key is not None:
+            for position, pending in enumerate(self.pending):
+                if pending["coalesce_key"] == coalesce_key and pending["session_id"] == session_id:
+                    self.pending[position] = message
+                    self.coalesced += 1
+                    return
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(message)
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+
+            while self.pending:
+                batch = [self.pending.popleft() for _ in range(min(self.max_batch, len(self.pending)))]
+                await self._deliver(batch)
+                # Full batches go out back to back; a partial remainder waits for the next window
+                if len(self.pending) < self.max_batch:
+                    break
+
+            if self.pending:
+                self._wakeup.set()
+            else:
+                self._idle.set()
+
+    async def _deliver(self, batch):
+        try:
+            response = await self._client.post(self.url, json={"messages": batch})
             if response.status_code == 200:
-                logger.info(f"Sent WebSocket message via HTTP: {message_content}")
+                self.delivered += len(batch)
             else:
-                logger.error(f"HTTP callback failed: {response.status_code}")
+                self.failed_batches += 1
+                logger.error(f"Progress batch rejected: {response.status_code}")
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Failed to deliver {len(batch)} progress messages: {e}")
+        self.batches += 1
+
+    async def flush(self, timeout: float = 5.0):
+        if self._idle is not None and self._loop is asyncio.get_running_loop():
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+
+    async def aclose(self):
+        try:
+            await self.flush()
+        except asyncio.TimeoutError:
+            pass
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._client:
+            await self._client.aclose()
+        self._client = None
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "pending": len(self.pending),
+            "dropped": self.dropped,
+            "unscoped": self.unscoped,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+        }
+
+
+_progress_channel = None
+
+def get_progress_channel() -> ProgressChannel:
+    global _progress_channel
+    if _progress_channel is None:
+        _progress_channel = ProgressChannel()
+    return _progress_channel
+
+
+async def send_to_frontend(message_content: str, coalesce_key: Optional[str] = None, session_id: Optional[str] = None):
+    # Never waits on delivery: the message is queued and a background task ships it in the next batch
+    try:
+        get_progress_channel().publish(message_content, coalesce_key=coalesce_key, session_id=session_id)
     except Exception as e:
-        logger.error(f"Failed to send WebSocket message via HTTP: {e}")
\ No newline at end of file
+        logger.error(f"Failed to queue WebSocket message: {e}")
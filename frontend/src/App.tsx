@@ -2,8 +2,11 @@ import { useState, useRef, useEffect, useCallback } from 'react';
 import { Camera, Send, RotateCcw, ShoppingBag, Sparkles} from 'lucide-react';
 import ReactMarkdown from 'react-markdown';
 import { useWebSocket } from './WebSocket';
+import { getSessionId } from './session';
+import { streamAgent } from './agentStream';
 
 interface Message {
+  id?: number;
   type: 'user' | 'agent' | 'error' | 'tool';
   content: string;
   timestamp: Date;
@@ -126,37 +129,36 @@ const handleImageUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
     setSelectedImage64(null);
 
     try {
-      const response = await fetch('http://localhost:8000/agent', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ prompt: currentPrompt, image: selectedImage }),
-      });
-
-      if (!response.ok) {
-        throw new Error(`API Error: ${response.status}`);
-      }
-      
-      const data = await response.json();
-
-      let imageUrls: string[] = [];
-      if (data.image_result) {
-        try {
-          imageUrls = JSON.parse(data.image_result);
-        } catch (e) {
-          console.error('Failed to parse image URLs:', e);
-        }
-      }
-
-      const agentMessage: Message = {
-        type: 'agent',
-        content: data.text_result || 'No response',
-        timestamp: new Date(),
-        imageUrls: imageUrls.length > 0 ? imageUrls : undefined,
+      // Rendered as soon as the first token arrives, then filled in as the stream continues
+      const agentMessageId = Date.now();
+      const updateAgentMessage = (update: (message: Message) => Message) => {
+        setConversation(prev => {
+          if (!prev.some(message => message.id === agentMessageId)) {
+            return [...prev, update({ id: agentMessageId, type: 'agent', content: '', timestamp: new Date() })];
+          }
+          return prev.map(message => (message.id === agentMessageId ? update(message) : message));
+        });
       };
 
-      setConversation(prev => [...prev, agentMessage]);
+      await streamAgent({ prompt: currentPrompt, image: selectedImage }, {
+        onText: delta => updateAgentMessage(message => ({ ...message, content: message.content + delta })),
+        onImageUrl: url => updateAgentMessage(message => ({ ...message, imageUrls: [...(message.imageUrls || []), url] })),
+        onDone: data => {
+          let imageUrls: string[] = [];
+          if (data.image_result) {
+            try {
+              imageUrls = JSON.parse(data.image_result);
+            } catch (e) {
+              console.error('Failed to parse image URLs:', e);
+            }
+          }
+          updateAgentMessage(message => ({
+            ...message,
+            content: data.text_result || 'No response',
+            imageUrls: imageUrls.length > 0 ? imageUrls : undefined,
+          }));
+        },
+      });
     } catch (err) {
       const errorMessage: Message = {
         type: 'error',
@@ -174,6 +176,9 @@ const handleImageUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
       setIsResetting(true);
       await fetch('http://localhost:8000/reset_conversation', {
         method: 'POST',
+        headers: {
+          'X-Session-Id': getSessionId(),
+        },
       });
       setConversation([]);
       setPrompt('');
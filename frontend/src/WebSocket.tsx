@@ -1,4 +1,5 @@
 import { useState, useEffect, useRef} from 'react';
+import { getSessionId } from './session';
 
 interface WebSocketMessage {
   type: string;
@@ -27,7 +28,7 @@ export const useWebSocket = (onMessage?: (message: WebSocketMessage) => void) =>
       isConnectingRef.current = true;
       console.log('Attempting WebSocket connection...');
 
-      const ws = new WebSocket('ws://localhost:8000/ws');
+      const ws = new WebSocket(`ws://localhost:8000/ws?session_id=${encodeURIComponent(getSessionId())}`);
       socketRef.current = ws;
 
       ws.onopen = () => {
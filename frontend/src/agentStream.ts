@@ -0,0 +1,61 @@
+import { getSessionId } from './session';
+
+export interface AgentResult {
+  text_result?: string | null;
+  image_result?: string | null;
+}
+
+export interface AgentStreamHandlers {
+  onText: (delta: string) => void;
+  onImageUrl: (url: string) => void;
+  onDone: (result: AgentResult) => void;
+}
+
+export const streamAgent = async (
+  body: { prompt: string; image: string | null },
+  handlers: AgentStreamHandlers
+): Promise<void> => {
+  const response = await fetch('http://localhost:8000/agent/stream', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-Session-Id': getSessionId(),
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`API Error: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === 'text') handlers.onText(payload.delta);
+      else if (event === 'image_url') handlers.onImageUrl(payload.url);
+      else if (event === 'done') handlers.onDone(payload);
+      else if (event === 'error') throw new Error(payload.detail);
+    }
+  }
+};
@@ -0,0 +1,10 @@
+const SESSION_STORAGE_KEY = 'cartpal_session_id';
+
+export const getSessionId = (): string => {
+  let sessionId = sessionStorage.getItem(SESSION_STORAGE_KEY);
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    sessionStorage.setItem(SESSION_STORAGE_KEY, sessionId);
+  }
+  return sessionId;
+};